@@ -0,0 +1,151 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.permissions import SAFE_METHODS
+
+User = get_user_model()
+
+AUTH_VERSION_KEY = 'auth-version:{}'
+
+
+def bump_auth_version(user_id):
+    """Отмечает в общем кэше изменение пользователя или его токена:
+    записи token_cache всех воркеров с прежней версией перестают
+    использоваться.
+    """
+    cache.set(
+        AUTH_VERSION_KEY.format(user_id), time.time_ns(),
+        timeout=settings.AUTH_TOKEN_CACHE_TTL
+    )
+
+
+def get_auth_version(user_id):
+    """Версия пользователя в общем кэше, инициализирует
+    отсутствующую. Ключ живёт не меньше записи token_cache, а после
+    его вытеснения версия меняется и запись перечитывается из БД.
+    """
+    key = AUTH_VERSION_KEY.format(user_id)
+    version = cache.get(key)
+    if version is None:
+        version = time.time_ns()
+        cache.add(key, version, timeout=settings.AUTH_TOKEN_CACHE_TTL)
+    return version
+
+
+class TokenCache:
+    """Кэш «токен -> пользователь» в памяти процесса: LRU на
+    AUTH_TOKEN_CACHE_SIZE записей, каждая живёт AUTH_TOKEN_CACHE_TTL
+    секунд. Записи этого процесса сбрасываются сигналами при выходе,
+    смене пароля и деактивации пользователя, другие воркеры узнают
+    об изменении по версии пользователя в общем кэше.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._user_keys = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Значения полей пользователя, дата создания токена и версия
+        пользователя или None, если записи нет или она устарела.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1], entry[2], entry[3]
+
+    def set(self, key, user_values, created, version):
+        user_id = user_values['id']
+        expires = time.monotonic() + settings.AUTH_TOKEN_CACHE_TTL
+        with self._lock:
+            self._remove(self._user_keys.get(user_id))
+            self._entries[key] = (expires, user_values, created, version)
+            self._user_keys[user_id] = key
+            while len(self._entries) > settings.AUTH_TOKEN_CACHE_SIZE:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._user_keys.pop(entry[1]['id'], None)
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            self._remove(self._user_keys.get(user_id))
+
+    def invalidate_key(self, key):
+        with self._lock:
+            self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._user_keys.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self._entries),
+            }
+
+
+token_cache = TokenCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication без запроса к БД, пока токен есть
+    в token_cache и версия пользователя в общем кэше не изменилась.
+    Объект пользователя собирается заново для каждого запроса, поэтому
+    изменения в одном запросе не видны другим. Изменяющие запросы
+    к действиям из user_write_actions вьюсета получают пользователя
+    из БД: сохранение объекта из кэша записало бы устаревшие пароль
+    или is_active.
+    """
+    use_cache = True
+
+    def authenticate(self, request):
+        view = request.parser_context.get('view')
+        self.use_cache = (
+            request.method in SAFE_METHODS
+            or getattr(view, 'action', None)
+            not in getattr(view, 'user_write_actions', ())
+        )
+        return super().authenticate(request)
+
+    def authenticate_credentials(self, key):
+        cached = token_cache.get(key) if self.use_cache else None
+        if cached is not None:
+            user_values, created, version = cached
+            if version == get_auth_version(user_values['id']):
+                user = User.from_db('default', list(user_values),
+                                    list(user_values.values()))
+                token = self.get_model()(key=key, user=user,
+                                         created=created)
+                token._state.adding = False
+                return user, token
+        user, token = super().authenticate_credentials(key)
+        token_cache.set(
+            key,
+            {
+                field.attname: getattr(user, field.attname)
+                for field in User._meta.concrete_fields
+            },
+            token.created,
+            get_auth_version(user.pk),
+        )
+        return user, token
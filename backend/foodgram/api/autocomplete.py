@@ -0,0 +1,76 @@
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+
+from recipes.models import Ingredient
+
+
+class IngredientIndex:
+    """Отсортированный индекс названий ингредиентов в памяти процесса.
+    Загружается при первом обращении, сбрасывается сигналами при
+    изменении ингредиентов и по истечении INGREDIENT_INDEX_TTL секунд,
+    чтобы подхватывать изменения из других воркеров.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = None
+
+    def invalidate(self):
+        self._data = None
+
+    def _load(self):
+        rows = sorted(
+            (name.casefold(), pk, name, measurement_unit)
+            for pk, name, measurement_unit in Ingredient.objects.values_list(
+                'id', 'name', 'measurement_unit'
+            )
+        )
+        keys = [row[0] for row in rows]
+        entries = [
+            {'id': pk, 'name': name, 'measurement_unit': measurement_unit}
+            for _, pk, name, measurement_unit in rows
+        ]
+        return time.monotonic(), keys, entries
+
+    def _get_data(self):
+        data = self._data
+        if (data is None
+                or time.monotonic() - data[0] > settings.INGREDIENT_INDEX_TTL):
+            with self._lock:
+                data = self._data
+                if (data is None or time.monotonic() - data[0]
+                        > settings.INGREDIENT_INDEX_TTL):
+                    data = self._data = self._load()
+        return data
+
+    def search(self, query, limit):
+        """Ищет ингредиенты по части названия без учёта регистра.
+        Args:
+            query (str): Введённая пользователем строка.
+            limit (int): Максимальное количество результатов.
+        Returns:
+            list[dict]: Сначала совпадения по началу названия,
+            затем совпадения по вхождению.
+        """
+        _, keys, entries = self._get_data()
+        query = query.casefold()
+        result = []
+        start = bisect_left(keys, query)
+        idx = start
+        while (idx < len(keys) and len(result) < limit
+               and keys[idx].startswith(query)):
+            result.append(entries[idx])
+            idx += 1
+        prefix_range = range(start, idx)
+        for idx, key in enumerate(keys):
+            if len(result) >= limit:
+                break
+            if query in key and idx not in prefix_range:
+                result.append(entries[idx])
+        return result
+
+
+ingredient_index = IngredientIndex()
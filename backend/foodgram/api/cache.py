@@ -0,0 +1,137 @@
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+
+from recipes.models import Favorite, ShoppingCart
+from users.models import Follow
+
+GENERATION_KEY = 'recipe-list-gen:{}'
+PAGE_KEY = 'recipe-list:{}:{}'
+USER_SCOPED_PARAMS = ('is_favorited', 'is_in_shopping_cart')
+
+
+def get_cache():
+    return caches[settings.RECIPE_LIST_CACHE_ALIAS]
+
+
+def get_scopes(author, tags, sort=''):
+    """Области инвалидации, от которых зависит страница списка.
+    Любая страница зависит от справочников (catalog). Страница без
+    фильтров зависит от всех рецептов, с фильтрами - только от
+    выбранного автора и тегов. Порядок sort=popular зависит ещё
+    и от счётчиков избранного (popular).
+    """
+    scopes = ['catalog']
+    if author:
+        scopes.append(f'author:{author}')
+    scopes.extend(f'tag:{slug}' for slug in tags)
+    if not author and not tags:
+        scopes.append('all')
+    if sort == 'popular':
+        scopes.append('popular')
+    return scopes
+
+
+def bump_generations(scopes):
+    cache = get_cache()
+    generation = time.time_ns()
+    cache.set_many(
+        {GENERATION_KEY.format(scope): generation for scope in scopes},
+        timeout=None
+    )
+
+
+def invalidate_recipe(author_id, tag_slugs=()):
+    bump_generations(
+        ['all', f'author:{author_id}', *(f'tag:{slug}' for slug in tag_slugs)]
+    )
+
+
+def invalidate_catalog():
+    bump_generations(['catalog'])
+
+
+def invalidate_popular():
+    bump_generations(['popular'])
+
+
+def is_cacheable(request):
+    """Ответ одинаков для всех пользователей, если нет фильтров
+    по избранному и списку покупок текущего пользователя.
+    """
+    if request.user.is_anonymous:
+        return True
+    return not any(
+        request.query_params.get(param) for param in USER_SCOPED_PARAMS
+    )
+
+
+def get_cache_key(request):
+    """Ключ страницы: схема, хост, путь, вся строка запроса
+    с отсортированными параметрами и поколения областей, от которых
+    зависит страница. От них же зависят ссылки next/previous,
+    которые хранятся в кэшированной странице.
+    """
+    params = request.query_params
+    author = params.get('author', '')
+    tags = sorted(set(params.getlist('tags')))
+    normalized = urlencode(sorted(
+        (param, value)
+        for param in params
+        for value in params.getlist(param)
+    ))
+    cache = get_cache()
+    scope_keys = [
+        GENERATION_KEY.format(scope)
+        for scope in get_scopes(author, tags, params.get('sort', ''))
+    ]
+    generations = cache.get_many(scope_keys)
+    digest = hashlib.md5(
+        ':'.join(
+            [request.scheme, request.get_host(), request.path, normalized]
+            + [str(generations.get(key, 0)) for key in scope_keys]
+        ).encode()
+    ).hexdigest()
+    return PAGE_KEY.format(settings.RECIPE_LIST_CACHE_VERSION, digest)
+
+
+def get_page(key):
+    return get_cache().get(key)
+
+
+def set_page(key, data):
+    get_cache().set(key, data, timeout=settings.RECIPE_LIST_CACHE_TIMEOUT)
+
+
+def overlay_user_flags(data, user):
+    """Накладывает флаги текущего пользователя на страницу из кэша.
+    Args:
+        data (dict): Страница списка рецептов в анонимном представлении.
+        user (User): Текущий пользователь.
+    Returns:
+        dict: Та же страница с is_favorited, is_in_shopping_cart
+        и author.is_subscribed для пользователя.
+    """
+    if user.is_anonymous or not data['results']:
+        return data
+    recipe_ids = [recipe['id'] for recipe in data['results']]
+    author_ids = {recipe['author']['id'] for recipe in data['results']}
+    favorited = set(Favorite.objects.filter(
+        user=user, recipe_id__in=recipe_ids
+    ).values_list('recipe_id', flat=True))
+    in_cart = set(ShoppingCart.objects.filter(
+        user=user, recipe_id__in=recipe_ids
+    ).values_list('recipe_id', flat=True))
+    subscribed = set(Follow.objects.filter(
+        user=user, author_id__in=author_ids
+    ).values_list('author_id', flat=True))
+    for recipe in data['results']:
+        recipe['is_favorited'] = recipe['id'] in favorited
+        recipe['is_in_shopping_cart'] = recipe['id'] in in_cart
+        recipe['author']['is_subscribed'] = (
+            recipe['author']['id'] in subscribed
+        )
+    return data
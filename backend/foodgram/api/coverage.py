@@ -0,0 +1,106 @@
+import logging
+import threading
+import time
+from array import array
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import connection
+
+from recipes.models import IngredientRecipe
+
+logger = logging.getLogger(__name__)
+
+
+class RecipeCoverageIndex:
+    """Обратный индекс «ингредиент -> рецепты» в памяти процесса для
+    подбора рецептов по имеющимся продуктам. Как и IngredientIndex,
+    загружается при первом обращении и заново после сброса сигналами.
+    По истечении RECIPE_COVERAGE_INDEX_TTL секунд запросы получают
+    прежний индекс, а новый строится в фоновом потоке.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = None
+        self._version = 0
+        self._refreshing = False
+
+    def invalidate(self):
+        self._version += 1
+        self._data = None
+
+    def _load(self):
+        postings = defaultdict(lambda: array('I'))
+        sizes = Counter()
+        rows = IngredientRecipe.objects.values_list(
+            'ingredient_id', 'recipe_id'
+        ).order_by().iterator(chunk_size=10000)
+        for ingredient_id, recipe_id in rows:
+            postings[ingredient_id].append(recipe_id)
+            sizes[recipe_id] += 1
+        return time.monotonic(), dict(postings), dict(sizes)
+
+    def _store(self, data, version):
+        # Индекс, загруженный до сброса, мог не увидеть изменений.
+        if version == self._version:
+            self._data = data
+
+    def _refresh(self, version):
+        try:
+            self._store(self._load(), version)
+        except Exception:
+            logger.exception('Recipe coverage index refresh failed')
+        finally:
+            self._refreshing = False
+            connection.close()
+
+    def _get_data(self):
+        data = self._data
+        if data is None:
+            with self._lock:
+                data = self._data
+                if data is None:
+                    version = self._version
+                    data = self._load()
+                    self._store(data, version)
+            return data
+        ttl = settings.RECIPE_COVERAGE_INDEX_TTL
+        if time.monotonic() - data[0] > ttl and not self._refreshing:
+            with self._lock:
+                if self._refreshing or self._data is not data:
+                    return data
+                self._refreshing = True
+            threading.Thread(
+                target=self._refresh, args=(self._version,),
+                name='recipe-coverage-index', daemon=True,
+            ).start()
+        return data
+
+    def search(self, ingredient_ids, min_coverage):
+        """Рецепты, ингредиенты которых покрыты имеющимися продуктами.
+        Просматриваются только рецепты, где есть хотя бы один
+        из продуктов, без загрузки составов всех рецептов.
+        Args:
+            ingredient_ids (Iterable[int]): Продукты пользователя.
+            min_coverage (float): Минимальная доля покрытых
+                ингредиентов рецепта, от 0 до 1.
+        Returns:
+            list[tuple]: (recipe_id, coverage, missing_count),
+            по убыванию покрытия, затем по числу недостающих
+            ингредиентов, затем от новых рецептов к старым.
+        """
+        _, postings, sizes = self._get_data()
+        matched = Counter()
+        for ingredient_id in set(ingredient_ids):
+            matched.update(postings.get(ingredient_id, ()))
+        result = []
+        for recipe_id, count in matched.items():
+            size = sizes[recipe_id]
+            if count >= min_coverage * size:
+                result.append((recipe_id, count / size, size - count))
+        result.sort(key=lambda row: (-row[1], row[2], -row[0]))
+        return result
+
+
+recipe_coverage_index = RecipeCoverageIndex()
@@ -1,43 +1,93 @@
-from django_filters import FilterSet, CharFilter
+from django import forms
+from django.conf import settings
+from django.db.models import (Case,
+                              Exists,
+                              IntegerField,
+                              OuterRef,
+                              Value,
+                              When)
+from django_filters import CharFilter
 from django_filters.rest_framework import FilterSet, filters
-from rest_framework.filters import SearchFilter
+from django_filters.widgets import BooleanWidget
 
-from recipes.models import Recipe, Tag, Ingredient
-from users.models import User
+from recipes.models import Ingredient, Recipe
+from recipes.search import search_recipes
+
+
+class SlugListField(forms.Field):
+    """Все значения параметра запроса, например ?tags=a&tags=b."""
+    widget = forms.SelectMultiple
+
+    def to_python(self, value):
+        return [slug for slug in value or () if slug]
+
+
+class SlugListFilter(filters.Filter):
+    field_class = SlugListField
 
 
 class RecipeFilter(FilterSet):
-    tags = filters.ModelMultipleChoiceFilter(
-        field_name='tags__slug',
-        queryset=Tag.objects.all(),
-        to_field_name='slug'
+    """Фильтры ленты рецептов на подзапросах EXISTS: связи не
+    размножают строки рецептов и DISTINCT не нужен.
+    """
+    tags = SlugListFilter(method='filter_tags')
+    author = filters.NumberFilter(field_name='author')
+    is_favorited = filters.BooleanFilter(
+        method='filter_user_flag', widget=BooleanWidget()
     )
-    author = filters.ModelChoiceFilter(queryset=User.objects.all())
-    is_favorited = filters.BooleanFilter(method='filter_is_favorited')
     is_in_shopping_cart = filters.BooleanFilter(
-        method='filter_is_in_shopping_cart'
+        method='filter_user_flag', widget=BooleanWidget()
     )
-
-    def filter_is_favorited(self, queryset, name, value):
-        if value and not self.request.user.is_anonymous:
-            return queryset.filter(favorites__user=self.request.user)
-        return queryset
-
-    def filter_is_in_shopping_cart(self, queryset, name, value):
-        if value and not self.request.user.is_anonymous:
-            return queryset.filter(shopping_carts__user=self.request.user)
-        return queryset
+    search = CharFilter(method='filter_search')
+    sort = CharFilter(method='filter_sort')
 
     class Meta:
         model = Recipe
-        fields = ('tags', 'author')
+        fields = ('tags', 'author', 'is_favorited', 'is_in_shopping_cart')
+
+    def filter_tags(self, queryset, name, value):
+        return queryset.annotate(
+            has_tags=Exists(Recipe.tags.through.objects.filter(
+                recipe=OuterRef('pk'), tag__slug__in=value
+            ))
+        ).filter(has_tags=True)
+
+    def filter_user_flag(self, queryset, name, value):
+        """Флаги is_favorited и is_in_shopping_cart уже аннотированы
+        подзапросами EXISTS в RecipeQuerySet.with_user_flags.
+        """
+        if self.request.user.is_anonymous:
+            return queryset
+        return queryset.filter(**{name: value})
+
+    def filter_search(self, queryset, name, value):
+        """Полнотекстовый поиск по названию, описанию и ингредиентам,
+        результаты по релевантности. Параметр sort задаёт другой порядок.
+        """
+        return search_recipes(queryset, value)
+
+    def filter_sort(self, queryset, name, value):
+        if value == 'popular':
+            return queryset.order_by('-favorites_count', '-id')
+        return queryset
 
 
 class IngredientsSearchFilter(FilterSet):
-    name = CharFilter(
-        field_name="name",
-        lookup_expr="istartswith",
-    )
+    name = CharFilter(method='filter_name')
+
+    def filter_name(self, queryset, name, value):
+        """Поиск в БД, если индекс в памяти отключён.
+        Сначала совпадения по началу названия, затем по вхождению.
+        """
+        return queryset.filter(name__icontains=value).annotate(
+            is_prefix=Case(
+                When(name__istartswith=value, then=Value(0)),
+                default=Value(1),
+                output_field=IntegerField(),
+            )
+        ).order_by('is_prefix', 'name')[
+            :settings.INGREDIENT_AUTOCOMPLETE_LIMIT
+        ]
 
     class Meta:
         model = Ingredient
@@ -0,0 +1,315 @@
+import json
+import os
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+
+from recipes.models import (Favorite,
+                            IngredientRecipe,
+                            Recipe,
+                            ShoppingCart,
+                            Tag)
+from users.models import Follow, User
+
+PIXEL = ('data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAf'
+         'FcSJAAAADUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg==')
+BASELINE = os.path.join(settings.BASE_DIR, 'benchmarks', 'baseline.json')
+NO_CACHE = {
+    'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}
+}
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = ('Замеряет время и число SQL-запросов горячих эндпоинтов '
+            'и сравнивает их с сохранённым baseline. Завершается '
+            'с ошибкой, если эндпоинт делает больше запросов, чем '
+            'в baseline, или (с --max-slowdown) заметно медленнее.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument(
+            '--output', help='Сохранить результаты в JSON-файл.'
+        )
+        parser.add_argument(
+            '--baseline',
+            default=BASELINE,
+            help='JSON-файл прошлого запуска для сравнения '
+                 '(по умолчанию benchmarks/baseline.json).',
+        )
+        parser.add_argument(
+            '--no-baseline',
+            action='store_true',
+            help='Только замерить, без сравнения.',
+        )
+        parser.add_argument(
+            '--max-slowdown',
+            type=float,
+            help='Допустимый рост p50 в процентах относительно baseline; '
+                 'без параметра время только выводится.',
+        )
+        parser.add_argument(
+            '--user',
+            help='Email пользователя, от имени которого идут запросы; '
+                 'по умолчанию - с наибольшим числом подписок и непустой '
+                 'корзиной, при равенстве - с меньшим id.',
+        )
+        parser.add_argument(
+            '--no-cache',
+            action='store_true',
+            help='Отключить кэш ответов и версии (DummyCache).',
+        )
+        parser.add_argument(
+            '--explain',
+            action='store_true',
+            help='Вывести планы запросов списка рецептов и связей.',
+        )
+
+    def handle(self, *args, **options):
+        user = self.get_user(options['user'])
+        if user is None or not Recipe.objects.exists():
+            raise CommandError('Нет данных, запустите generate_data.')
+        token, _ = Token.objects.get_or_create(user=user)
+        self.client = Client(HTTP_AUTHORIZATION=f'Token {token.key}')
+        self.anonymous = Client()
+        self.iterations = options['iterations']
+        if options['explain']:
+            self.explain(user)
+            return
+
+        if options['no_cache']:
+            with override_settings(CACHES=NO_CACHE):
+                results = self.run_rolled_back(user)
+        else:
+            results = self.run_rolled_back(user)
+
+        baseline = {}
+        if not options['no_baseline']:
+            with open(options['baseline'], encoding='utf-8') as file:
+                baseline = json.load(file)
+        self.print_report(results, baseline)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(results, file, ensure_ascii=False, indent=2)
+        regressions = self.find_regressions(
+            results, baseline, options['max_slowdown']
+        )
+        if regressions:
+            raise CommandError(
+                'Регрессия относительно baseline:\n' + '\n'.join(regressions)
+            )
+
+    @staticmethod
+    def get_user(email):
+        if email:
+            return User.objects.filter(email=email).first()
+        return User.objects.annotate(
+            follows=Count('follower', distinct=True),
+            in_cart=Count('shopping_cart', distinct=True),
+        ).filter(in_cart__gt=0).order_by('-follows', 'id').first()
+
+    @staticmethod
+    def find_regressions(results, baseline, max_slowdown=None):
+        """Эндпоинты, которые стали делать больше SQL-запросов или
+        (если задан max_slowdown) медленнее по p50 больше чем
+        на max_slowdown процентов.
+        Returns:
+            list[str]: Описания регрессий.
+        """
+        regressions = []
+        for name, result in results.items():
+            previous = baseline.get(name)
+            if not previous:
+                continue
+            if result['queries'] > previous['queries']:
+                regressions.append(
+                    f'{name}: {result["queries"]} SQL-запросов, '
+                    f'в baseline {previous["queries"]}'
+                )
+            if max_slowdown is not None and result['p50_ms'] > (
+                previous['p50_ms'] * (1 + max_slowdown / 100)
+            ):
+                regressions.append(
+                    f'{name}: p50 {result["p50_ms"]} мс, '
+                    f'в baseline {previous["p50_ms"]} мс'
+                )
+        return regressions
+
+    def run_rolled_back(self, user):
+        """Запись рецептов меряется внутри транзакции, которая затем
+        откатывается, поэтому данные не меняются между запусками.
+        """
+        results = {}
+        try:
+            with transaction.atomic():
+                results = self.run(user)
+                raise Rollback
+        except Rollback:
+            pass
+        return results
+
+    def measure(self, client, method, url, **kwargs):
+        durations, queries = [], []
+        for _ in range(self.iterations):
+            with CaptureQueriesContext(connection) as context:
+                start = time.perf_counter()
+                response = getattr(client, method)(url, **kwargs)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+                durations.append((time.perf_counter() - start) * 1000)
+            if response.status_code >= 400:
+                raise CommandError(
+                    f'{method.upper()} {url}: {response.status_code}'
+                )
+            queries.append(len(context))
+        durations.sort()
+        return {
+            'p50_ms': round(statistics.median(durations), 2),
+            'p95_ms': round(
+                durations[round(0.95 * (len(durations) - 1))], 2
+            ),
+            'queries': max(queries),
+        }
+
+    def run(self, user):
+        tags = list(Tag.objects.values_list('slug', flat=True)[:2])
+        author = Recipe.objects.values_list('author_id', flat=True).first()
+        recipe_id = Recipe.objects.values_list('id', flat=True).first()
+        ingredients = list(
+            IngredientRecipe.objects.values_list(
+                'ingredient_id', flat=True
+            ).distinct()[:10]
+        )
+        tag_query = '&'.join(f'tags={slug}' for slug in tags)
+        list_filters = {
+            'none': '',
+            'tags': tag_query,
+            'author': f'author={author}',
+            'tags_author': f'{tag_query}&author={author}',
+            'favorited': 'is_favorited=1',
+            'in_cart': 'is_in_shopping_cart=1',
+            'favorited_tags': f'is_favorited=1&{tag_query}',
+            'not_in_cart': 'is_in_shopping_cart=0',
+            'popular': 'sort=popular',
+            'search': 'search=рецепт',
+            'cursor': 'pagination=cursor',
+        }
+        results = {}
+        for name, query in list_filters.items():
+            url = f'/api/recipes/?limit=6&{query}'
+            results[f'recipes.list.{name}'] = self.measure(
+                self.client, 'get', url
+            )
+        results['recipes.list.anonymous'] = self.measure(
+            self.anonymous, 'get', '/api/recipes/?limit=6'
+        )
+        results['recipes.list.limit50'] = self.measure(
+            self.client, 'get', '/api/recipes/?limit=50'
+        )
+        results['recipes.retrieve'] = self.measure(
+            self.client, 'get', f'/api/recipes/{recipe_id}/'
+        )
+        results['recipes.feed'] = self.measure(
+            self.client, 'get', '/api/recipes/feed/'
+        )
+        results['users.subscriptions'] = self.measure(
+            self.client, 'get', '/api/users/subscriptions/?recipes_limit=3'
+        )
+        results['ingredients.search'] = self.measure(
+            self.client, 'get', '/api/ingredients/?name=сах'
+        )
+        results['recipes.download_shopping_cart'] = self.measure(
+            self.client, 'get', '/api/recipes/download_shopping_cart/'
+        )
+        week = json.dumps({
+            'ids': list(Recipe.objects.values_list('id', flat=True)[:30])
+        })
+        results['recipes.shopping_cart_many.add'] = self.measure(
+            self.client, 'post', '/api/recipes/shopping_cart/',
+            data=week, content_type='application/json'
+        )
+        results['recipes.shopping_cart_many.remove'] = self.measure(
+            self.client, 'delete', '/api/recipes/shopping_cart/',
+            data=week, content_type='application/json'
+        )
+
+        payload = {
+            'ingredients': [
+                {'id': pk, 'amount': 10} for pk in ingredients
+            ],
+            'tags': list(Tag.objects.values_list('id', flat=True)[:2]),
+            'image': PIXEL,
+            'name': 'benchmark',
+            'text': 'benchmark',
+            'cooking_time': 10,
+        }
+        results['recipes.create'] = self.measure(
+            self.client, 'post', '/api/recipes/',
+            data=json.dumps(payload), content_type='application/json'
+        )
+        created = Recipe.objects.filter(
+            author=user, name='benchmark'
+        ).values_list('id', flat=True).first()
+        payload['ingredients'] = [
+            {'id': pk, 'amount': 20} for pk in reversed(ingredients[2:])
+        ]
+        results['recipes.update'] = self.measure(
+            self.client, 'patch', f'/api/recipes/{created}/',
+            data=json.dumps(payload), content_type='application/json'
+        )
+        return results
+
+    def explain(self, user):
+        """Планы запросов, которые должны обслуживаться индексами."""
+        recipe = Recipe.objects.first()
+        tag = Tag.objects.first()
+        querysets = {
+            'recipes.list': Recipe.objects.all()[:6],
+            'recipes.list.author': Recipe.objects.filter(
+                author=recipe.author_id
+            )[:6],
+            'recipes.list.tag': Recipe.objects.filter(
+                tags__slug__in=[tag.slug]
+            )[:6],
+            'recipes.list.popular': Recipe.objects.order_by(
+                '-favorites_count', '-id'
+            )[:6],
+            'recipes.list.favorited': Recipe.objects.filter(
+                in_favourites__user=user
+            )[:6],
+            'recipe.ingredients': IngredientRecipe.objects.filter(
+                recipe=recipe
+            ),
+            'recipe.favorited_by': Favorite.objects.filter(recipe=recipe),
+            'recipe.in_carts_of': ShoppingCart.objects.filter(recipe=recipe),
+            'user.followers': Follow.objects.filter(author=user),
+        }
+        for name, queryset in querysets.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            self.stdout.write(queryset.explain())
+
+    def print_report(self, results, baseline):
+        self.stdout.write(
+            f'{"endpoint":40} {"p50 ms":>9} {"p95 ms":>9} {"queries":>8}'
+        )
+        for name, result in results.items():
+            line = (f'{name:40} {result["p50_ms"]:9.2f} '
+                    f'{result["p95_ms"]:9.2f} {result["queries"]:8}')
+            previous = baseline.get(name)
+            if previous:
+                change = (result['p50_ms'] / previous['p50_ms'] - 1) * 100
+                line += (f'   p50 {change:+.0f}%, queries '
+                         f'{result["queries"] - previous["queries"]:+d}')
+                if result['queries'] > previous['queries']:
+                    line = self.style.ERROR(line)
+            self.stdout.write(line)
@@ -0,0 +1,84 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.core.signals import request_finished, request_started
+from django.db import connection
+
+MODES = {
+    'no-persistence': {'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False,
+                       'POOL_SIZE': 0},
+    'persistent': {'CONN_MAX_AGE': 60, 'CONN_HEALTH_CHECKS': False,
+                   'POOL_SIZE': 0},
+    'persistent+health-checks': {'CONN_MAX_AGE': 60,
+                                 'CONN_HEALTH_CHECKS': True,
+                                 'POOL_SIZE': 0},
+    'pool': {'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False,
+             'POOL_SIZE': 4},
+}
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает накладные расходы на соединение с БД при разных '
+            'настройках CONN_MAX_AGE, CONN_HEALTH_CHECKS и POOL_SIZE.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+
+    def handle(self, *args, **options):
+        original = {
+            key: connection.settings_dict.get(key) for key in MODES['pool']
+        }
+        custom_backend = hasattr(connection, 'pool_size')
+        self.stdout.write(
+            f'{"mode":28} {"p50 ms":>9} {"p95 ms":>9} {"connects":>9}'
+        )
+        try:
+            for name, mode in MODES.items():
+                needs_backend = mode['POOL_SIZE'] or mode['CONN_HEALTH_CHECKS']
+                if needs_backend and not custom_backend:
+                    self.stdout.write(
+                        f'{name:28} нужен ENGINE '
+                        'foodgram.db.backends.postgresql'
+                    )
+                    continue
+                connection.close()
+                connection.settings_dict.update(mode)
+                self.report(name, *self.run(options['requests']))
+        finally:
+            connection.close()
+            connection.settings_dict.update(original)
+
+    @staticmethod
+    def run(requests):
+        """Цикл запроса как в WSGI-обработчике: сигналы начала и конца
+        запроса (close_old_connections) и один запрос к БД между ними.
+        Returns:
+            tuple: Длительности в мс и число физических соединений
+            (разных серверных процессов PostgreSQL или открытий
+            соединения для других БД).
+        """
+        durations, connects = [], set()
+        for number in range(requests):
+            start = time.perf_counter()
+            request_started.send(sender=Command)
+            opened = connection.connection is None
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+                cursor.fetchone()
+            raw = connection.connection
+            if hasattr(raw, 'get_backend_pid'):
+                connects.add(raw.get_backend_pid())
+            elif opened:
+                connects.add(number)
+            request_finished.send(sender=Command)
+            durations.append((time.perf_counter() - start) * 1000)
+        durations.sort()
+        return durations, len(connects)
+
+    def report(self, name, durations, connects):
+        self.stdout.write(
+            f'{name:28} {statistics.median(durations):9.3f} '
+            f'{durations[round(0.95 * (len(durations) - 1))]:9.3f} '
+            f'{connects:9}'
+        )
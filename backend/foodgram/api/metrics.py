@@ -0,0 +1,147 @@
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+METRICS = ('queries', 'db_ms', 'serialize_ms', 'render_ms', 'total_ms',
+           'size')
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class RequestMetrics:
+    """Показатели одного запроса, собираемые middleware и вьюсетом."""
+
+    def __init__(self):
+        self.endpoint = None
+        self.queries = 0
+        self.db_time = 0.0
+        self.view_time = None
+        self.view_db_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.queries += 1
+
+
+class MetricsRegistry:
+    """Последние замеры по каждому эндпоинту в памяти процесса."""
+
+    def __init__(self, sample_size):
+        self._lock = threading.Lock()
+        self._samples = defaultdict(lambda: deque(maxlen=sample_size))
+
+    def record(self, endpoint, sample):
+        with self._lock:
+            self._samples[endpoint].append(sample)
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+
+    @staticmethod
+    def _percentile(values, percent):
+        index = round(percent / 100 * (len(values) - 1))
+        return values[index]
+
+    def report(self):
+        """Сводка p50/p95/max по каждому показателю эндпоинтов.
+        Returns:
+            dict: {endpoint: {'count': n, metric: {p50, p95, max}}}.
+        """
+        with self._lock:
+            samples = {
+                endpoint: list(values)
+                for endpoint, values in self._samples.items()
+            }
+        report = {}
+        for endpoint, values in sorted(samples.items()):
+            report[endpoint] = {'count': len(values)}
+            for metric in METRICS:
+                column = sorted(sample[metric] for sample in values)
+                report[endpoint][metric] = {
+                    'p50': self._percentile(column, 50),
+                    'p95': self._percentile(column, 95),
+                    'max': column[-1],
+                }
+        return report
+
+
+registry = MetricsRegistry(settings.METRICS_SAMPLE_SIZE)
+
+
+def check_query_budget(endpoint, queries, budget):
+    """Сообщает о превышении бюджета запросов к БД.
+    В зависимости от QUERY_BUDGET_ACTION пишет предупреждение в лог
+    или выбрасывает QueryBudgetExceeded (для тестов).
+    """
+    if budget is None or queries <= budget:
+        return
+    message = f'{endpoint}: {queries} SQL queries, budget is {budget}'
+    if settings.QUERY_BUDGET_ACTION == 'raise':
+        raise QueryBudgetExceeded(message)
+    logger.warning(message)
+
+
+def _milliseconds(seconds):
+    return round(seconds * 1000, 2)
+
+
+class QueryMetricsMiddleware:
+    """Считает SQL-запросы, время в БД, сериализации и рендеринга,
+    размер ответа. Отдаёт их в заголовке Server-Timing и сохраняет
+    в registry для отчёта.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.METRICS_ENABLED:
+            return self.get_response(request)
+        metrics = request.metrics = RequestMetrics()
+        start = time.perf_counter()
+        with connection.execute_wrapper(metrics):
+            response = self.get_response(request)
+        total = time.perf_counter() - start
+
+        view_time = metrics.view_time if metrics.view_time is not None \
+            else total
+        serialize = max(view_time - metrics.view_db_time, 0)
+        render = max(total - view_time - (metrics.db_time
+                                          - metrics.view_db_time), 0)
+        size = 0 if response.streaming else len(response.content)
+        endpoint = metrics.endpoint or self.get_endpoint(request)
+        response['Server-Timing'] = ', '.join((
+            f'db;dur={_milliseconds(metrics.db_time)}'
+            f';desc="{metrics.queries} queries"',
+            f'serialize;dur={_milliseconds(serialize)}',
+            f'render;dur={_milliseconds(render)}',
+            f'total;dur={_milliseconds(total)}',
+        ))
+        if endpoint:
+            registry.record(endpoint, {
+                'queries': metrics.queries,
+                'db_ms': _milliseconds(metrics.db_time),
+                'serialize_ms': _milliseconds(serialize),
+                'render_ms': _milliseconds(render),
+                'total_ms': _milliseconds(total),
+                'size': size,
+            })
+        return response
+
+    @staticmethod
+    def get_endpoint(request):
+        match = getattr(request, 'resolver_match', None)
+        return match.view_name if match else None
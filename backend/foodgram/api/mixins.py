@@ -1,35 +1,180 @@
-from typing import Union, Type
+import time
+from functools import partial
+from typing import Sequence, Type, Union
 
-from django.db import IntegrityError
+from django.db import transaction
+from django.utils.cache import (get_conditional_response,
+                                patch_vary_headers,
+                                quote_etag)
+from django.utils.http import http_date
 from rest_framework import status
-from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
 from rest_framework.serializers import ValidationError
 from rest_framework.viewsets import ModelViewSet
 
-from api.serializers import RecipeInfoSerializer
-from recipes.models import Recipe
+from api import cache as recipe_list_cache
+from api.metrics import check_query_budget
+from api.relations import (CREATED,
+                           DELETED,
+                           add_relation,
+                           add_relations,
+                           remove_relation,
+                           remove_relations)
+from api.serializers import BulkIdsSerializer, ShortRecipeSerializer
+from api.versions import get_etag_and_last_modified
+from recipes import cart
+from recipes.models import Favorite, ShoppingCart
 from users.models import Follow
 
 
+class QueryBudgetMixin:
+    """Замеры вьюсета для QueryMetricsMiddleware и бюджет SQL-запросов.
+    query_budget - словарь {action: максимум запросов}, включая
+    запрос аутентификации и SAVEPOINT/RELEASE вложенных транзакций
+    (в тестах каждый atomic() - точка сохранения).
+    """
+    query_budget = {}
+
+    def initial(self, request, *args, **kwargs):
+        metrics = getattr(request, 'metrics', None)
+        if metrics is not None:
+            metrics.endpoint = f'{type(self).__name__}.{self.action}'
+            self._view_started = time.perf_counter()
+            self._view_db_started = metrics.db_time
+        super().initial(request, *args, **kwargs)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs
+        )
+        metrics = getattr(request, 'metrics', None)
+        if metrics is not None and hasattr(self, '_view_started'):
+            metrics.view_time = time.perf_counter() - self._view_started
+            metrics.view_db_time = metrics.db_time - self._view_db_started
+            check_query_budget(
+                metrics.endpoint,
+                metrics.queries,
+                self.get_query_budget(request)
+            )
+        return response
+
+    def get_query_budget(self, request):
+        return self.query_budget.get(self.action)
+
+
+class ConditionalGetMixin:
+    """Поддержка условных GET-запросов (ETag, Last-Modified, 304).
+    Ответ 304 отдаётся до обращения к БД и сериализации:
+    ETag строится по версиям моделей из conditional_models.
+    """
+    conditional_models = ()
+    conditional_user_models = ()
+    conditional_actions = ('list', 'retrieve')
+
+    def get_conditional_headers(self, request):
+        models = self.conditional_models
+        extra = ()
+        if request.user.is_authenticated:
+            models += self.conditional_user_models
+            extra = (request.user.pk,)
+        etag, last_modified = get_etag_and_last_modified(models, *extra)
+        return quote_etag(etag), last_modified
+
+    def dispatch_conditional(self, handler, request, *args, **kwargs):
+        etag, last_modified = self.get_conditional_headers(request)
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(last_modified)
+            if self.conditional_user_models:
+                patch_vary_headers(response, ('Authorization',))
+        return response
+
+    def list(self, request, *args, **kwargs):
+        if 'list' not in self.conditional_actions:
+            return super().list(request, *args, **kwargs)
+        return self.dispatch_conditional(
+            super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        if 'retrieve' not in self.conditional_actions:
+            return super().retrieve(request, *args, **kwargs)
+        return self.dispatch_conditional(
+            super().retrieve, request, *args, **kwargs
+        )
+
+
+class BulkRelationMixin:
+    """Массовое добавление (POST) и удаление (DELETE) связей текущего
+    пользователя с объектами по списку {"ids": [...]}. Ответ - итог
+    по каждому id, отсутствующие объекты не прерывают операцию.
+    """
+
+    def change_relations(self, model, target_name, counter_field,
+                         on_change=None, rejected=()):
+        """Добавляет или удаляет связи по списку id из тела запроса.
+        Args:
+            model (Type[Model]): Модель связи с полем user.
+            target_name (str): Имя внешнего ключа на объект связи.
+            counter_field (str): Счётчик связей у объекта.
+            on_change (Callable | None): Вызывается в той же транзакции
+                с id добавленных или удалённых объектов, если они есть.
+            rejected (Collection[int]): id, которые нельзя добавить:
+                получают статус rejected.
+        Returns:
+            Response: {"results": [{"id": ..., "status": ...}]}.
+        """
+        serializer = BulkIdsSerializer(data=self.request.data)
+        serializer.is_valid(raise_exception=True)
+        pks = serializer.validated_data['ids']
+        match self.request.method:
+            case 'POST':
+                change = partial(add_relations, rejected=rejected)
+            case 'DELETE':
+                change = remove_relations
+            case _:
+                raise ValidationError({'errors': 'Неверный метод'})
+        with transaction.atomic():
+            results = change(
+                model, self.request.user, target_name, pks, counter_field
+            )
+            changed = [
+                pk for pk, result in results.items()
+                if result in (CREATED, DELETED)
+            ]
+            if changed and on_change is not None:
+                on_change(changed)
+        return Response({
+            'results': [
+                {'id': pk, 'status': result}
+                for pk, result in results.items()
+            ]
+        })
+
+
 class CreateAndDeleteMixin:
     def create_and_delete_related(self: ModelViewSet,
                                   pk: int,
                                   klass: Union[Type[Follow]],
                                   create_failed_message: str,
                                   delete_failed_message: str,
-                                  field_to_create_or_delete_name: str, ):
-        self_qs_odj = get_object_or_404(self.get_queryset(), pk=pk)
-        kwargs = {
-            'user': self.request.user,
-            field_to_create_or_delete_name: self_qs_odj
-        }
+                                  field_to_create_or_delete_name: str,
+                                  counter_field: str,
+                                  response_fields: Sequence[str], ):
         match self.request.method:
             case 'POST':
-                try:
-                    klass.objects.create(**kwargs)
-                except IntegrityError:
+                self_qs_odj = add_relation(
+                    klass, self.request.user, field_to_create_or_delete_name,
+                    pk, counter_field, response_fields
+                )
+                if self_qs_odj is None:
                     raise ValidationError({'errors': create_failed_message})
+                self_qs_odj.is_subscribed = True
 
                 context = self.get_serializer_context()
                 serializer = self.get_serializer_class()
@@ -42,11 +187,11 @@ class CreateAndDeleteMixin:
                 )
 
             case 'DELETE':
-                klass_obj = klass.objects.filter(**kwargs).first()
-                if klass_obj is None:
+                if not remove_relation(
+                    klass, self.request.user, field_to_create_or_delete_name,
+                    pk, counter_field
+                ):
                     raise ValidationError({'errors': delete_failed_message})
-                else:
-                    klass_obj.delete()
 
                 response = Response(status=status.HTTP_204_NO_CONTENT)
 
@@ -57,23 +202,47 @@ class CreateAndDeleteMixin:
 
 
 class CustomRecipeModelViewSet(ModelViewSet):
+    counter_fields = {
+        Favorite: 'favorites_count',
+        ShoppingCart: 'in_carts_count',
+    }
+    short_recipe_fields = (
+        'id', 'name', 'image', 'cooking_time', 'image_thumbnails_ready'
+    )
+
     def add_obj(self, model, user, pk):
-        recipe = get_object_or_404(Recipe, id=pk)
-        if model.objects.filter(user=user, recipe=recipe).exists():
+        with transaction.atomic():
+            recipe = add_relation(
+                model, user, 'recipe', pk,
+                self.counter_fields[model], self.short_recipe_fields
+            )
+            if recipe is not None and model is ShoppingCart:
+                cart.add_recipes(user.pk, [recipe.pk])
+            if recipe is not None and model is Favorite:
+                transaction.on_commit(recipe_list_cache.invalidate_popular)
+        if recipe is None:
             return Response(
-                {'errors': f'{recipe} уже добавлен в {model}'},
+                {'errors': f'Рецепт {pk} уже добавлен в '
+                           f'{model._meta.verbose_name}'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        model.objects.create(user=user, recipe=recipe)
-        serializer = RecipeInfoSerializer(recipe)
+        serializer = ShortRecipeSerializer(
+            recipe, context=self.get_serializer_context()
+        )
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     def del_obj(self, model, pk, user):
-        recipe = get_object_or_404(Recipe, id=pk)
-        if not model.objects.filter(user=user, recipe=recipe).exists():
+        with transaction.atomic():
+            deleted = remove_relation(model, user, 'recipe', pk,
+                                      self.counter_fields[model])
+            if deleted and model is ShoppingCart:
+                cart.remove_recipes(user.pk, [pk])
+            if deleted and model is Favorite:
+                transaction.on_commit(recipe_list_cache.invalidate_popular)
+        if not deleted:
             return Response(
-                {'errors': f'{recipe} не добавлен в {model}'},
+                {'errors': f'Рецепт {pk} не добавлен в '
+                           f'{model._meta.verbose_name}'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        model.objects.get(user=user, recipe=recipe).delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
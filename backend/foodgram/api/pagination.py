@@ -1,6 +1,192 @@
-from rest_framework.pagination import PageNumberPagination
+from base64 import b64decode, b64encode
+from collections import OrderedDict
+from datetime import datetime
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import (BasePagination,
+                                       CursorPagination,
+                                       PageNumberPagination,
+                                       _positive_int)
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 
 class LimitPagePagination(PageNumberPagination):
     page_size = 6
     page_size_query_param = 'limit'
+
+
+def get_queryset_ordering(queryset):
+    """Действующий порядок queryset: order_by или порядок из Meta.
+    Returns:
+        tuple: Имена полей и выражения сортировки.
+    """
+    query = queryset.query
+    if query.order_by:
+        return tuple(query.order_by)
+    if query.default_ordering:
+        return tuple(query.get_meta().ordering)
+    return ()
+
+
+def get_ordering_fields(queryset):
+    """Поля из порядка queryset без знака направления: их значения
+    нужны в строках values() для позиции курсора.
+    """
+    return [
+        field.lstrip('-') for field in get_queryset_ordering(queryset)
+        if isinstance(field, str)
+    ]
+
+
+class LimitCursorPagination(CursorPagination):
+    """Пагинация по курсору: страница N стоит столько же, сколько первая,
+    COUNT(*) не выполняется. Порядок берётся из queryset (сортировка
+    по умолчанию, sort=popular), так что страницы совпадают
+    с постраничным режимом.
+    """
+    page_size = 6
+    page_size_query_param = 'limit'
+    invalid_ordering_message = (
+        'Пагинация по курсору недоступна для этой сортировки.'
+    )
+
+    def get_ordering(self, request, queryset, view):
+        """Порядок страниц - порядок самого queryset.
+        Raises:
+            ValidationError: Порядок задан выражением, например
+                релевантностью поиска: позицию по нему не сохранить.
+        """
+        ordering = get_queryset_ordering(queryset)
+        if not ordering or not all(
+            isinstance(field, str) for field in ordering
+        ):
+            raise ValidationError(
+                {'pagination': [self.invalid_ordering_message]}
+            )
+        return ordering
+
+
+class OptInCursorPagination(BasePagination):
+    """Пагинация page/limit по умолчанию, по курсору - при
+    ?pagination=cursor. Ссылки next/previous сохраняют этот параметр.
+    """
+    mode_query_param = 'pagination'
+    page_number_pagination_class = LimitPagePagination
+    cursor_pagination_class = LimitCursorPagination
+
+    def __init__(self):
+        self.paginator = self.page_number_pagination_class()
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if request.query_params.get(self.mode_query_param) == 'cursor':
+            self.paginator = self.cursor_pagination_class()
+        return self.paginator.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema):
+        return self.paginator.get_paginated_response_schema(schema)
+
+    def get_results(self, data):
+        return self.paginator.get_results(data)
+
+    def to_html(self):
+        return self.paginator.to_html()
+
+    @property
+    def display_page_controls(self):
+        return getattr(self.paginator, 'display_page_controls', False)
+
+
+class SubscriptionCursorPagination(CursorPagination):
+    page_size_query_param = 'limit'
+    ordering = '-id'
+
+
+class SubscriptionPagination(OptInCursorPagination):
+    page_number_pagination_class = PageNumberPagination
+    cursor_pagination_class = SubscriptionCursorPagination
+
+
+class FeedKeysetPagination(BasePagination):
+    """Keyset-пагинация ленты по убыванию (feed_date, id): следующая
+    страница начинается строго после последней записи текущей, без
+    OFFSET и COUNT(*), поэтому новые рецепты не сдвигают страницы.
+    Элементы - словари из values() с ключами feed_date и id.
+    """
+    page_size = 6
+    page_size_query_param = 'limit'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Неверный курсор'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        position = self.decode_cursor(request)
+        if position is not None:
+            feed_date, pk = position
+            queryset = queryset.filter(
+                Q(feed_date__lt=feed_date) | Q(feed_date=feed_date, id__lt=pk)
+            )
+        rows = list(queryset.order_by('-feed_date', '-id')[:page_size + 1])
+        page = rows[:page_size]
+        self.next_position = None
+        if len(rows) > page_size:
+            self.next_position = (page[-1]['feed_date'], page[-1]['id'])
+        return page
+
+    def get_page_size(self, request):
+        try:
+            return _positive_int(
+                request.query_params[self.page_size_query_param],
+                strict=True,
+                cutoff=self.max_page_size
+            )
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            feed_date, pk = b64decode(
+                encoded.encode('ascii'), altchars=b'-_'
+            ).decode('ascii').split('|')
+            return datetime.fromisoformat(feed_date), int(pk)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        feed_date, pk = self.next_position
+        encoded = b64encode(
+            f'{feed_date.isoformat()}|{pk}'.encode('ascii'), altchars=b'-_'
+        ).decode('ascii')
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            encoded
+        )
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', None),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'previous': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
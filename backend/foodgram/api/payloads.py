@@ -0,0 +1,112 @@
+from collections import defaultdict
+
+from recipes.models import IngredientRecipe, Recipe
+from recipes.thumbnails import get_thumbnail_urls_by_name
+
+RECIPE_FIELDS = (
+    'id', 'name', 'text', 'cooking_time', 'image', 'image_thumbnails_ready',
+    'author_id', 'author__email', 'author__username', 'author__first_name',
+    'author__last_name',
+)
+USER_FLAGS = ('is_favorited', 'is_in_shopping_cart', 'author_is_subscribed')
+
+
+def recipe_rows(queryset, *extra):
+    """Строки рецептов для render_recipes вместо объектов модели.
+    Args:
+        queryset (QuerySet[Recipe]): Отфильтрованный queryset, возможно
+            с флагами из with_user_flags.
+        *extra (str): Дополнительные поля, например для пагинации.
+    Returns:
+        QuerySet[dict]: values() с полями рецепта, автора и флагами.
+    """
+    flags = [
+        name for name in USER_FLAGS if name in queryset.query.annotations
+    ]
+    return queryset.prefetch_related(None).values(
+        *RECIPE_FIELDS, *flags, *extra
+    )
+
+
+def _tags_by_recipe(recipe_ids):
+    tags = defaultdict(list)
+    rows = Recipe.tags.through.objects.filter(
+        recipe_id__in=recipe_ids
+    ).order_by('tag_id').values_list(
+        'recipe_id', 'tag_id', 'tag__name', 'tag__color', 'tag__slug'
+    )
+    for recipe_id, tag_id, name, color, slug in rows:
+        tags[recipe_id].append(
+            {'id': tag_id, 'name': name, 'color': color, 'slug': slug}
+        )
+    return tags
+
+
+def _ingredients_by_recipe(recipe_ids):
+    ingredients = defaultdict(list)
+    rows = IngredientRecipe.objects.filter(
+        recipe_id__in=recipe_ids
+    ).order_by('ingredient_id').values_list(
+        'recipe_id', 'ingredient_id', 'ingredient__name',
+        'ingredient__measurement_unit', 'amount'
+    )
+    for recipe_id, ingredient_id, name, unit, amount in rows:
+        ingredients[recipe_id].append({
+            'id': ingredient_id,
+            'name': name,
+            'measurement_unit': unit,
+            'amount': amount,
+        })
+    return ingredients
+
+
+def render_recipes(rows, request):
+    """Рецепты в формате RecipeListSerializer без сериализаторов DRF:
+    словари собираются прямо из строк recipe_rows, теги и ингредиенты
+    загружаются двумя запросами на всю страницу.
+    Args:
+        rows (list[dict]): Строки из recipe_rows.
+        request (Request): Текущий запрос, для флагов и абсолютных ссылок.
+    Returns:
+        list[dict]: Данные ответа в порядке rows.
+    """
+    recipe_ids = [row['id'] for row in rows]
+    tags = _tags_by_recipe(recipe_ids)
+    ingredients = _ingredients_by_recipe(recipe_ids)
+    storage = Recipe._meta.get_field('image').storage
+    absolute = request.build_absolute_uri
+    anonymous = request.user.is_anonymous
+    result = []
+    for row in rows:
+        image = row['image']
+        thumbnails = get_thumbnail_urls_by_name(
+            image, row['image_thumbnails_ready'], storage
+        )
+        result.append({
+            'id': row['id'],
+            'tags': tags[row['id']],
+            'ingredients': ingredients[row['id']],
+            'author': {
+                'email': row['author__email'],
+                'id': row['author_id'],
+                'username': row['author__username'],
+                'first_name': row['author__first_name'],
+                'last_name': row['author__last_name'],
+                'is_subscribed': (
+                    not anonymous and row['author_is_subscribed']
+                ),
+            },
+            'image': absolute(storage.url(image)) if image else None,
+            'image_thumbnails': {
+                size_name: absolute(url)
+                for size_name, url in thumbnails.items()
+            },
+            'is_in_shopping_cart': (
+                not anonymous and row['is_in_shopping_cart']
+            ),
+            'is_favorited': not anonymous and row['is_favorited'],
+            'name': row['name'],
+            'text': row['text'],
+            'cooking_time': row['cooking_time'],
+        })
+    return result
@@ -0,0 +1,263 @@
+from django.db import connections, router, transaction
+from django.db.models.sql import DeleteQuery, InsertQuery
+from django.http import Http404
+
+from api.versions import bump_version
+from recipes.counters import (can_return_rows,
+                              increment,
+                              increment_many,
+                              increment_returning)
+
+# Результаты массовых операций по каждому id.
+CREATED = 'created'
+DELETED = 'deleted'
+EXISTS = 'exists'
+MISSING = 'missing'
+NOT_FOUND = 'not_found'
+REJECTED = 'rejected'
+
+
+def _insert_statements(objs, connection):
+    model = type(objs[0])
+    fields = [
+        field for field in model._meta.concrete_fields
+        if not field.primary_key
+    ]
+    batch_size = max(connection.ops.bulk_batch_size(fields, objs), 1)
+    for start in range(0, len(objs), batch_size):
+        query = InsertQuery(model, ignore_conflicts=True)
+        query.insert_values(fields, objs[start:start + batch_size])
+        yield from query.get_compiler(connection=connection).as_sql()
+
+
+def insert_ignore(objs):
+    """Вставляет объекты, пропуская нарушения уникальности
+    (ON CONFLICT DO NOTHING / INSERT OR IGNORE). В отличие
+    от bulk_create(ignore_conflicts=True) сообщает, сколько строк
+    добавлено. Сигналы post_save не отправляются.
+    Args:
+        objs (list[Model]): Несохранённые объекты одной модели.
+    Returns:
+        int: Количество вставленных строк.
+    """
+    if not objs:
+        return 0
+    connection = connections[router.db_for_write(type(objs[0]))]
+    inserted = 0
+    with connection.cursor() as cursor:
+        for sql, params in _insert_statements(objs, connection):
+            cursor.execute(sql, params)
+            inserted += cursor.rowcount
+    return inserted
+
+
+def insert_ignore_returning(objs, field_name):
+    """Как insert_ignore, но сообщает, какие именно строки вставлены:
+    RETURNING в PostgreSQL и SQLite 3.35+, в остальных БД объекты
+    вставляются по одному.
+    Args:
+        objs (list[Model]): Несохранённые объекты одной модели.
+        field_name (str): Поле, значения которого вернуть.
+    Returns:
+        list: Значения field_name вставленных строк.
+    """
+    if not objs:
+        return []
+    model = type(objs[0])
+    field = model._meta.get_field(field_name)
+    connection = connections[router.db_for_write(model)]
+    if not can_return_rows(connection):
+        return [
+            getattr(obj, field.attname) for obj in objs
+            if insert_ignore([obj])
+        ]
+    column = connection.ops.quote_name(field.column)
+    values = []
+    with connection.cursor() as cursor:
+        for sql, params in _insert_statements(objs, connection):
+            cursor.execute(f'{sql} RETURNING {column}', params)
+            values.extend(row[0] for row in cursor.fetchall())
+    return values
+
+
+def delete_returning(queryset, field_name):
+    """Удаляет строки queryset одним DELETE без сигналов и каскадов
+    и возвращает значения field_name удалённых строк. Без поддержки
+    RETURNING строки удаляются по одной.
+    Args:
+        queryset (QuerySet): Строки одной таблицы без связей.
+        field_name (str): Поле, значения которого вернуть.
+    Returns:
+        list: Значения field_name удалённых строк.
+    """
+    field = queryset.model._meta.get_field(field_name)
+    connection = connections[queryset.db]
+    if not can_return_rows(connection):
+        return [
+            value
+            for value in queryset.values_list(field.attname, flat=True)
+            if queryset.filter(**{field.attname: value})._raw_delete(
+                queryset.db
+            )
+        ]
+    query = queryset.query.chain(DeleteQuery)
+    sql, params = query.get_compiler(connection=connection).as_sql()
+    column = connection.ops.quote_name(field.column)
+    with connection.cursor() as cursor:
+        cursor.execute(f'{sql} RETURNING {column}', params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _target_model(model, target_name):
+    return model._meta.get_field(target_name).related_model
+
+
+def _check_pk(pk):
+    if not str(pk).isdigit():
+        raise Http404
+
+
+def add_relation(model, user, target_name, pk, counter_field, fields):
+    """Идемпотентно добавляет связь пользователя с объектом
+    (избранное, список покупок, подписка): INSERT с пропуском
+    дубликата и UPDATE счётчика, возвращающий поля объекта для ответа.
+    Повторный или параллельный запрос не создаёт второй строки
+    и не меняет счётчик. Внутри внешней транзакции точка сохранения
+    не создаётся: ошибка откатывает всю транзакцию.
+    Args:
+        model (Type[Model]): Модель связи с полем user.
+        user (User): Текущий пользователь.
+        target_name (str): Имя внешнего ключа на объект связи.
+        pk: Первичный ключ объекта.
+        counter_field (str): Счётчик связей у объекта.
+        fields (Iterable[str]): Поля объекта для ответа.
+    Returns:
+        Model | None: Объект или None, если связь уже была.
+    Raises:
+        Http404: Объекта нет.
+    """
+    _check_pk(pk)
+    with transaction.atomic(savepoint=False):
+        if not insert_ignore([model(user=user, **{f'{target_name}_id': pk})]):
+            return None
+        # Внешние ключи проверяются при фиксации, поэтому отсутствие
+        # объекта видно по UPDATE, а откат отменяет вставку.
+        target = increment_returning(
+            _target_model(model, target_name), pk, counter_field, 1, fields
+        )
+        if target is None:
+            raise Http404
+        transaction.on_commit(lambda: bump_version(model))
+    return target
+
+
+def remove_relation(model, user, target_name, pk, counter_field):
+    """Удаляет связь одним DELETE и уменьшает счётчик, только если
+    строка действительно была удалена.
+    Args:
+        model (Type[Model]): Модель связи с полем user.
+        user (User): Текущий пользователь.
+        target_name (str): Имя внешнего ключа на объект связи.
+        pk: Первичный ключ объекта.
+        counter_field (str): Счётчик связей у объекта.
+    Returns:
+        bool: True, если связь была удалена.
+    Raises:
+        Http404: Объекта нет.
+    """
+    _check_pk(pk)
+    target_model = _target_model(model, target_name)
+    with transaction.atomic(savepoint=False):
+        deleted, _ = model.objects.filter(
+            user=user, **{f'{target_name}_id': pk}
+        ).delete()
+        if deleted:
+            increment(target_model, pk, counter_field, -1)
+            transaction.on_commit(lambda: bump_version(model))
+    if not deleted and not target_model.objects.filter(pk=pk).exists():
+        raise Http404
+    return bool(deleted)
+
+
+def _found_pks(target_model, pks):
+    return set(target_model.objects.filter(
+        pk__in=pks
+    ).values_list('pk', flat=True))
+
+
+def add_relations(model, user, target_name, pks, counter_field,
+                  rejected=()):
+    """Массовый вариант add_relation: проверка объектов одним
+    запросом, вставка одним INSERT с пропуском дубликатов
+    и счётчики одним UPDATE.
+    Args:
+        model (Type[Model]): Модель связи с полем user.
+        user (User): Текущий пользователь.
+        target_name (str): Имя внешнего ключа на объект связи.
+        pks (list[int]): Первичные ключи объектов без повторов.
+        counter_field (str): Счётчик связей у объекта.
+        rejected (Collection[int]): Объекты, связь с которыми
+            недопустима, например подписка на себя.
+    Returns:
+        dict: Результат по каждому pk в порядке pks: CREATED, EXISTS,
+        NOT_FOUND или REJECTED.
+    Raises:
+        Http404: Объект удалён во время запроса.
+    """
+    target_model = _target_model(model, target_name)
+    with transaction.atomic(savepoint=False):
+        found = _found_pks(
+            target_model, [pk for pk in pks if pk not in rejected]
+        )
+        created = set(insert_ignore_returning(
+            [
+                model(user=user, **{f'{target_name}_id': pk})
+                for pk in pks if pk in found
+            ],
+            target_name
+        ))
+        if created:
+            if increment_many(
+                target_model, created, counter_field, 1
+            ) != len(created):
+                raise Http404
+            transaction.on_commit(lambda: bump_version(model))
+    return {
+        pk: REJECTED if pk in rejected else CREATED if pk in created
+        else EXISTS if pk in found else NOT_FOUND
+        for pk in pks
+    }
+
+
+def remove_relations(model, user, target_name, pks, counter_field):
+    """Массовый вариант remove_relation: удаление одним DELETE,
+    счётчики одним UPDATE. Объекты проверяются, только если часть
+    связей не нашлась.
+    Args:
+        model (Type[Model]): Модель связи с полем user.
+        user (User): Текущий пользователь.
+        target_name (str): Имя внешнего ключа на объект связи.
+        pks (list[int]): Первичные ключи объектов без повторов.
+        counter_field (str): Счётчик связей у объекта.
+    Returns:
+        dict: Результат по каждому pk в порядке pks: DELETED, MISSING
+        (связи не было) или NOT_FOUND.
+    """
+    target_model = _target_model(model, target_name)
+    with transaction.atomic(savepoint=False):
+        deleted = set(delete_returning(
+            model.objects.filter(
+                user=user, **{f'{target_name}__in': pks}
+            ),
+            target_name
+        ))
+        if deleted:
+            increment_many(target_model, deleted, counter_field, -1)
+            transaction.on_commit(lambda: bump_version(model))
+    rest = [pk for pk in pks if pk not in deleted]
+    found = _found_pks(target_model, rest) if rest else set()
+    return {
+        pk: DELETED if pk in deleted else MISSING if pk in found
+        else NOT_FOUND
+        for pk in pks
+    }
@@ -1,10 +1,12 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
-from django.db.models import F
-from django.shortcuts import get_object_or_404
+from django.db import transaction
 from djoser.serializers import UserCreateSerializer
 from drf_extra_fields.fields import Base64ImageField
-from rest_framework.serializers import (ModelSerializer,
+from rest_framework.serializers import (ListField,
+                                        ModelSerializer,
+                                        Serializer,
                                         SerializerMethodField,
                                         ReadOnlyField,
                                         IntegerField, ImageField)
@@ -15,6 +17,8 @@ from recipes.models import (Favorite,
                             Recipe,
                             ShoppingCart,
                             Tag)
+from recipes import cart
+from recipes.thumbnails import get_thumbnail_urls, schedule_thumbnails
 from users.models import Follow
 
 User = get_user_model()
@@ -40,17 +44,46 @@ class UserRegistrationSerializer(UserCreateSerializer):
         return user
 
 
-class ShortRecipeSerializer(ModelSerializer):
+class ImageThumbnailsMixin:
+    """Ссылки на уменьшенные копии изображения рецепта."""
+
+    def get_image_thumbnails(self, recipe: Recipe) -> dict:
+        urls = get_thumbnail_urls(recipe)
+        request = self.context.get('request')
+        if request is None:
+            return urls
+        return {
+            size_name: request.build_absolute_uri(url)
+            for size_name, url in urls.items()
+        }
+
+
+class ShortRecipeSerializer(ImageThumbnailsMixin, ModelSerializer):
     """Сериализатор для модели Recipe.
     Определён укороченный набор полей для некоторых эндпоинтов.
     """
+    image_thumbnails = SerializerMethodField()
 
     class Meta:
         model = Recipe
-        fields = 'id', 'name', 'image', 'cooking_time'
+        fields = 'id', 'name', 'image', 'image_thumbnails', 'cooking_time'
         read_only_fields = '__all__',
 
 
+class BulkIdsSerializer(Serializer):
+    """Список id для массовых операций с избранным, корзиной
+    и подписками. Повторы отбрасываются с сохранением порядка.
+    """
+    ids = ListField(
+        child=IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.BULK_RELATIONS_MAX_IDS,
+    )
+
+    def validate_ids(self, value):
+        return list(dict.fromkeys(value))
+
+
 class UsersSerializer(ModelSerializer):
     """Сериализатор для использования с моделью User.
     """
@@ -82,8 +115,9 @@ class UsersSerializer(ModelSerializer):
         user = self.context.get('request').user
         if user.is_anonymous:
             return False
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         return user.follower.filter(author=obj).exists()
-        # return Follow.objects.filter(user=user, author=obj.author).exists()
 
     def create(self, validated_data: dict) -> User:
         """ Создаёт нового пользователя с запрошенными полями.
@@ -116,17 +150,24 @@ class FollowUserSerializer(ModelSerializer):
         user = self.context.get('request').user
         if user.is_anonymous:
             return False
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         return Follow.objects.filter(user=user, author=obj.author).exists()
 
     def get_recipes(self, obj):
-        request = self.context.get('request')
-        recipes_limit = request.GET.get('recipes_limit')
-        queryset = Recipe.objects.filter(author=obj.author)
-        if recipes_limit:
-            queryset = queryset[:int(recipes_limit)]
+        if hasattr(obj.author, 'recipes_preview'):
+            queryset = obj.author.recipes_preview
+        else:
+            request = self.context.get('request')
+            recipes_limit = request.GET.get('recipes_limit')
+            queryset = Recipe.objects.filter(author=obj.author)
+            if recipes_limit:
+                queryset = queryset[:int(recipes_limit)]
         return FollowRecipeSerializer(queryset, many=True).data
 
     def get_recipes_count(self, obj):
+        if hasattr(obj, 'recipes_count'):
+            return obj.recipes_count
         return Recipe.objects.filter(author=obj.author).count()
 
 
@@ -136,10 +177,12 @@ class UserEditSerializer(ModelSerializer):
         model = User
 
 
-class FollowRecipeSerializer(ModelSerializer):
+class FollowRecipeSerializer(ImageThumbnailsMixin, ModelSerializer):
+    image_thumbnails = SerializerMethodField()
+
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_thumbnails', 'cooking_time')
 
 
 class TagSerializer(ModelSerializer):
@@ -159,38 +202,75 @@ class RecipeInfoSerializer(ModelSerializer):
 
     class Meta:
         model = Recipe
-        fields = '__all__'
+        fields = (
+            'id',
+            'image',
+            'author',
+            'name',
+            'text',
+            'cooking_time',
+            'ingredients',
+            'tags',
+        )
 
 
-class RecipeListSerializer(ModelSerializer):
+class RecipeListSerializer(ImageThumbnailsMixin, ModelSerializer):
     tags = TagSerializer(many=True, read_only=True)
     ingredients = SerializerMethodField()
     author = UsersSerializer(read_only=True)
     image = Base64ImageField()
+    image_thumbnails = SerializerMethodField()
     is_in_shopping_cart = SerializerMethodField(read_only=True)
     is_favorited = SerializerMethodField(read_only=True)
 
     class Meta:
         model = Recipe
-        fields = '__all__'
+        fields = (
+            'id',
+            'tags',
+            'ingredients',
+            'author',
+            'image',
+            'image_thumbnails',
+            'is_in_shopping_cart',
+            'is_favorited',
+            'name',
+            'text',
+            'cooking_time',
+        )
+
+    def to_representation(self, recipe: Recipe):
+        # Флаг подписки аннотирован на рецепте (см. with_user_flags),
+        # передаём его автору, чтобы UsersSerializer не делал запрос.
+        if hasattr(recipe, 'author_is_subscribed'):
+            recipe.author.is_subscribed = recipe.author_is_subscribed
+        return super().to_representation(recipe)
 
     def get_ingredients(self, recipe: Recipe):
-        ingredients = recipe.ingredients.values(
-            'id', 'name', 'measurement_unit',
-            amount=F('ingredientrecipe__amount')
-        )
-        return ingredients
+        return [
+            {
+                'id': item.ingredient.id,
+                'name': item.ingredient.name,
+                'measurement_unit': item.ingredient.measurement_unit,
+                'amount': item.amount,
+            }
+            for item in recipe.ingredients_list.all()
+        ]
 
     def get_is_favorited(self, recipe):
         user = self.context.get('request').user
         if user.is_anonymous:
             return False
+        if hasattr(recipe, 'is_favorited'):
+            return recipe.is_favorited
         return Favorite.objects.filter(user=user, recipe=recipe.id).exists()
 
     def get_is_in_shopping_cart(self, recipe):
         user = self.context.get('request').user
         if user.is_anonymous:
             return False
+        if hasattr(recipe, 'is_in_shopping_cart'):
+            return recipe.is_in_shopping_cart
         return ShoppingCart.objects.filter(user=user,
                                            recipe=recipe.id).exists()
 
@@ -216,10 +296,15 @@ class CreateRecipeSerializer(ModelSerializer):
         fields = '__all__'
 
     def to_representation(self, instance):
+        request = self.context.get('request')
+        # Перечитываем рецепт: кэш prefetch после записи устаревает.
+        instance = Recipe.objects.with_related().with_user_flags(
+            request.user
+        ).get(pk=instance.pk)
         return RecipeListSerializer(
             instance,
             context={
-                'request': self.context.get('request'),
+                'request': request,
             }
         ).data
 
@@ -238,25 +323,73 @@ class CreateRecipeSerializer(ModelSerializer):
                 )
             ingredients_contain[ingredient.get('id')] = ingredient.get(
                 'amount')
+
+        existing = Ingredient.objects.in_bulk(list(ingredients_contain))
+        unknown = [pk for pk in ingredients_contain if pk not in existing]
+        if unknown:
+            raise ValidationError(
+                'Ингредиенты не найдены: '
+                f'{", ".join(str(pk) for pk in unknown)}'
+            )
         return value
 
     @staticmethod
     def create_ingredients(ingredients_set, recipe):
-        ingredients = []
-        for ingredient in ingredients_set:
-            ingredient_name = get_object_or_404(
-                Ingredient,
-                pk=ingredient.get('id')
+        IngredientRecipe.objects.bulk_create(
+            IngredientRecipe(
+                recipe=recipe,
+                ingredient_id=ingredient.get('id'),
+                amount=ingredient.get('amount')
             )
-            ingredients.append(
-                IngredientRecipe(
-                    recipe=recipe,
-                    ingredient=ingredient_name,
-                    amount=ingredient.get('amount')
-                )
+            for ingredient in ingredients_set
+        )
+
+    @staticmethod
+    def update_ingredients(ingredients_set, recipe):
+        """Приводит ингредиенты рецепта к новому набору.
+        Удаляются, добавляются и обновляются только изменившиеся строки.
+        Returns:
+            dict: Изменение количества по id ингредиента.
+        """
+        new_amounts = {
+            ingredient.get('id'): ingredient.get('amount')
+            for ingredient in ingredients_set
+        }
+        current = {
+            item.ingredient_id: item
+            for item in recipe.ingredients_list.all()
+        }
+        deltas = {}
+        removed = []
+        for ingredient_id, item in current.items():
+            if ingredient_id not in new_amounts:
+                removed.append(item.id)
+                deltas[ingredient_id] = -item.amount
+        if removed:
+            IngredientRecipe.objects.filter(id__in=removed).delete()
+        changed = []
+        for ingredient_id, item in current.items():
+            amount = new_amounts.get(ingredient_id)
+            if amount is not None and item.amount != amount:
+                deltas[ingredient_id] = amount - item.amount
+                item.amount = amount
+                changed.append(item)
+        if changed:
+            IngredientRecipe.objects.bulk_update(changed, ('amount',))
+        added = [
+            {'id': ingredient_id, 'amount': amount}
+            for ingredient_id, amount in new_amounts.items()
+            if ingredient_id not in current
+        ]
+        if added:
+            CreateRecipeSerializer.create_ingredients(added, recipe)
+            deltas.update(
+                (ingredient['id'], ingredient['amount'])
+                for ingredient in added
             )
-        IngredientRecipe.objects.bulk_create(ingredients)
+        return deltas
 
+    @transaction.atomic
     def create(self, validated_data):
         ingredients = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
@@ -264,13 +397,25 @@ class CreateRecipeSerializer(ModelSerializer):
         recipe = super().create(validated_data)
         recipe.tags.set(tags)
         self.create_ingredients(ingredients, recipe)
+        schedule_thumbnails(recipe)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
-        ingredients = validated_data.pop('ingredients')
-        IngredientRecipe.objects.filter(recipe=instance).delete()
-        self.create_ingredients(ingredients, instance)
-        return super().update(instance, validated_data)
+        ingredients = validated_data.pop('ingredients', None)
+        tags = validated_data.pop('tags', None)
+        if ingredients is not None:
+            cart.change_recipe_ingredients(
+                instance.pk, self.update_ingredients(ingredients, instance)
+            )
+        if tags is not None:
+            instance.tags.set(tags)
+        if 'image' in validated_data:
+            validated_data['image_thumbnails_ready'] = False
+        recipe = super().update(instance, validated_data)
+        if 'image' in validated_data:
+            schedule_thumbnails(recipe)
+        return recipe
 
 
 class FavoriteSerializer(ModelSerializer):
@@ -0,0 +1,178 @@
+import csv
+from io import BytesIO
+
+from django.conf import settings
+from django.db.models import (ExpressionWrapper,
+                              F,
+                              FloatField,
+                              Max,
+                              Min,
+                              Sum,
+                              Value)
+from django.db.models.functions import Coalesce, NullIf
+from django.utils import timezone
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+from recipes.models import ShoppingListItem
+from recipes.units import display_units, format_amount
+
+CHUNK_SIZE = 500
+
+
+def get_shopping_list(user):
+    """Сводный список покупок пользователя из ShoppingListItem:
+    суммы по ингредиентам уже посчитаны при изменении корзины
+    (recipes.cart). Строки одного продукта в разных единицах
+    переводятся в его каноническую единицу и суммируются в БД.
+    Args:
+        user (User): Владелец списка покупок.
+    Returns:
+        QuerySet[dict]: Строки name, base_unit, total (в base_unit),
+        а также source_amount и единицы источников first_unit,
+        last_unit - для показа в исходной единице.
+    """
+    return ShoppingListItem.objects.filter(user=user).values(
+        name=F('ingredient__name'),
+        base_unit=Coalesce(
+            NullIf(F('ingredient__canonical_unit'), Value('')),
+            F('ingredient__measurement_unit')
+        ),
+    ).annotate(
+        total=Sum(ExpressionWrapper(
+            F('amount') * F('ingredient__unit_factor'),
+            output_field=FloatField()
+        )),
+        source_amount=Sum('amount'),
+        first_unit=Min('ingredient__measurement_unit'),
+        last_unit=Max('ingredient__measurement_unit'),
+    ).order_by('name', 'base_unit')
+
+
+def display_rows(rows):
+    """Строки get_shopping_list в единицах для показа.
+    Продукт в одной единице не из таблицы показа (шт., ст. л.)
+    остаётся в ней, иначе сумма выводится в наибольшей подходящей
+    единице показа: 1500 г - 1.5 кг.
+    Args:
+        rows (Iterable[dict]): Строки get_shopping_list.
+    Yields:
+        dict: name, measurement_unit, amount.
+    """
+    for row in rows:
+        unit = row['first_unit']
+        if unit == row['last_unit'] and not display_units.is_display(unit):
+            amount = row['source_amount']
+        else:
+            amount, unit = display_units.convert(
+                row['total'], row['base_unit']
+            )
+        yield {
+            'name': row['name'],
+            'measurement_unit': unit,
+            'amount': format_amount(amount),
+        }
+
+
+class Echo:
+    """Псевдо-буфер для csv.writer: возвращает строку вместо записи."""
+
+    def write(self, value):
+        return value
+
+
+class TextRenderer:
+    content_type = 'text/plain; charset=utf-8'
+    extension = 'txt'
+
+    def render(self, user, rows):
+        yield (
+            f'Список покупок для: {user.get_full_name()}\n'
+            f'Дата: {timezone.now():%Y-%m-%d}\n\n'
+        )
+        for idx, row in enumerate(rows, 1):
+            yield (f'{idx}. {row["name"]} - '
+                   f'{row["amount"]} {row["measurement_unit"]}\n')
+
+
+class CsvRenderer:
+    content_type = 'text/csv; charset=utf-8'
+    extension = 'csv'
+
+    def render(self, user, rows):
+        writer = csv.writer(Echo())
+        yield writer.writerow(('name', 'amount', 'measurement_unit'))
+        for row in rows:
+            yield writer.writerow(
+                (row['name'], row['amount'], row['measurement_unit'])
+            )
+
+
+class PdfRenderer:
+    """PDF собирается целиком (таблице ссылок нужны смещения всех
+    объектов) и отдаётся частями, строки из БД читаются курсором.
+    """
+    content_type = 'application/pdf'
+    extension = 'pdf'
+    font_name = 'ShoppingListFont'
+    font_size = 12
+    margin = 50
+
+    def render(self, user, rows):
+        if self.font_name not in pdfmetrics.getRegisteredFontNames():
+            pdfmetrics.registerFont(
+                TTFont(self.font_name, settings.SHOPPING_LIST_PDF_FONT)
+            )
+        buffer = BytesIO()
+        pdf = canvas.Canvas(buffer, pagesize=A4)
+        _, height = A4
+        line_height = self.font_size * 1.5
+        y = height - self.margin
+
+        def draw(text):
+            nonlocal y
+            if y < self.margin:
+                pdf.showPage()
+                y = height - self.margin
+            pdf.setFont(self.font_name, self.font_size)
+            pdf.drawString(self.margin, y, text)
+            y -= line_height
+
+        draw(f'Список покупок для: {user.get_full_name()}')
+        draw(f'Дата: {timezone.now():%Y-%m-%d}')
+        y -= line_height
+        for idx, row in enumerate(rows, 1):
+            draw(f'{idx}. {row["name"]} - '
+                 f'{row["amount"]} {row["measurement_unit"]}')
+        pdf.save()
+
+        buffer.seek(0)
+        while True:
+            chunk = buffer.read(64 * 1024)
+            if not chunk:
+                break
+            yield chunk
+
+
+RENDERERS = {
+    renderer.extension: renderer
+    for renderer in (TextRenderer, CsvRenderer, PdfRenderer)
+}
+
+
+def render_shopping_list(user, file_format):
+    """Возвращает рендерер и генератор содержимого файла.
+    Строки читаются из БД серверным курсором по мере отдачи ответа.
+    Args:
+        user (User): Владелец списка покупок.
+        file_format (str): Расширение файла: txt, csv или pdf.
+    Returns:
+        tuple: Рендерер и итератор частей файла.
+    """
+    renderer = RENDERERS[file_format]()
+    rows = display_rows(
+        get_shopping_list(user).iterator(chunk_size=CHUNK_SIZE)
+    )
+    return renderer, renderer.render(user, rows)
@@ -0,0 +1,242 @@
+from django.contrib.auth.signals import user_logged_out
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import (m2m_changed,
+                                      post_delete,
+                                      post_save,
+                                      pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from api import cache as recipe_list_cache
+from api.authentication import bump_auth_version, token_cache
+from api.autocomplete import ingredient_index
+from api.coverage import recipe_coverage_index
+from api.versions import bump_version
+from recipes.models import (Favorite,
+                            Ingredient,
+                            IngredientRecipe,
+                            Recipe,
+                            ShoppingCart,
+                            Tag,
+                            Unit)
+from recipes import cart as shopping_list
+from recipes.counters import increment
+from recipes import feed as follow_feed
+from recipes.search import update_search_index
+from recipes.units import display_units
+from users.models import Follow, User
+
+VERSIONED_MODELS = (
+    Tag, Ingredient, Recipe, IngredientRecipe,
+    Favorite, ShoppingCart, Follow, User,
+)
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def invalidate_ingredient_index(**kwargs):
+    ingredient_index.invalidate()
+
+
+@receiver(pre_save, sender=Ingredient)
+def fill_ingredient_canonical_unit(instance, **kwargs):
+    # Заданную вручную каноническую единицу не трогаем.
+    if instance.canonical_unit:
+        return
+    unit = Unit.objects.filter(name=instance.measurement_unit).first()
+    if unit is None:
+        instance.canonical_unit = instance.measurement_unit
+        instance.unit_factor = 1
+    else:
+        instance.canonical_unit = unit.base_unit
+        instance.unit_factor = unit.factor
+
+
+@receiver((post_save, post_delete), sender=Unit)
+def invalidate_display_units(**kwargs):
+    transaction.on_commit(display_units.invalidate)
+
+
+def bump_model_version(sender, update_fields=None, **kwargs):
+    # Вход пользователя обновляет только last_login, который
+    # в ответы не попадает.
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    # После фиксации транзакции: иначе параллельный запрос получит
+    # новый ETag вместе со старыми данными.
+    transaction.on_commit(lambda: bump_version(sender))
+
+
+# Связи удаляет api/relations.py одним DELETE: Django обходится без
+# предварительного SELECT, только если у модели нет обработчиков
+# удаления. Версии этих моделей api/relations.py поднимает сам,
+# при каскадном удалении меняется версия рецепта или пользователя.
+RELATION_MODELS = (Favorite, ShoppingCart, Follow)
+
+for model in VERSIONED_MODELS:
+    post_save.connect(bump_model_version, sender=model)
+    if model not in RELATION_MODELS:
+        post_delete.connect(bump_model_version, sender=model)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def bump_recipe_tags_version(action, **kwargs):
+    if action.startswith('post_'):
+        transaction.on_commit(lambda: bump_version(Recipe))
+
+
+@receiver(post_save, sender=Recipe)
+def invalidate_saved_recipe(instance, **kwargs):
+    slugs = list(instance.tags.values_list('slug', flat=True))
+    transaction.on_commit(
+        lambda: recipe_list_cache.invalidate_recipe(instance.author_id, slugs)
+    )
+
+
+@receiver(pre_delete, sender=Recipe)
+def invalidate_deleted_recipe(instance, **kwargs):
+    # Теги удаляются вместе с рецептом, поэтому берём их до удаления.
+    slugs = list(instance.tags.values_list('slug', flat=True))
+    transaction.on_commit(
+        lambda: recipe_list_cache.invalidate_recipe(instance.author_id, slugs)
+    )
+
+
+@receiver(pre_delete, sender=Recipe)
+def remove_deleted_recipe_from_shopping_lists(instance, **kwargs):
+    # Строки корзины удаляются каскадно без сигналов.
+    shopping_list.remove_recipe_from_all(instance.pk)
+
+
+@receiver(post_save, sender=Recipe)
+def count_created_recipe(instance, created, **kwargs):
+    # Рецепты из API, админки и ORM считаются одинаково.
+    if created:
+        increment(User, instance.author_id, 'recipes_count')
+
+
+@receiver(post_delete, sender=Recipe)
+def count_deleted_recipe(instance, **kwargs):
+    increment(User, instance.author_id, 'recipes_count', -1)
+
+
+@receiver(pre_delete, sender=User)
+def uncount_deleted_user_relations(instance, **kwargs):
+    # Избранное, корзина и подписки пользователя удаляются каскадно
+    # без сигналов: счётчики уменьшаются одним UPDATE на каждый.
+    Recipe.objects.filter(in_favourites__user=instance).update(
+        favorites_count=F('favorites_count') - 1
+    )
+    Recipe.objects.filter(in_shoping_cart__user=instance).update(
+        in_carts_count=F('in_carts_count') - 1
+    )
+    User.objects.filter(following__user=instance).update(
+        followers_count=F('followers_count') - 1
+    )
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def invalidate_recipe_tags(instance, action, reverse, pk_set, **kwargs):
+    if reverse:
+        if action.startswith('post_'):
+            transaction.on_commit(recipe_list_cache.invalidate_catalog)
+        return
+    if action in ('post_add', 'post_remove'):
+        slugs = list(
+            Tag.objects.filter(pk__in=pk_set).values_list('slug', flat=True)
+        )
+    elif action == 'pre_clear':
+        slugs = list(instance.tags.values_list('slug', flat=True))
+    else:
+        return
+    transaction.on_commit(
+        lambda: recipe_list_cache.invalidate_recipe(instance.author_id, slugs)
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def update_saved_recipe_search(instance, update_fields=None, **kwargs):
+    # Ингредиенты сохраняются после рецепта, поэтому после фиксации.
+    if update_fields and not {'name', 'text'} & set(update_fields):
+        return
+    transaction.on_commit(lambda: update_search_index([instance.pk]))
+
+
+@receiver(post_delete, sender=Recipe)
+def update_deleted_recipe_search(instance, **kwargs):
+    # После удаления Django обнуляет pk у объекта.
+    recipe_id = instance.pk
+    transaction.on_commit(lambda: update_search_index([recipe_id]))
+
+
+@receiver(post_save, sender=Ingredient)
+def update_ingredient_recipes_search(instance, created, **kwargs):
+    if created:
+        return
+    recipe_ids = list(IngredientRecipe.objects.filter(
+        ingredient=instance
+    ).values_list('recipe_id', flat=True))
+    transaction.on_commit(lambda: update_search_index(recipe_ids))
+
+
+@receiver(post_save, sender=Recipe)
+def add_recipe_to_feeds(instance, created, **kwargs):
+    # В той же транзакции, что и рецепт. Из лент рецепт удаляется
+    # каскадно вместе с FeedItem.
+    if created:
+        follow_feed.add_recipe(instance)
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def invalidate_recipe_coverage_index(update_fields=None, **kwargs):
+    # Состав рецепта сохраняется после самого рецепта.
+    if update_fields and set(update_fields) <= {'image_thumbnails_ready'}:
+        return
+    transaction.on_commit(recipe_coverage_index.invalidate)
+
+
+@receiver((post_save, post_delete), sender=Tag)
+@receiver((post_save, post_delete), sender=Ingredient)
+def invalidate_catalog(**kwargs):
+    transaction.on_commit(recipe_list_cache.invalidate_catalog)
+
+
+@receiver((post_save, post_delete), sender=User)
+def invalidate_catalog_on_user_change(update_fields=None, **kwargs):
+    # Вход пользователя обновляет только last_login.
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    transaction.on_commit(recipe_list_cache.invalidate_catalog)
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(instance, **kwargs):
+    key, user_id = instance.key, instance.user_id
+
+    def invalidate():
+        token_cache.invalidate_key(key)
+        bump_auth_version(user_id)
+
+    transaction.on_commit(invalidate)
+
+
+@receiver(user_logged_out)
+def invalidate_logged_out_user(user, **kwargs):
+    if user is not None:
+        token_cache.invalidate_user(user.pk)
+        bump_auth_version(user.pk)
+
+
+@receiver((post_save, post_delete), sender=User)
+def invalidate_user_token(instance, update_fields=None, **kwargs):
+    # Смена пароля, деактивация и любые изменения профиля.
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    user_id = instance.pk
+
+    def invalidate():
+        token_cache.invalidate_user(user_id)
+        bump_auth_version(user_id)
+
+    transaction.on_commit(invalidate)
@@ -0,0 +1,53 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+VERSION_KEY = 'model-version:{}'
+
+
+def _key(model):
+    return VERSION_KEY.format(model._meta.label_lower)
+
+
+def bump_version(model):
+    """Отмечает изменение данных модели.
+    Версией служит время изменения в наносекундах: после вытеснения
+    ключа из кэша версия не повторит уже выданную клиентам.
+    Версия живёт MODEL_VERSION_TTL секунд: процесс, пропустивший
+    изменение, отвечает 304 на устаревшие данные не дольше этого.
+    """
+    cache.set(
+        _key(model), time.time_ns(), timeout=settings.MODEL_VERSION_TTL
+    )
+
+
+def get_versions(models):
+    """Возвращает версии моделей, инициализируя отсутствующие.
+    Args:
+        models (Iterable[Model]): Модели, от которых зависит ответ.
+    Returns:
+        list[int]: Версии в порядке переданных моделей.
+    """
+    keys = [_key(model) for model in models]
+    versions = cache.get_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in versions}
+    for key, version in missing.items():
+        cache.add(key, version, timeout=settings.MODEL_VERSION_TTL)
+    versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+def get_etag_and_last_modified(models, *extra):
+    """Вычисляет ETag и Last-Modified для ответа.
+    Args:
+        models (Iterable[Model]): Модели, от которых зависит ответ.
+        extra: Дополнительные значения, например id пользователя.
+    Returns:
+        tuple[str, int]: ETag без кавычек и время изменения в секундах.
+    """
+    versions = get_versions(models)
+    source = ':'.join(str(value) for value in (*versions, *extra))
+    etag = hashlib.md5(source.encode()).hexdigest()
+    return etag, max(versions) // 10 ** 9
@@ -1,43 +1,83 @@
-from django.db.models import Sum
-from django.http import HttpResponse
-from django.utils import timezone
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import (BooleanField,
+                              Count,
+                              OuterRef,
+                              Prefetch,
+                              Subquery,
+                              Value)
+from django.http import StreamingHttpResponse
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
 from rest_framework import status
 from rest_framework.decorators import action
+from rest_framework.generics import get_object_or_404
 from rest_framework.pagination import PageNumberPagination
-from rest_framework.permissions import (AllowAny,
+from rest_framework.permissions import (SAFE_METHODS,
+                                        AllowAny,
                                         DjangoModelPermissions,
                                         IsAuthenticated)
 from rest_framework.response import Response
+from rest_framework.serializers import ValidationError
+from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet
 
-from api.filters import IngredientsSearchFilter
-from api.mixins import CustomRecipeModelViewSet, CreateAndDeleteMixin
-from api.pagination import LimitPagePagination
-from api.permissions import (AuthorOrReadOnly)
+from api import cache as recipe_list_cache
+from api.authentication import token_cache
+from api.autocomplete import ingredient_index
+from api.coverage import recipe_coverage_index
+from api.filters import IngredientsSearchFilter, RecipeFilter
+from api.metrics import registry
+from api.mixins import (BulkRelationMixin,
+                        ConditionalGetMixin,
+                        CreateAndDeleteMixin,
+                        CustomRecipeModelViewSet,
+                        QueryBudgetMixin)
+from api.pagination import (FeedKeysetPagination,
+                            LimitPagePagination,
+                            OptInCursorPagination,
+                            SubscriptionPagination,
+                            get_ordering_fields)
+from api.payloads import RECIPE_FIELDS, recipe_rows, render_recipes
+from api.permissions import AuthorOrReadOnly, IsRoleAdmin
 from api.serializers import (FollowUserSerializer,
                              UsersSerializer,
                              IngredientSerializer,
                              TagSerializer,
                              UserEditSerializer,
-                             CreateRecipeSerializer)
+                             CreateRecipeSerializer,
+                             RecipeListSerializer)
+from api.shopping_list import (RENDERERS,
+                               display_rows,
+                               get_shopping_list,
+                               render_shopping_list)
+from recipes import cart
+from recipes import feed as follow_feed
 from recipes.models import (Favorite,
                             Ingredient,
+                            IngredientRecipe,
                             Tag,
                             Recipe,
                             ShoppingCart)
-from users.models import Follow
+from users.models import Follow, User
 
 
-class TagViewSet(ModelViewSet):
+class TagViewSet(QueryBudgetMixin, ConditionalGetMixin, ModelViewSet):
+    query_budget = {'list': 2, 'retrieve': 2}
+    conditional_models = (Tag,)
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = (AllowAny,)
     pagination_class = None
 
 
-class IngredientViewSet(ModelViewSet):
+class IngredientViewSet(QueryBudgetMixin,
+                        ConditionalGetMixin,
+                        ModelViewSet):
+    query_budget = {'list': 2, 'retrieve': 2}
+    conditional_models = (Ingredient,)
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = (AllowAny,)
@@ -45,8 +85,35 @@ class IngredientViewSet(ModelViewSet):
     filterset_class = IngredientsSearchFilter
     pagination_class = None
 
+    def list(self, request, *args, **kwargs):
+        if (request.query_params.get('name')
+                and settings.INGREDIENT_INDEX_ENABLED):
+            return self.dispatch_conditional(self.autocomplete, request)
+        return super().list(request, *args, **kwargs)
+
+    def autocomplete(self, request):
+        return Response(ingredient_index.search(
+            request.query_params.get('name'),
+            settings.INGREDIENT_AUTOCOMPLETE_LIMIT
+        ))
+
 
-class UsersViewSet(UserViewSet, CreateAndDeleteMixin):
+class UsersViewSet(QueryBudgetMixin,
+                   UserViewSet,
+                   CreateAndDeleteMixin,
+                   BulkRelationMixin):
+    query_budget = {
+        'subscriptions': 4,
+        'subscribe': 3,
+        'subscribe_many': 6,
+    }
+    # Обновление материализованной ленты: чтение рецептов авторов
+    # и запись в FeedItem, у одиночной подписки ещё и SAVEPOINT/RELEASE
+    # общей с подпиской транзакции.
+    feed_query_budget = {'subscribe': 4, 'subscribe_many': 2}
+    # Действия, сохраняющие request.user: пользователь читается из БД,
+    # а не из token_cache.
+    user_write_actions = ('me', 'set_password', 'set_username')
     serializer_class = UsersSerializer
     pagination_class = PageNumberPagination
     permission_classes = (DjangoModelPermissions,)
@@ -76,67 +143,194 @@ class UsersViewSet(UserViewSet, CreateAndDeleteMixin):
             return Response(serializer.data, status=status.HTTP_200_OK)
         return Response(status=status.HTTP_405_METHOD_NOT_ALLOWED)
 
-    @action(detail=False, permission_classes=(IsAuthenticated,))
+    @action(detail=False,
+            permission_classes=(IsAuthenticated,),
+            pagination_class=SubscriptionPagination)
     def subscriptions(self, request):
-        queryset = Follow.objects.filter(user=request.user)
+        queryset = Follow.objects.filter(
+            user=request.user
+        ).select_related('author').annotate(
+            is_subscribed=Value(True, output_field=BooleanField()),
+            recipes_count=Count('author__recipe'),
+        ).order_by('-id').prefetch_related(
+            Prefetch(
+                'author__recipe',
+                queryset=self.get_recipes_preview_queryset(
+                    request.query_params.get('recipes_limit')
+                ),
+                to_attr='recipes_preview',
+            )
+        )
         page = self.paginate_queryset(queryset)
         serializer = FollowUserSerializer(page,
                                           many=True,
                                           context={'request': request}, )
         return self.get_paginated_response(serializer.data)
 
+    @staticmethod
+    def get_recipes_preview_queryset(recipes_limit):
+        """Рецепты авторов для страницы подписок.
+        Первые recipes_limit рецептов каждого автора выбираются одним
+        запросом с коррелированным подзапросом по автору.
+        Args:
+            recipes_limit (str): Значение параметра запроса recipes_limit.
+        Returns:
+            QuerySet[Recipe]: Queryset для Prefetch по авторам.
+        """
+        queryset = Recipe.objects.order_by('-pub_date', '-id')
+        if recipes_limit and recipes_limit.isdigit():
+            queryset = queryset.filter(
+                id__in=Subquery(
+                    Recipe.objects.filter(
+                        author=OuterRef('author')
+                    ).order_by(
+                        '-pub_date', '-id'
+                    ).values('id')[:int(recipes_limit)]
+                )
+            )
+        return queryset
+
     @action(detail=True,
             methods=('POST', 'DELETE',),
             permission_classes=[IsAuthenticated])
     def subscribe(self, request, id=None):
+        if request.method == 'POST' and id == str(request.user.pk):
+            raise ValidationError({'errors': 'Нельзя подписаться на себя.'})
+        if not request.user.feed_materialized:
+            return self.subscribe_author(id)
+        # Материализованная лента меняется вместе с подпиской.
+        with transaction.atomic():
+            response = self.subscribe_author(id)
+            self.change_feed([id])
+        return response
+
+    @action(detail=False,
+            methods=('POST', 'DELETE',),
+            url_path='subscribe',
+            permission_classes=[IsAuthenticated])
+    def subscribe_many(self, request):
+        """Подписка на несколько авторов или отписка от них:
+        {"ids": [id автора, ...]}.
+        """
+        return self.change_relations(
+            Follow, 'author', 'followers_count',
+            self.change_feed if request.user.feed_materialized else None,
+            rejected={request.user.pk},
+        )
+
+    def change_feed(self, author_ids):
+        if self.request.method == 'POST':
+            follow_feed.follow(self.request.user.pk, author_ids)
+        else:
+            follow_feed.unfollow(self.request.user.pk, author_ids)
+
+    def get_query_budget(self, request):
+        budget = super().get_query_budget(request)
+        if (self.action in self.feed_query_budget
+                and request.user.is_authenticated
+                and request.user.feed_materialized):
+            budget += self.feed_query_budget[self.action]
+        return budget
+
+    def subscribe_author(self, pk):
         return self.create_and_delete_related(
-            pk=id,
+            pk=pk,
             klass=Follow,
             create_failed_message='Не удалось подписаться.',
             delete_failed_message='Вы уже подписались на автора.',
-            field_to_create_or_delete_name='author'
+            field_to_create_or_delete_name='author',
+            counter_field='followers_count',
+            response_fields=('id', 'email', 'username',
+                             'first_name', 'last_name'),
         )
 
 
-class RecipeViewSet(CustomRecipeModelViewSet):
-    queryset = Recipe.objects.select_related('author')
+class RecipeViewSet(QueryBudgetMixin,
+                    ConditionalGetMixin,
+                    BulkRelationMixin,
+                    CustomRecipeModelViewSet):
+    query_budget = {
+        'list': 6,
+        'retrieve': 4,
+        'favorite': 6,
+        'shopping_cart': 7,
+        'favorite_many': 6,
+        'shopping_cart_many': 8,
+        'download_shopping_cart': 3,
+        'shopping_list': 3,
+        'by_ingredients': 6,
+        'feed': 4,
+    }
+    conditional_models = (Recipe, IngredientRecipe, Ingredient, Tag, User)
+    conditional_user_models = (Favorite, ShoppingCart, Follow)
+    conditional_actions = ('retrieve',)
+    queryset = Recipe.objects.with_related()
     serializer_class = CreateRecipeSerializer
-    pagination_class = LimitPagePagination
+    pagination_class = OptInCursorPagination
     permission_classes = (AuthorOrReadOnly,)
+    filter_backends = (DjangoFilterBackend,)
+    filterset_class = RecipeFilter
+
+    def list(self, request, *args, **kwargs):
+        """Список рецептов с кэшем страниц, общих для всех пользователей.
+        Страницы кэшируются по анонимным запросам, авторизованные
+        пользователи получают страницу из кэша со своими флагами.
+        """
+        if not recipe_list_cache.is_cacheable(request):
+            return self.list_recipes(request)
+        key = recipe_list_cache.get_cache_key(request)
+        data = recipe_list_cache.get_page(key)
+        if data is not None:
+            return Response(
+                recipe_list_cache.overlay_user_flags(data, request.user)
+            )
+        response = self.list_recipes(request)
+        if request.user.is_anonymous and response.status_code == 200:
+            recipe_list_cache.set_page(key, response.data)
+        return response
+
+    def list_recipes(self, request):
+        """ListModelMixin.list без сериализаторов: страница читается
+        через values() и собирается render_recipes в том же формате,
+        что и RecipeListSerializer.
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        queryset = recipe_rows(queryset, *(
+            field for field in get_ordering_fields(queryset)
+            if field not in RECIPE_FIELDS
+        ))
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            return Response(render_recipes(list(queryset), request))
+        return self.get_paginated_response(render_recipes(page, request))
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.dispatch_conditional(
+            self.retrieve_recipe, request, *args, **kwargs
+        )
+
+    def retrieve_recipe(self, request, *args, **kwargs):
+        """RetrieveModelMixin.retrieve через render_recipes. Объектные
+        права не проверяются: AuthorOrReadOnly разрешает чтение всем.
+        """
+        row = get_object_or_404(
+            recipe_rows(self.filter_queryset(self.get_queryset())),
+            pk=kwargs[self.lookup_url_kwarg or self.lookup_field]
+        )
+        return Response(render_recipes([row], request)[0])
+
+    def get_serializer_class(self):
+        if self.request.method in SAFE_METHODS:
+            return RecipeListSerializer
+        return super().get_serializer_class()
 
     def get_queryset(self):
-        """Получает queryset в соответствии с параметрами запроса.
+        """Рецепты с флагами текущего пользователя. Параметры запроса
+        применяет RecipeFilter.
         Returns:
             QuerySet[Recipe]=: Список запрошенных объектов.
         """
-        queryset = self.queryset
-
-        tags: list = self.request.query_params.getlist('tags')
-        if tags:
-            queryset = queryset.filter(
-                tags__slug__in=tags).distinct()
-
-        author: str = self.request.query_params.get('author')
-        if author:
-            queryset = queryset.filter(author=author)
-
-        # Следующие фильтры только для авторизованного пользователя
-        if self.request.user.is_anonymous:
-            return queryset
-
-        is_in_cart: str = self.request.query_params.get('is_in_shopping_cart')
-        if is_in_cart in ('1', 'true'):
-            queryset = queryset.filter(in_shoping_cart__user=self.request.user)
-        elif is_in_cart in ('0', 'false'):
-            queryset = queryset.exclude(
-                in_shoping_cart__user=self.request.user)
-
-        is_favorit: str = self.request.query_params.get('is_favorited')
-        if is_favorit in ('1', 'true'):
-            queryset = queryset.filter(in_favourites__user=self.request.user)
-        if is_favorit in ('0', 'false'):
-            queryset = queryset.exclude(in_favourites__user=self.request.user)
-        return queryset
+        return super().get_queryset().with_user_flags(self.request.user)
 
     @action(detail=True,
             methods=['POST', 'DELETE'],
@@ -182,30 +376,138 @@ class RecipeViewSet(CustomRecipeModelViewSet):
                     status=status.HTTP_405_METHOD_NOT_ALLOWED
                 )
 
+    @action(detail=False,
+            methods=['post', 'delete'],
+            url_path='favorite',
+            permission_classes=(IsAuthenticated,))
+    def favorite_many(self, request):
+        """Добавление в избранное или удаление из него нескольких
+        рецептов: {"ids": [id рецепта, ...]}.
+        """
+        return self.change_relations(
+            Favorite, 'recipe', self.counter_fields[Favorite],
+            lambda pks: transaction.on_commit(
+                recipe_list_cache.invalidate_popular
+            )
+        )
+
+    @action(detail=False,
+            methods=['post', 'delete'],
+            url_path='shopping_cart',
+            permission_classes=(IsAuthenticated,))
+    def shopping_cart_many(self, request):
+        """Добавление в список покупок или удаление из него нескольких
+        рецептов, например меню на неделю: {"ids": [id рецепта, ...]}.
+        Сводный список покупок обновляется в той же транзакции.
+        """
+        if request.method == 'POST':
+            change_list = partial(cart.add_recipes, request.user.pk)
+        else:
+            change_list = partial(cart.remove_recipes, request.user.pk)
+        return self.change_relations(
+            ShoppingCart, 'recipe', self.counter_fields[ShoppingCart],
+            change_list
+        )
+
+    @action(detail=False,
+            permission_classes=(IsAuthenticated,),
+            pagination_class=FeedKeysetPagination)
+    def feed(self, request):
+        """Новые рецепты авторов, на которых подписан пользователь.
+        Страница выбирается одним запросом (см. recipes.feed), теги
+        и ингредиенты - по запросу на страницу.
+        """
+        queryset = recipe_rows(
+            follow_feed.feed_queryset(request.user).with_user_flags(
+                request.user
+            ),
+            'feed_date'
+        )
+        page = self.paginate_queryset(queryset)
+        return self.get_paginated_response(render_recipes(page, request))
+
+    @action(detail=False, pagination_class=LimitPagePagination)
+    def by_ingredients(self, request):
+        """Подбор рецептов по имеющимся продуктам.
+        ?ingredients=1&ingredients=2&min_coverage=0.5 - рецепты, у которых
+        из этих продуктов есть не меньше половины ингредиентов, по
+        убыванию доли покрытия. Ранжирование по обратному индексу
+        в памяти, из БД загружается только текущая страница.
+        """
+        ingredient_ids, min_coverage = self.get_coverage_params(request)
+        ranked = recipe_coverage_index.search(ingredient_ids, min_coverage)
+        page = self.paginate_queryset(ranked)
+        rows = {
+            row['id']: row for row in recipe_rows(self.get_queryset().filter(
+                pk__in=[recipe_id for recipe_id, _, _ in page]
+            ))
+        }
+        # Рецепт могли удалить после построения индекса.
+        page = [item for item in page if item[0] in rows]
+        data = render_recipes([rows[item[0]] for item in page], request)
+        for recipe, (_, coverage, missing_count) in zip(data, page):
+            recipe['coverage'] = round(coverage, 4)
+            recipe['missing_count'] = missing_count
+        return self.get_paginated_response(data)
+
+    @staticmethod
+    def get_coverage_params(request):
+        ingredients = request.query_params.getlist('ingredients')
+        if not ingredients:
+            raise ValidationError({'ingredients': 'Укажите ингредиенты.'})
+        if not all(value.isdigit() for value in ingredients):
+            raise ValidationError(
+                {'ingredients': 'Ожидаются id ингредиентов.'}
+            )
+        try:
+            min_coverage = float(request.query_params.get(
+                'min_coverage', settings.RECIPE_COVERAGE_MIN
+            ))
+        except ValueError:
+            min_coverage = None
+        if min_coverage is None or not 0 <= min_coverage <= 1:
+            raise ValidationError(
+                {'min_coverage': 'Ожидается число от 0 до 1.'}
+            )
+        return [int(value) for value in ingredients], min_coverage
+
+    @action(detail=False, permission_classes=(IsAuthenticated,))
+    def shopping_list(self, request):
+        """Сводный список покупок для просмотра перед скачиванием."""
+        return Response(list(display_rows(get_shopping_list(request.user))))
+
     @action(detail=False, permission_classes=(IsAuthenticated,))
     def download_shopping_cart(self, request):
         user = request.user
         if not user.shopping_cart.exists():
             return Response(status=status.HTTP_400_BAD_REQUEST)
 
-        ingredients = Ingredient.objects.filter(
-            recipes__in_shoping_cart__user=user
-        ).values().annotate(amount=Sum('ingredientrecipe__amount'))
+        file_format = request.query_params.get('file_format', 'txt')
+        if file_format not in RENDERERS:
+            return Response(
+                {'errors': f'Доступные форматы: {", ".join(RENDERERS)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        renderer, content = render_shopping_list(user, file_format)
 
-        today = timezone.now()
-        shopping_list = (
-            f'Список покупок для: {user.get_full_name()}\n'
-            f'Дата: {today:%Y-%m-%d}\n\n'
+        filename = f'{user.username}_shopping_list.{renderer.extension}'
+        response = StreamingHttpResponse(
+            content, content_type=renderer.content_type
         )
-        shopping_list += '\n'.join([
-            f'{idx}. {ingredient.get("name")} - '
-            f'{ingredient.get("amount")} '
-            f'{ingredient.get("measurement_unit")}'
-            for idx, ingredient in enumerate(ingredients, 1)
-        ])
-
-        filename = f'{user.username}_shopping_list.txt'
-        response = HttpResponse(shopping_list, content_type='text/plain')
         response['Content-Disposition'] = f'attachment; filename={filename}'
 
         return response
+
+
+class MetricsReportView(APIView):
+    """Сводка замеров QueryMetricsMiddleware по эндпоинтам процесса
+    и попадания в кэш токенов аутентификации.
+    """
+    permission_classes = (IsRoleAdmin,)
+    pagination_class = None
+
+    def get(self, request):
+        return Response({
+            'endpoints': registry.report(),
+            'token_cache': token_cache.stats(),
+        })
@@ -0,0 +1,152 @@
+import threading
+
+from django.db.backends.postgresql import base
+from psycopg2 import extensions
+from psycopg2.pool import PoolError, ThreadedConnectionPool
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class BlockingConnectionPool(ThreadedConnectionPool):
+    """ThreadedConnectionPool, который при занятых соединениях
+    ждёт освобождения до timeout секунд, а не сразу падает с PoolError.
+    """
+
+    def __init__(self, maxconn, timeout, *args, **kwargs):
+        super().__init__(0, maxconn, *args, **kwargs)
+        # Соединения открываются по мере надобности, но возвращённые
+        # остаются в пуле: при minconn=0 putconn закрывал бы каждое.
+        self.minconn = maxconn
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self.timeout = timeout
+
+    def getconn(self, key=None):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PoolError(
+                f'connection pool exhausted for {self.timeout} seconds'
+            )
+        try:
+            return super().getconn(key)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def putconn(self, conn=None, key=None, close=False):
+        super().putconn(conn, key, close)
+        self._slots.release()
+
+
+def get_pool(alias, size, timeout, conn_params):
+    """Общий для потоков процесса пул соединений псевдонима БД."""
+    with _pools_lock:
+        pool = _pools.get(alias)
+        if pool is None:
+            pool = _pools[alias] = BlockingConnectionPool(
+                size, timeout, **conn_params
+            )
+    return pool
+
+
+def is_alive(connection):
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+    except base.Database.Error:
+        return False
+    return True
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """PostgreSQL с проверкой постоянных соединений и пулом.
+    CONN_HEALTH_CHECKS: перед первым запросом к БД в каждом
+    HTTP-запросе соединение проверяется SELECT 1 и при обрыве
+    открывается заново, а не падает запрос пользователя.
+    POOL_SIZE: если больше 0, соединения берутся из пула процесса
+    и возвращаются в него в конце каждого HTTP-запроса (CONN_MAX_AGE
+    при этом не действует), так потоки gthread-воркера и фонового
+    создания миниатюр делят POOL_SIZE соединений. Когда свободных нет,
+    поток ждёт до POOL_TIMEOUT секунд.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.health_check_done = False
+
+    @property
+    def health_check_enabled(self):
+        return self.settings_dict.get('CONN_HEALTH_CHECKS', False)
+
+    @property
+    def pool_size(self):
+        return self.settings_dict.get('POOL_SIZE') or 0
+
+    def get_pool(self, conn_params=None):
+        return get_pool(
+            self.alias,
+            self.pool_size,
+            self.settings_dict.get('POOL_TIMEOUT', 10),
+            conn_params,
+        )
+
+    def get_new_connection(self, conn_params):
+        if not self.pool_size:
+            return super().get_new_connection(conn_params)
+        pool = self.get_pool(conn_params)
+        while True:
+            connection = pool.getconn()
+            if not connection.closed and (
+                    not self.health_check_enabled or is_alive(connection)):
+                break
+            pool.putconn(connection, close=True)
+        options = self.settings_dict['OPTIONS']
+        self.isolation_level = options.get(
+            'isolation_level', connection.isolation_level
+        )
+        if self.isolation_level != connection.isolation_level:
+            connection.set_session(isolation_level=self.isolation_level)
+        return connection
+
+    def connect(self):
+        super().connect()
+        self.health_check_done = True
+        if self.pool_size:
+            # Соединение, удерживаемое потоком между запросами,
+            # было бы недоступно остальным потокам.
+            self.close_at = 0
+
+    def _close(self):
+        if self.connection is None or not self.pool_size:
+            return super()._close()
+        connection = self.connection
+        broken = True
+        try:
+            with self.wrap_database_errors:
+                status = connection.get_transaction_status()
+                if (not connection.closed
+                        and status != extensions.TRANSACTION_STATUS_UNKNOWN):
+                    if status != extensions.TRANSACTION_STATUS_IDLE:
+                        connection.rollback()
+                    broken = False
+        finally:
+            # Место в пуле освобождается, даже если откат не удался.
+            self.get_pool().putconn(connection, close=broken)
+
+    def close_if_health_check_failed(self):
+        if (self.connection is None
+                or not self.health_check_enabled
+                or self.health_check_done
+                or self.in_atomic_block):
+            return
+        if not self.is_usable():
+            self.close()
+        self.health_check_done = True
+
+    def _cursor(self, name=None):
+        self.close_if_health_check_failed()
+        return super()._cursor(name)
+
+    def close_if_unusable_or_obsolete(self):
+        # Вызывается в начале и в конце каждого HTTP-запроса.
+        super().close_if_unusable_or_obsolete()
+        self.health_check_done = False
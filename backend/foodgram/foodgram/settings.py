@@ -24,12 +24,13 @@ INSTALLED_APPS = [
     'djoser',
     'django_filters',
 
-    'api',
+    'api.apps.ApiConfig',
     'users',
     'recipes'
 ]
 
 MIDDLEWARE = [
+    'api.metrics.QueryMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -59,19 +60,65 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'foodgram.wsgi.application'
 
+# Стандартный бэкенд PostgreSQL заменяется на foodgram.db.backends.postgresql
+# с проверкой соединений (CONN_HEALTH_CHECKS) и пулом (POOL_SIZE), даже если
+# он явно указан в DB_ENGINE.
+POSTGRESQL_ENGINES = (
+    'django.db.backends.postgresql',
+    'django.db.backends.postgresql_psycopg2',
+)
+DB_ENGINE = os.getenv('DB_ENGINE', default='foodgram.db.backends.postgresql')
+if DB_ENGINE in POSTGRESQL_ENGINES:
+    DB_ENGINE = 'foodgram.db.backends.postgresql'
+
 DATABASES = {
     'default': {
-        'ENGINE': os.getenv(
-            'DB_ENGINE', default='django.db.backends.postgresql'
-        ),
+        'ENGINE': DB_ENGINE,
         'NAME': os.getenv('DB_NAME', default='postgres'),
         'USER': os.getenv('POSTGRES_USER', default='postgres'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', default='postgres'),
         'HOST': os.getenv('DB_HOST', default='db'),
-        'PORT': os.getenv('DB_PORT', default='5432')
+        'PORT': os.getenv('DB_PORT', default='5432'),
+        # Секунд жизни постоянного соединения, 0 - закрывать после
+        # каждого запроса. С пулом не действует: соединение возвращается
+        # в пул в конце каждого запроса.
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', default=60)),
+        'CONN_HEALTH_CHECKS': os.getenv(
+            'DB_CONN_HEALTH_CHECKS', default='True'
+        ) == 'True',
+        # Пул на процесс для потоков gthread и фонового создания
+        # миниатюр, 0 - без пула. POOL_TIMEOUT - секунд ожидания
+        # свободного соединения.
+        'POOL_SIZE': int(os.getenv('DB_POOL_SIZE', default=0)),
+        'POOL_TIMEOUT': int(os.getenv('DB_POOL_TIMEOUT', default=10)),
+    }
+}
+
+CACHES = {
+    'default': {
+        # locmem по умолчанию - только для одного процесса: версии
+        # моделей и страницы списка рецептов должны быть общими
+        # для воркеров, gunicorn.conf.py не запустит несколько воркеров
+        # с locmem. Общие бэкенды:
+        # django.core.cache.backends.filebased.FileBasedCache
+        # или django_redis.cache.RedisCache (пакет django-redis).
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', default='foodgram'),
     }
 }
 
+# Срок жизни версий моделей для ETag (api/versions.py).
+MODEL_VERSION_TTL = int(os.getenv('MODEL_VERSION_TTL', default=300))
+
+RECIPE_LIST_CACHE_ALIAS = 'default'
+RECIPE_LIST_CACHE_TIMEOUT = int(
+    os.getenv('RECIPE_LIST_CACHE_TIMEOUT', default=300)
+)
+RECIPE_LIST_CACHE_VERSION = 1
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -103,6 +150,55 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', default='True') == 'True'
+METRICS_SAMPLE_SIZE = int(os.getenv('METRICS_SAMPLE_SIZE', default=1000))
+# log - предупреждение в лог, raise - исключение (для тестов).
+QUERY_BUDGET_ACTION = os.getenv('QUERY_BUDGET_ACTION', default='log')
+
+INGREDIENT_INDEX_ENABLED = os.getenv(
+    'INGREDIENT_INDEX_ENABLED', default='True'
+) == 'True'
+INGREDIENT_INDEX_TTL = int(os.getenv('INGREDIENT_INDEX_TTL', default=300))
+INGREDIENT_AUTOCOMPLETE_LIMIT = int(
+    os.getenv('INGREDIENT_AUTOCOMPLETE_LIMIT', default=20)
+)
+
+AUTH_TOKEN_CACHE_TTL = int(os.getenv('AUTH_TOKEN_CACHE_TTL', default=30))
+AUTH_TOKEN_CACHE_SIZE = int(
+    os.getenv('AUTH_TOKEN_CACHE_SIZE', default=10000)
+)
+
+RECIPE_COVERAGE_INDEX_TTL = int(
+    os.getenv('RECIPE_COVERAGE_INDEX_TTL', default=300)
+)
+RECIPE_COVERAGE_MIN = float(os.getenv('RECIPE_COVERAGE_MIN', default=0.5))
+
+UNITS_CACHE_TTL = int(os.getenv('UNITS_CACHE_TTL', default=300))
+
+# Лента подписок хранится в таблице для пользователей, подписанных
+# хотя бы на столько авторов (команда rebuild_feeds), 0 - не хранить.
+FEED_MATERIALIZE_MIN_FOLLOWS = int(
+    os.getenv('FEED_MATERIALIZE_MIN_FOLLOWS', default=200)
+)
+
+# Сколько id принимают массовые операции с избранным, корзиной
+# и подписками.
+BULK_RELATIONS_MAX_IDS = int(
+    os.getenv('BULK_RELATIONS_MAX_IDS', default=100)
+)
+
+# Уменьшенные копии изображений рецептов: имя -> максимальная сторона.
+RECIPE_THUMBNAIL_SIZES = {'small': 320, 'medium': 640}
+RECIPE_THUMBNAIL_FORMAT = os.getenv('RECIPE_THUMBNAIL_FORMAT', default='WEBP')
+RECIPE_THUMBNAIL_WORKERS = int(
+    os.getenv('RECIPE_THUMBNAIL_WORKERS', default=2)
+)
+
+SHOPPING_LIST_PDF_FONT = os.getenv(
+    'SHOPPING_LIST_PDF_FONT',
+    default='/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+)
+
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -111,7 +207,7 @@ REST_FRAMEWORK = {
         'django_filters.rest_framework.DjangoFilterBackend',
     ),
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ),
     'DEFAULT_PAGINATION_CLASS':
         'rest_framework.pagination.PageNumberPagination',
@@ -0,0 +1,28 @@
+import tempfile
+
+from foodgram.settings import *  # noqa: F401,F403
+from foodgram.settings import os
+
+# Тесты идут на SQLite в памяти, если БД не задана явно: с DB_ENGINE
+# и переменными подключения - на PostgreSQL.
+if 'DB_ENGINE' not in os.environ:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': ':memory:',
+        }
+    }
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'foodgram-tests',
+    }
+}
+
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+MEDIA_ROOT = tempfile.mkdtemp(prefix='foodgram-media-')
+
+# Превышение бюджета SQL-запросов эндпоинта роняет тест.
+QUERY_BUDGET_ACTION = 'raise'
@@ -0,0 +1,62 @@
+"""Настройки gunicorn, значения переопределяются переменными окружения.
+
+GUNICORN_WORKERS   - процессов, по умолчанию число CPU, а с кэшем
+                     locmem - 1.
+GUNICORN_THREADS   - потоков в процессе (воркер gthread), по умолчанию 4.
+                     Потоки делят пул соединений с БД, если задан
+                     DB_POOL_SIZE = GUNICORN_THREADS
+                     + RECIPE_THUMBNAIL_WORKERS.
+GUNICORN_TIMEOUT   - секунд на запрос до перезапуска воркера.
+GUNICORN_MAX_REQUESTS, GUNICORN_MAX_REQUESTS_JITTER - перезапуск
+                     воркера после случайного в пределах jitter числа
+                     запросов, чтобы воркеры не перезапускались разом.
+
+Несколько воркеров требуют общего кэша (CACHE_BACKEND): с locmem
+каждый процесс хранил бы свои версии моделей и страницы списка
+рецептов и отдавал бы устаревшие данные. Поэтому без CACHE_BACKEND
+запускается один воркер, а явный GUNICORN_WORKERS больше 1 с locmem
+останавливает запуск.
+"""
+import multiprocessing
+import os
+
+LOCAL_CACHE_BACKENDS = ('django.core.cache.backends.locmem.LocMemCache',)
+
+
+def get_local_caches():
+    """Кэши Django, которые не разделяются между процессами."""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
+    from django.conf import settings
+
+    return [
+        alias for alias, options in settings.CACHES.items()
+        if options['BACKEND'] in LOCAL_CACHE_BACKENDS
+    ]
+
+
+bind = os.getenv('GUNICORN_BIND', default='0.0.0.0:8000')
+worker_class = 'gthread'
+workers = int(os.getenv(
+    'GUNICORN_WORKERS',
+    default=1 if get_local_caches() else multiprocessing.cpu_count()
+))
+threads = int(os.getenv('GUNICORN_THREADS', default=4))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', default=30))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', default=30))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', default=5))
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', default=1000))
+max_requests_jitter = int(
+    os.getenv('GUNICORN_MAX_REQUESTS_JITTER', default=100)
+)
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', default='-')
+errorlog = '-'
+
+
+def on_starting(server):
+    local = get_local_caches()
+    if server.cfg.workers > 1 and local:
+        raise RuntimeError(
+            f'Кэш {", ".join(local)} не общий для {server.cfg.workers} '
+            'воркеров: задайте CACHE_BACKEND (например, FileBasedCache) '
+            'или GUNICORN_WORKERS=1.'
+        )
@@ -1,14 +1,21 @@
 from django.contrib import admin
 
-from recipes.models import Ingredient, Tag, Recipe, User
+from recipes.models import Ingredient, Tag, Recipe, Unit, User
 
 
 @admin.register(Ingredient)
 class IngredientAdmin(admin.ModelAdmin):
-    list_display = ('name', 'measurement_unit')
+    list_display = ('name', 'measurement_unit', 'canonical_unit',
+                    'unit_factor')
     list_filter = ('name',)
 
 
+@admin.register(Unit)
+class UnitAdmin(admin.ModelAdmin):
+    list_display = ('name', 'base_unit', 'factor', 'display')
+    list_filter = ('base_unit', 'display')
+
+
 @admin.register(Tag)
 class TagAdmin(admin.ModelAdmin):
     list_display = ('name', 'color', 'slug')
@@ -17,5 +24,6 @@ class TagAdmin(admin.ModelAdmin):
 
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
-    list_display = ('author', 'name', 'text', 'cooking_time')
+    list_display = ('author', 'name', 'text', 'cooking_time',
+                    'favorites_count', 'in_carts_count')
     list_filter = ('author', 'name', 'tags')
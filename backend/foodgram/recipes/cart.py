@@ -0,0 +1,161 @@
+from itertools import islice
+
+from django.db import connections, router
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Greatest
+
+from recipes.models import IngredientRecipe, ShoppingCart, ShoppingListItem
+
+
+def _upsert(source, columns, params, recipe_ids, group_by=''):
+    """INSERT ... SELECT columns FROM source WHERE recipe_id IN (...)
+    в ShoppingListItem, прибавляющий amount к существующим строкам
+    (ON CONFLICT DO UPDATE в PostgreSQL и SQLite 3.24+).
+    Args:
+        source (Type[Model]): Модель таблицы с полем recipe_id.
+        columns (str): Выражения для user_id, ingredient_id, amount.
+        params (list): Параметры columns.
+        recipe_ids (list[int]): Рецепты.
+        group_by (str): GROUP BY, если одна пара пользователь -
+            ингредиент может встретиться в source несколько раз.
+    """
+    connection = connections[router.db_for_write(ShoppingListItem)]
+    qn = connection.ops.quote_name
+    table = qn(ShoppingListItem._meta.db_table)
+    placeholders = ', '.join(['%s'] * len(recipe_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} ("user_id", "ingredient_id", "amount") '
+            f'SELECT {columns} FROM {qn(source._meta.db_table)} '
+            f'WHERE "recipe_id" IN ({placeholders}) {group_by} '
+            'ON CONFLICT ("user_id", "ingredient_id") '
+            f'DO UPDATE SET "amount" = {table}."amount" + EXCLUDED."amount"',
+            [*params, *recipe_ids]
+        )
+
+
+def _subtract(items, recipe_ids):
+    """Вычитает ингредиенты рецептов из строк items и удаляет
+    опустевшие строки.
+    """
+    recipe_ingredients = IngredientRecipe.objects.filter(
+        recipe_id__in=recipe_ids
+    )
+    items.filter(
+        ingredient__in=recipe_ingredients.values('ingredient')
+    ).update(amount=Greatest(
+        F('amount') - Subquery(
+            recipe_ingredients.filter(
+                ingredient=OuterRef('ingredient')
+            ).order_by().values('ingredient').annotate(
+                total=Sum('amount')
+            ).values('total')
+        ),
+        Value(0)
+    ))
+    items.filter(amount=0).delete()
+
+
+def add_recipes(user_id, recipe_ids):
+    """Прибавляет ингредиенты рецептов к списку покупок пользователя
+    одним запросом.
+    """
+    _upsert(IngredientRecipe, '%s, "ingredient_id", SUM("amount")',
+            [user_id], recipe_ids, group_by='GROUP BY "ingredient_id"')
+
+
+def remove_recipes(user_id, recipe_ids):
+    """Вычитает ингредиенты рецептов из списка покупок пользователя."""
+    _subtract(ShoppingListItem.objects.filter(user_id=user_id), recipe_ids)
+
+
+def remove_recipe_from_all(recipe_id):
+    """Вычитает ингредиенты удаляемого рецепта из списков покупок всех
+    пользователей, у которых он в корзине. Вызывается до удаления:
+    строки ShoppingCart удаляются каскадно.
+    """
+    _subtract(
+        ShoppingListItem.objects.filter(
+            user_id__in=ShoppingCart.objects.filter(
+                recipe_id=recipe_id
+            ).values('user_id')
+        ),
+        [recipe_id]
+    )
+
+
+def change_recipe_ingredients(recipe_id, deltas):
+    """Переносит изменение состава рецепта в списки покупок всех
+    пользователей, у которых он в корзине: все изменения одним
+    INSERT ... SELECT из корзин с ON CONFLICT DO UPDATE, затем один
+    DELETE опустевших строк. Если рецепта нет ни в одной корзине,
+    выполняется только проверка этого.
+    Args:
+        recipe_id (int): Рецепт.
+        deltas (dict): Изменение количества по id ингредиента.
+    """
+    deltas = {
+        ingredient_id: delta
+        for ingredient_id, delta in deltas.items() if delta
+    }
+    carts = ShoppingCart.objects.filter(recipe_id=recipe_id)
+    if not deltas or not carts.exists():
+        return
+    connection = connections[router.db_for_write(ShoppingListItem)]
+    qn = connection.ops.quote_name
+    table = qn(ShoppingListItem._meta.db_table)
+    greatest = 'GREATEST' if connection.vendor == 'postgresql' else 'MAX'
+    rows = ' UNION ALL '.join(
+        ['SELECT %s AS "ingredient_id", %s AS "delta"'] * len(deltas)
+    )
+    cases = ' '.join(['WHEN %s THEN %s'] * len(deltas))
+    pairs = [value for pair in deltas.items() for value in pair]
+    # Новые строки получают только прибавку: у отсутствующей строки
+    # уменьшать нечего, её удалит DELETE ниже.
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} ("user_id", "ingredient_id", "amount") '
+            f'SELECT cart."user_id", delta."ingredient_id", '
+            f'{greatest}(delta."delta", 0) '
+            f'FROM {qn(ShoppingCart._meta.db_table)} AS cart '
+            f'CROSS JOIN ({rows}) AS delta '
+            'WHERE cart."recipe_id" = %s '
+            'ON CONFLICT ("user_id", "ingredient_id") '
+            f'DO UPDATE SET "amount" = {greatest}({table}."amount" + '
+            f'CASE EXCLUDED."ingredient_id" {cases} END, 0)',
+            [*pairs, recipe_id, *pairs]
+        )
+    if any(delta < 0 for delta in deltas.values()):
+        ShoppingListItem.objects.filter(
+            user_id__in=carts.values('user_id'),
+            ingredient_id__in=list(deltas),
+            amount=0
+        ).delete()
+
+
+def rebuild_shopping_lists(apps, batch_size=10000):
+    """Пересчитывает списки покупок всех пользователей по корзинам.
+    Args:
+        apps: Реестр приложений (django.apps.apps или из миграции).
+        batch_size (int): Сколько строк вставлять за раз.
+    Returns:
+        int: Количество строк в списках покупок.
+    """
+    Item = apps.get_model('recipes', 'ShoppingListItem')
+    Item.objects.all().delete()
+    rows = apps.get_model('recipes', 'IngredientRecipe').objects.filter(
+        recipe__in_shoping_cart__isnull=False
+    ).values(
+        'ingredient_id', user_id=F('recipe__in_shoping_cart__user_id')
+    ).annotate(total=Sum('amount')).order_by().values_list(
+        'user_id', 'ingredient_id', 'total'
+    ).iterator(chunk_size=batch_size)
+    while True:
+        batch = [
+            Item(user_id=user_id, ingredient_id=ingredient_id, amount=total)
+            for user_id, ingredient_id, total in islice(rows, batch_size)
+        ]
+        if not batch:
+            break
+        Item.objects.bulk_create(batch)
+    return Item.objects.count()
@@ -0,0 +1,107 @@
+import sqlite3
+
+from django.db import connections, router
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def increment(model, pk, field, delta=1):
+    """Изменяет счётчик одним UPDATE ... SET field = field + delta."""
+    model.objects.filter(pk=pk).update(**{field: F(field) + delta})
+
+
+def can_return_rows(connection):
+    """Поддерживает ли БД RETURNING в INSERT, UPDATE и DELETE."""
+    return connection.vendor == 'postgresql' or (
+        connection.vendor == 'sqlite'
+        and sqlite3.sqlite_version_info >= (3, 35)
+    )
+
+
+def increment_many(model, pks, field, delta=1):
+    """Изменяет счётчик у нескольких объектов одним UPDATE.
+    Returns:
+        int: Количество обновлённых строк.
+    """
+    return model.objects.filter(pk__in=pks).update(
+        **{field: F(field) + delta}
+    )
+
+
+def increment_returning(model, pk, field, delta, fields):
+    """Как increment, но возвращает объект с полями fields из того же
+    UPDATE ... RETURNING (PostgreSQL, SQLite 3.35+), для остальных БД
+    отдельным SELECT.
+    Returns:
+        Model | None: Объект или None, если строки с таким pk нет.
+    """
+    connection = connections[router.db_for_write(model)]
+    if not can_return_rows(connection):
+        increment(model, pk, field, delta)
+        return model.objects.only(*fields).filter(pk=pk).first()
+    opts = model._meta
+    qn = connection.ops.quote_name
+    column = qn(opts.get_field(field).column)
+    # from_db ожидает значения в порядке полей модели.
+    names = set(fields)
+    returned = [
+        item for item in opts.concrete_fields
+        if item.name in names or item.attname in names
+    ]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE {qn(opts.db_table)} SET {column} = {column} + %s '
+            f'WHERE {qn(opts.pk.column)} = %s RETURNING '
+            + ', '.join(qn(item.column) for item in returned),
+            [delta, pk]
+        )
+        row = cursor.fetchone()
+    if row is None:
+        return None
+    values = []
+    for item, value in zip(returned, row):
+        expression = item.get_col(opts.db_table)
+        for converter in (connection.ops.get_db_converters(expression)
+                          + item.get_db_converters(connection)):
+            value = converter(value, expression, connection)
+        values.append(value)
+    return model.from_db(
+        connection.alias, [item.attname for item in returned], values
+    )
+
+
+def _count_subquery(model, field):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(
+                **{field: OuterRef('pk')}
+            ).order_by().values(field).annotate(
+                count=Count('pk')
+            ).values('count')
+        ),
+        Value(0)
+    )
+
+
+def recount(apps):
+    """Пересчитывает все денормализованные счётчики по исходным таблицам.
+    Args:
+        apps: Реестр приложений (django.apps.apps или из миграции).
+    Returns:
+        dict: Количество обновлённых строк по моделям.
+    """
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Favorite = apps.get_model('recipes', 'Favorite')
+    ShoppingCart = apps.get_model('recipes', 'ShoppingCart')
+    User = apps.get_model('users', 'User')
+    Follow = apps.get_model('users', 'Follow')
+    return {
+        'recipes': Recipe.objects.update(
+            favorites_count=_count_subquery(Favorite, 'recipe'),
+            in_carts_count=_count_subquery(ShoppingCart, 'recipe'),
+        ),
+        'users': User.objects.update(
+            recipes_count=_count_subquery(Recipe, 'author'),
+            followers_count=_count_subquery(Follow, 'author'),
+        ),
+    }
@@ -0,0 +1,102 @@
+from itertools import islice
+
+from django.db.models import Count, F
+
+from recipes.models import FeedItem, Recipe
+from users.models import Follow, User
+
+
+def feed_queryset(user):
+    """Рецепты авторов, на которых подписан пользователь, с датой
+    публикации в аннотации feed_date для keyset-пагинации.
+    Обычно лента собирается при чтении: подзапрос по подпискам
+    и индекс рецептов (author, -pub_date, -id). Для пользователей
+    с feed_materialized она читается из таблицы FeedItem по индексу
+    (user, -pub_date, -recipe).
+    Args:
+        user (User): Текущий пользователь.
+    Returns:
+        QuerySet[Recipe]: Рецепты ленты без сортировки.
+    """
+    if user.feed_materialized:
+        return Recipe.objects.filter(feed_items__user=user).annotate(
+            feed_date=F('feed_items__pub_date')
+        )
+    return Recipe.objects.filter(
+        author__in=Follow.objects.filter(user=user).values('author')
+    ).annotate(feed_date=F('pub_date'))
+
+
+def add_recipe(recipe):
+    """Добавляет новый рецепт в материализованные ленты подписчиков
+    автора. Удалённые рецепты уходят из лент каскадно.
+    """
+    followers = Follow.objects.filter(
+        author_id=recipe.author_id, user__feed_materialized=True
+    ).values_list('user_id', flat=True)
+    FeedItem.objects.bulk_create(
+        [
+            FeedItem(user_id=user_id, recipe_id=recipe.pk,
+                     pub_date=recipe.pub_date)
+            for user_id in followers
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def follow(user_id, author_ids):
+    """Добавляет рецепты авторов в материализованную ленту."""
+    FeedItem.objects.bulk_create(
+        [
+            FeedItem(user_id=user_id, recipe_id=recipe_id,
+                     pub_date=pub_date)
+            for recipe_id, pub_date in Recipe.objects.filter(
+                author_id__in=author_ids
+            ).values_list('id', 'pub_date').order_by()
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def unfollow(user_id, author_ids):
+    """Убирает рецепты авторов из материализованной ленты."""
+    FeedItem.objects.filter(
+        user_id=user_id, recipe__author_id__in=author_ids
+    ).delete()
+
+
+def rebuild_feeds(min_follows, batch_size=10000):
+    """Материализует ленты пользователей, подписанных не меньше чем
+    на min_follows авторов, у остальных удаляет.
+    Args:
+        min_follows (int): Порог подписок, 0 - отключить материализацию.
+        batch_size (int): Сколько записей вставлять за раз.
+    Returns:
+        dict: Количество пользователей с лентой и записей в лентах.
+    """
+    materialized = Follow.objects.none().values('user_id')
+    if min_follows > 0:
+        materialized = Follow.objects.order_by().values('user_id').annotate(
+            follows=Count('id')
+        ).filter(follows__gte=min_follows).values('user_id')
+    User.objects.filter(feed_materialized=True).exclude(
+        pk__in=materialized
+    ).update(feed_materialized=False)
+    users = User.objects.filter(pk__in=materialized).update(
+        feed_materialized=True
+    )
+    FeedItem.objects.all().delete()
+    rows = Follow.objects.filter(
+        user__feed_materialized=True, author__recipe__isnull=False
+    ).values_list(
+        'user_id', 'author__recipe__id', 'author__recipe__pub_date'
+    ).order_by().iterator(chunk_size=batch_size)
+    while True:
+        batch = [
+            FeedItem(user_id=user_id, recipe_id=recipe_id, pub_date=pub_date)
+            for user_id, recipe_id, pub_date in islice(rows, batch_size)
+        ]
+        if not batch:
+            break
+        FeedItem.objects.bulk_create(batch)
+    return {'users': users, 'items': FeedItem.objects.count()}
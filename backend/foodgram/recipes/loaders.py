@@ -0,0 +1,78 @@
+import csv
+import json
+from itertools import islice
+
+from django.db import transaction
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+def read_csv(path):
+    """Строки name,measurement_unit из CSV без заголовка."""
+    with open(path, encoding='utf-8', newline='') as csvfile:
+        for row in csv.reader(csvfile):
+            if row:
+                yield ','.join(row[:-1]).strip(), row[-1].strip()
+
+
+def read_json(path):
+    """Ингредиенты из JSON-массива или JSON Lines (читается построчно)."""
+    with open(path, encoding='utf-8') as jsonfile:
+        first = jsonfile.read(1)
+        while first.isspace():
+            first = jsonfile.read(1)
+        jsonfile.seek(0)
+        if first == '[':
+            items = json.load(jsonfile)
+        else:
+            items = (json.loads(line) for line in jsonfile if line.strip())
+        for item in items:
+            yield item['name'].strip(), item['measurement_unit'].strip()
+
+
+READERS = {
+    'csv': read_csv,
+    'json': read_json,
+}
+
+
+def read_ingredients(path, file_format=None):
+    file_format = file_format or str(path).rsplit('.', 1)[-1].lower()
+    if file_format == 'jsonl':
+        file_format = 'json'
+    return READERS[file_format](path)
+
+
+def _batches(rows, batch_size):
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def load_ingredients(model, rows, batch_size=DEFAULT_BATCH_SIZE):
+    """Добавляет ингредиенты пачками, пропуская уже существующие.
+    Args:
+        model (Model): Модель Ingredient.
+        rows (Iterable[tuple]): Пары (name, measurement_unit).
+        batch_size (int): Размер пачки bulk_create.
+    Returns:
+        tuple[int, int]: Количество добавленных и пропущенных строк.
+    """
+    seen = set()
+    processed = 0
+    with transaction.atomic():
+        before = model.objects.count()
+        for batch in _batches(rows, batch_size):
+            processed += len(batch)
+            new_rows = dict.fromkeys(row for row in batch if row not in seen)
+            seen.update(new_rows)
+            model.objects.bulk_create(
+                [model(name=name, measurement_unit=measurement_unit)
+                 for name, measurement_unit in new_rows],
+                ignore_conflicts=True,
+            )
+        inserted = model.objects.count() - before
+    return inserted, processed - inserted
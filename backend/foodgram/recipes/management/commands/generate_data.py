@@ -0,0 +1,178 @@
+import random
+from itertools import islice
+
+from django.apps import apps
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.cart import rebuild_shopping_lists
+from recipes.counters import recount
+from recipes.models import (Favorite,
+                            Ingredient,
+                            IngredientRecipe,
+                            Recipe,
+                            ShoppingCart,
+                            Tag)
+from recipes.search import rebuild_search_index
+from users.models import Follow, User
+
+BATCH_SIZE = 1000
+
+
+def zipf_weights(size, exponent=1.1):
+    """Веса «популярности»: немногие элементы встречаются очень часто."""
+    return [1 / (rank ** exponent) for rank in range(1, size + 1)]
+
+
+def sample_weighted(rng, population, weights, count):
+    """Выборка без повторов с учётом весов."""
+    count = min(count, len(population))
+    chosen = set()
+    while len(chosen) < count:
+        chosen.update(rng.choices(population, weights, k=count - len(chosen)))
+    return list(chosen)
+
+
+def batched(iterable, size=BATCH_SIZE):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class Command(BaseCommand):
+    help = ('Создаёт тестовых пользователей, рецепты, избранное, '
+            'списки покупок и подписки пакетными вставками.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--recipes', type=int, default=1000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--prefix', default='bench')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        prefix = options['prefix']
+        ingredients = list(Ingredient.objects.values_list('id', flat=True))
+        tags = list(Tag.objects.values_list('id', flat=True))
+        if not ingredients or not tags:
+            raise CommandError('Сначала загрузите ингредиенты и теги.')
+        if User.objects.filter(username__startswith=f'{prefix}_').exists():
+            raise CommandError(
+                f'Пользователи с префиксом {prefix}_ уже есть, '
+                'укажите другой --prefix.'
+            )
+
+        with transaction.atomic():
+            users = self.create_users(prefix, options['users'])
+            recipes = self.create_recipes(
+                rng, prefix, users, options['recipes']
+            )
+            self.create_recipe_relations(rng, recipes, ingredients, tags)
+            self.create_user_relations(rng, users, recipes)
+            recount(apps)
+            rebuild_shopping_lists(apps)
+            rebuild_search_index()
+        # Пакетные вставки не отправляют сигналы, сбрасываем кэш ответов.
+        cache.clear()
+        self.stdout.write(self.style.SUCCESS(
+            f'Пользователей: {len(users)}, рецептов: {len(recipes)}'
+        ))
+
+    @staticmethod
+    def create_users(prefix, count):
+        password = make_password('benchmark-password')
+        for batch in batched(range(count)):
+            User.objects.bulk_create(
+                User(
+                    username=f'{prefix}_{number}',
+                    email=f'{prefix}_{number}@example.com',
+                    first_name=f'Имя{number}',
+                    last_name=f'Фамилия{number}',
+                    password=password,
+                )
+                for number in batch
+            )
+        return list(User.objects.filter(
+            username__startswith=f'{prefix}_'
+        ).values_list('id', flat=True))
+
+    @staticmethod
+    def create_recipes(rng, prefix, users, count):
+        author_weights = zipf_weights(len(users))
+        authors = rng.choices(users, author_weights, k=count)
+        for batch in batched(range(count)):
+            Recipe.objects.bulk_create(
+                Recipe(
+                    author_id=authors[number],
+                    name=f'{prefix} рецепт {number}',
+                    text=' '.join(
+                        rng.choice(('Смешать', 'нарезать', 'обжарить',
+                                    'запечь', 'посолить', 'подавать'))
+                        for _ in range(rng.randint(20, 120))
+                    ),
+                    image='recipes/benchmark.png',
+                    cooking_time=rng.randint(5, 180),
+                )
+                for number in batch
+            )
+        return list(Recipe.objects.filter(
+            name__startswith=f'{prefix} рецепт '
+        ).values_list('id', flat=True))
+
+    @staticmethod
+    def create_recipe_relations(rng, recipes, ingredients, tags):
+        ingredient_weights = zipf_weights(len(ingredients), exponent=0.8)
+        shuffled = ingredients[:]
+        rng.shuffle(shuffled)
+        tag_weights = zipf_weights(len(tags), exponent=0.5)
+        TagRelation = Recipe.tags.through
+        for batch in batched(recipes, 200):
+            rows, tag_rows = [], []
+            for recipe_id in batch:
+                count = round(rng.triangular(3, 25, 8))
+                for ingredient_id in sample_weighted(
+                        rng, shuffled, ingredient_weights, count):
+                    rows.append(IngredientRecipe(
+                        recipe_id=recipe_id,
+                        ingredient_id=ingredient_id,
+                        amount=rng.choice((1, 2, 5, 10, 50, 100, 200, 500)),
+                    ))
+                for tag_id in sample_weighted(
+                        rng, tags, tag_weights, rng.randint(1, len(tags))):
+                    tag_rows.append(
+                        TagRelation(recipe_id=recipe_id, tag_id=tag_id)
+                    )
+            IngredientRecipe.objects.bulk_create(rows)
+            TagRelation.objects.bulk_create(tag_rows)
+
+    @staticmethod
+    def create_user_relations(rng, users, recipes):
+        recipe_weights = zipf_weights(len(recipes), exponent=0.9)
+        author_weights = zipf_weights(len(users))
+        for batch in batched(users, 100):
+            favorites, carts, follows = [], [], []
+            for user_id in batch:
+                favorites.extend(
+                    Favorite(user_id=user_id, recipe_id=recipe_id)
+                    for recipe_id in sample_weighted(
+                        rng, recipes, recipe_weights, rng.randint(0, 40))
+                )
+                carts.extend(
+                    ShoppingCart(user_id=user_id, recipe_id=recipe_id)
+                    for recipe_id in sample_weighted(
+                        rng, recipes, recipe_weights, rng.randint(0, 15))
+                )
+                follows.extend(
+                    Follow(user_id=user_id, author_id=author_id)
+                    for author_id in sample_weighted(
+                        rng, users, author_weights, rng.randint(0, 30))
+                    if author_id != user_id
+                )
+            Favorite.objects.bulk_create(favorites)
+            ShoppingCart.objects.bulk_create(carts)
+            Follow.objects.bulk_create(follows)
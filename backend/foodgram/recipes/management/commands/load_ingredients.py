@@ -0,0 +1,49 @@
+import os
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.loaders import (DEFAULT_BATCH_SIZE,
+                             READERS,
+                             load_ingredients,
+                             read_ingredients)
+from recipes.models import Ingredient
+from recipes.units import normalize_ingredients
+
+
+class Command(BaseCommand):
+    help = 'Загружает ингредиенты из CSV или JSON пачками.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            nargs='?',
+            default=os.path.join(settings.BASE_DIR, 'ingredients.csv'),
+            help='Файл с ингредиентами (по умолчанию ingredients.csv).',
+        )
+        parser.add_argument(
+            '--format',
+            choices=tuple(READERS),
+            help='Формат файла, если он не следует из расширения.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help='Количество строк в одном INSERT.',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            rows = read_ingredients(options['path'], options['format'])
+            inserted, skipped = load_ingredients(
+                Ingredient, rows, options['batch_size']
+            )
+        except (OSError, KeyError, ValueError) as error:
+            raise CommandError(f'Не удалось загрузить ингредиенты: {error}')
+        # Пачки вставляются без сигналов pre_save.
+        normalize_ingredients(apps)
+        self.stdout.write(self.style.SUCCESS(
+            f'Добавлено: {inserted}, пропущено: {skipped}'
+        ))
@@ -0,0 +1,25 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.units import normalize_ingredients
+
+
+class Command(BaseCommand):
+    help = 'Заполняет канонические единицы ингредиентов по таблице единиц.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Пересчитать и ингредиенты с заданной вручную единицей.',
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            updated = normalize_ingredients(
+                apps, only_missing=not options['all']
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Обновлено ингредиентов: {updated}'
+        ))
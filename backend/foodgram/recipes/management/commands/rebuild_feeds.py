@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.feed import rebuild_feeds
+
+
+class Command(BaseCommand):
+    help = ('Материализует ленты подписок пользователей с большим числом '
+            'подписок, остальным лента собирается при чтении.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--min-follows', type=int,
+            default=settings.FEED_MATERIALIZE_MIN_FOLLOWS,
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            result = rebuild_feeds(options['min_follows'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Пользователей с лентой: {result["users"]}, '
+            f'записей: {result["items"]}'
+        ))
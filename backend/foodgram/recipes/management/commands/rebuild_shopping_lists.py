@@ -0,0 +1,16 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.cart import rebuild_shopping_lists
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает сводные списки покупок по корзинам.'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            items = rebuild_shopping_lists(apps)
+        self.stdout.write(self.style.SUCCESS(
+            f'Строк в списках покупок: {items}'
+        ))
@@ -0,0 +1,18 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.counters import recount
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает счётчики избранного, покупок, '
+            'рецептов и подписчиков.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            updated = recount(apps)
+        self.stdout.write(self.style.SUCCESS(
+            f'Рецептов: {updated["recipes"]}, '
+            f'пользователей: {updated["users"]}'
+        ))
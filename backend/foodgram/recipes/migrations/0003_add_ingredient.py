@@ -1,31 +1,52 @@
 # Generated by Django 2.2.16 on 2023-02-07 19:58
 
-from pathlib import Path
+import csv
+import os
 
+from django.conf import settings
 from django.db import migrations
 
-data = Path('ingredients.csv')
+data = os.path.join(settings.BASE_DIR, 'ingredients.csv')
+BATCH_SIZE = 1000
+
+# Разбор CSV и загрузка скопированы из recipes.loaders на момент
+# миграции: дальнейшие изменения загрузчика её не затрагивают.
+
+
+def read_ingredients():
+    """Пары (name, measurement_unit) из CSV без повторов."""
+    with open(data, encoding='utf-8', newline='') as csvfile:
+        return list(dict.fromkeys(
+            (','.join(row[:-1]).strip(), row[-1].strip())
+            for row in csv.reader(csvfile) if row
+        ))
 
 
 def add_ingredients(apps, schema_editor):
     Ingredient = apps.get_model('recipes', 'Ingredient')
-    with open(data, 'r') as csvfile:
-        for ingredient in csvfile.readlines():
-            ingredient = ingredient.rstrip().split(',')
-            measurement_unit = ingredient[-1]
-            name = ','.join(ingredient[:-1])
-
-            Ingredient(name=name,
-                       measurement_unit=measurement_unit).save()
+    Ingredient.objects.bulk_create(
+        [
+            Ingredient(name=name, measurement_unit=measurement_unit)
+            for name, measurement_unit in read_ingredients()
+        ],
+        ignore_conflicts=True,
+    )
 
 
 def remove_ingredients(apps, schema_editor):
     Ingredient = apps.get_model('recipes', 'Ingredient')
-    with open(data, 'r') as csvfile:
-        for ingredient in csvfile:
-            ingredient = ingredient.rstrip().split(',')
-            name = ','.join(ingredient[:-1])
-            Ingredient.objects.get(name=name).delete()
+    units_by_name = {}
+    for name, measurement_unit in read_ingredients():
+        units_by_name.setdefault(name, set()).add(measurement_unit)
+    names = list(units_by_name)
+    for start in range(0, len(names), BATCH_SIZE):
+        ids = [
+            pk for pk, name, measurement_unit in Ingredient.objects.filter(
+                name__in=names[start:start + BATCH_SIZE]
+            ).values_list('id', 'name', 'measurement_unit')
+            if measurement_unit in units_by_name[name]
+        ]
+        Ingredient.objects.filter(id__in=ids).delete()
 
 
 class Migration(migrations.Migration):
@@ -0,0 +1,39 @@
+from django.db import migrations
+
+CREATE_INDEXES = (
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX IF NOT EXISTS recipes_ingredient_name_upper_like '
+    'ON recipes_ingredient (UPPER(name) varchar_pattern_ops)',
+    'CREATE INDEX IF NOT EXISTS recipes_ingredient_name_upper_trgm '
+    'ON recipes_ingredient USING gin (UPPER(name) gin_trgm_ops)',
+)
+
+DROP_INDEXES = (
+    'DROP INDEX IF EXISTS recipes_ingredient_name_upper_trgm',
+    'DROP INDEX IF EXISTS recipes_ingredient_name_upper_like',
+)
+
+
+def run_postgres_only(statements):
+    def run(apps, schema_editor):
+        # istartswith/icontains в PostgreSQL строятся как
+        # UPPER(name) LIKE UPPER(...), поэтому индексы по выражению.
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_add_tag'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_postgres_only(CREATE_INDEXES),
+            run_postgres_only(DROP_INDEXES),
+        )
+    ]
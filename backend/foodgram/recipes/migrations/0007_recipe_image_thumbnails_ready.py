@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-18 02:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_recipe_ordering'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_thumbnails_ready',
+            field=models.BooleanField(default=False, editable=False, verbose_name='image thumbnails ready'),
+        ),
+    ]
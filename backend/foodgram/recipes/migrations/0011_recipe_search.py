@@ -0,0 +1,80 @@
+from django.db import migrations
+
+CREATE = {
+    'postgresql': (
+        'ALTER TABLE recipes_recipe ADD COLUMN search_vector tsvector',
+        'CREATE INDEX recipes_recipe_search_vector_gin '
+        'ON recipes_recipe USING gin (search_vector)',
+    ),
+    'sqlite': (
+        'CREATE VIRTUAL TABLE recipes_recipe_fts USING fts5('
+        "name, ingredients, text, tokenize='unicode61 remove_diacritics 2')",
+    ),
+}
+
+# Заполнение индекса всех рецептов на момент миграции
+# (recipes.search.rebuild_search_index).
+REBUILD = {
+    'postgresql': (
+        """
+        UPDATE recipes_recipe AS recipe SET search_vector =
+            setweight(to_tsvector('russian', recipe.name), 'A')
+            || setweight(to_tsvector('russian', coalesce((
+                SELECT string_agg(ingredient.name, ' ')
+                FROM recipes_ingredientrecipe AS link
+                JOIN recipes_ingredient AS ingredient
+                    ON ingredient.id = link.ingredient_id
+                WHERE link.recipe_id = recipe.id
+            ), '')), 'B')
+            || setweight(to_tsvector('russian', recipe.text), 'C')
+        """,
+    ),
+    'sqlite': (
+        """
+        INSERT INTO recipes_recipe_fts (rowid, name, ingredients, text)
+        SELECT recipe.id, recipe.name, coalesce((
+            SELECT group_concat(ingredient.name, ' ')
+            FROM recipes_ingredientrecipe AS link
+            JOIN recipes_ingredient AS ingredient
+                ON ingredient.id = link.ingredient_id
+            WHERE link.recipe_id = recipe.id
+        ), ''), recipe.text
+        FROM recipes_recipe AS recipe
+        """,
+    ),
+}
+
+DROP = {
+    'postgresql': (
+        'DROP INDEX IF EXISTS recipes_recipe_search_vector_gin',
+        'ALTER TABLE recipes_recipe DROP COLUMN IF EXISTS search_vector',
+    ),
+    'sqlite': (
+        'DROP TABLE IF EXISTS recipes_recipe_fts',
+    ),
+}
+
+
+def create_search_index(apps, schema_editor):
+    # Поисковый вектор не является полем модели: в PostgreSQL это
+    # столбец tsvector с GIN-индексом, в SQLite - таблица FTS5.
+    connection = schema_editor.connection
+    for statement in (*CREATE.get(connection.vendor, ()),
+                      *REBUILD.get(connection.vendor, ())):
+        schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    for statement in DROP.get(schema_editor.connection.vendor, ()):
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_recipe_pub_date_and_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
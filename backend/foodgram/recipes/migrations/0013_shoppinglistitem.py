@@ -0,0 +1,63 @@
+# Generated by Django 2.2.16 on 2026-10-18 02:59
+
+from itertools import islice
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import F, Sum
+
+BATCH_SIZE = 10000
+
+
+def fill_shopping_lists(apps, schema_editor):
+    # Сводные списки по текущим корзинам; таблица только что создана.
+    Item = apps.get_model('recipes', 'ShoppingListItem')
+    rows = apps.get_model('recipes', 'IngredientRecipe').objects.filter(
+        recipe__in_shoping_cart__isnull=False
+    ).values(
+        'ingredient_id', user_id=F('recipe__in_shoping_cart__user_id')
+    ).annotate(total=Sum('amount')).order_by().values_list(
+        'user_id', 'ingredient_id', 'total'
+    ).iterator(chunk_size=BATCH_SIZE)
+    while True:
+        batch = [
+            Item(user_id=user_id, ingredient_id=ingredient_id, amount=total)
+            for user_id, ingredient_id, total in islice(rows, BATCH_SIZE)
+        ]
+        if not batch:
+            break
+        Item.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0012_feeditem'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShoppingListItem',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.PositiveIntegerField(verbose_name='amount')),
+                ('ingredient', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='shopping_list_items', to='recipes.Ingredient', verbose_name='ingredient')),
+                ('user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='shopping_list', to=settings.AUTH_USER_MODEL, verbose_name='user')),
+            ],
+            options={
+                'verbose_name': 'Shopping list item',
+                'verbose_name_plural': 'Shopping list items',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='shoppinglistitem',
+            index=models.Index(fields=['ingredient'], name='shopping_list_ingredient_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='shoppinglistitem',
+            constraint=models.UniqueConstraint(fields=('user', 'ingredient'), name='unique_shopping_list_item'),
+        ),
+        migrations.RunPython(fill_shopping_lists, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 2.2.16 on 2026-10-18 03:01
+
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+# name, base_unit, factor, display
+UNITS = (
+    ('мг', 'г', 0.001, False),
+    ('г', 'г', 1, True),
+    ('кг', 'г', 1000, True),
+    ('мл', 'мл', 1, True),
+    ('л', 'мл', 1000, True),
+    ('капля', 'мл', 0.05, False),
+    ('ч. л.', 'мл', 5, False),
+    ('ст. л.', 'мл', 15, False),
+    ('стакан', 'мл', 250, False),
+)
+
+
+def fill_units(apps, schema_editor):
+    # Начальная таблица единиц; canonical_unit и unit_factor
+    # ингредиентов - по ней, как в recipes.units.normalize_ingredients.
+    Unit = apps.get_model('recipes', 'Unit')
+    Unit.objects.bulk_create(
+        [
+            Unit(name=name, base_unit=base_unit, factor=factor,
+                 display=display)
+            for name, base_unit, factor, display in UNITS
+        ],
+        ignore_conflicts=True,
+    )
+    units = Unit.objects.filter(name=OuterRef('measurement_unit'))
+    apps.get_model('recipes', 'Ingredient').objects.update(
+        canonical_unit=Coalesce(
+            Subquery(units.values('base_unit')[:1]), F('measurement_unit')
+        ),
+        unit_factor=Coalesce(
+            Subquery(units.values('factor')[:1]), Value(1.0)
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0013_shoppinglistitem'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Unit',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True, verbose_name='name')),
+                ('base_unit', models.CharField(max_length=100, verbose_name='base unit')),
+                ('factor', models.FloatField(verbose_name='factor')),
+                ('display', models.BooleanField(default=False, verbose_name='display unit')),
+            ],
+            options={
+                'verbose_name': 'Unit',
+                'verbose_name_plural': 'Units',
+                'ordering': ('base_unit', 'factor'),
+            },
+        ),
+        migrations.AddField(
+            model_name='ingredient',
+            name='canonical_unit',
+            field=models.CharField(blank=True, help_text='Единица, в которой суммируется продукт; пусто - по таблице единиц.', max_length=100, verbose_name='canonical unit'),
+        ),
+        migrations.AddField(
+            model_name='ingredient',
+            name='unit_factor',
+            field=models.FloatField(default=1, help_text='Сколько канонических единиц в одной measurement_unit.', verbose_name='unit factor'),
+        ),
+        migrations.RunPython(fill_units, migrations.RunPython.noop),
+    ]
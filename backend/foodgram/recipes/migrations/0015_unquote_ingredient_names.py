@@ -0,0 +1,126 @@
+# Generated by Django 2.2.16 on 2026-10-18 12:00
+
+import csv
+
+from django.db import migrations
+from django.db.models import F
+
+BATCH_SIZE = 500
+
+# Пересчёт поискового индекса изменённых рецептов, как в 0011.
+UPDATE_SEARCH_INDEX = {
+    'postgresql': (
+        """
+        UPDATE recipes_recipe AS recipe SET search_vector =
+            setweight(to_tsvector('russian', recipe.name), 'A')
+            || setweight(to_tsvector('russian', coalesce((
+                SELECT string_agg(ingredient.name, ' ')
+                FROM recipes_ingredientrecipe AS link
+                JOIN recipes_ingredient AS ingredient
+                    ON ingredient.id = link.ingredient_id
+                WHERE link.recipe_id = recipe.id
+            ), '')), 'B')
+            || setweight(to_tsvector('russian', recipe.text), 'C')
+        WHERE recipe.id IN ({})
+        """,
+    ),
+    'sqlite': (
+        'DELETE FROM recipes_recipe_fts WHERE rowid IN ({})',
+        """
+        INSERT INTO recipes_recipe_fts (rowid, name, ingredients, text)
+        SELECT recipe.id, recipe.name, coalesce((
+            SELECT group_concat(ingredient.name, ' ')
+            FROM recipes_ingredientrecipe AS link
+            JOIN recipes_ingredient AS ingredient
+                ON ingredient.id = link.ingredient_id
+            WHERE link.recipe_id = recipe.id
+        ), ''), recipe.text
+        FROM recipes_recipe AS recipe
+        WHERE recipe.id IN ({})
+        """,
+    ),
+}
+
+
+def unquote_name(name):
+    """Название из старого разбора CSV split(','), сохранявшего кавычки:
+    '"молоко 3,2%"' - 'молоко 3,2%', как его читает csv.
+    """
+    return ','.join(next(csv.reader([name]))).strip()
+
+
+def merge_rows(model, owner, legacy, ingredient):
+    """Переносит строки model со старого ингредиента на новый,
+    складывая количества, если у владельца есть оба.
+    """
+    rows = model.objects.filter(ingredient=legacy)
+    both = rows.filter(**{
+        f'{owner}__in': model.objects.filter(
+            ingredient=ingredient
+        ).values(owner)
+    })
+    for row in both:
+        model.objects.filter(
+            ingredient=ingredient, **{owner: getattr(row, f'{owner}_id')}
+        ).update(amount=F('amount') + row.amount)
+    both.delete()
+    rows.update(ingredient=ingredient)
+
+
+def unquote_legacy_ingredients(apps):
+    """Исправляет названия ингредиентов, загруженных старым разбором
+    CSV с кавычками. Если такой ингредиент уже загружен заново
+    без кавычек, ссылки на старый переносятся на него, а старый
+    удаляется; иначе старый переименовывается.
+    Returns:
+        set[int]: Рецепты с изменёнными ингредиентами.
+    """
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    IngredientRecipe = apps.get_model('recipes', 'IngredientRecipe')
+    ShoppingListItem = apps.get_model('recipes', 'ShoppingListItem')
+    recipe_ids = set()
+    legacy_ingredients = Ingredient.objects.filter(
+        name__startswith='"', name__endswith='"'
+    )
+    for legacy in legacy_ingredients:
+        name = unquote_name(legacy.name)
+        recipe_ids.update(IngredientRecipe.objects.filter(
+            ingredient=legacy
+        ).values_list('recipe_id', flat=True))
+        ingredient = Ingredient.objects.filter(
+            name=name, measurement_unit=legacy.measurement_unit
+        ).first()
+        if ingredient is None:
+            legacy.name = name
+            legacy.save(update_fields=['name'])
+            continue
+        merge_rows(IngredientRecipe, 'recipe', legacy, ingredient)
+        merge_rows(ShoppingListItem, 'user', legacy, ingredient)
+        legacy.delete()
+    return recipe_ids
+
+
+def unquote_ingredients(apps, schema_editor):
+    # Базы, заполненные старой 0003, хранят 18 названий с кавычками
+    # CSV, а load_ingredients добавил бы их заново без кавычек.
+    recipe_ids = sorted(unquote_legacy_ingredients(apps))
+    statements = UPDATE_SEARCH_INDEX.get(schema_editor.connection.vendor, ())
+    for start in range(0, len(recipe_ids), BATCH_SIZE):
+        batch = recipe_ids[start:start + BATCH_SIZE]
+        placeholders = ', '.join(['%s'] * len(batch))
+        for statement in statements:
+            schema_editor.execute(statement.format(placeholders), batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0014_units'),
+    ]
+
+    operations = [
+        # Обратно ничего не меняется: названия без кавычек верны
+        # и для прежних миграций, ссылки остаются на существующих
+        # ингредиентах.
+        migrations.RunPython(unquote_ingredients, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,8 @@
 from django.core.validators import MinValueValidator
 from django.db import models
+from django.db.models import Exists, OuterRef, Prefetch
 
-from users.models import User
+from users.models import CounterFieldsMixin, Follow, User
 
 
 class Tag(models.Model):
@@ -17,6 +18,7 @@ class Tag(models.Model):
         verbose_name='color'
     )
     slug = models.SlugField(
+        unique=True,
         verbose_name='slug'
     )
 
@@ -29,6 +31,37 @@ class Tag(models.Model):
         return self.name
 
 
+class Unit(models.Model):
+    """Единица измерения из таблицы пересчёта: сколько базовых единиц
+    (г, мл) в одной такой. display - единица, в которой можно
+    показывать суммы в списке покупок.
+    """
+    name = models.CharField(
+        max_length=100,
+        unique=True,
+        verbose_name='name'
+    )
+    base_unit = models.CharField(
+        max_length=100,
+        verbose_name='base unit'
+    )
+    factor = models.FloatField(
+        verbose_name='factor'
+    )
+    display = models.BooleanField(
+        default=False,
+        verbose_name='display unit'
+    )
+
+    class Meta:
+        ordering = ('base_unit', 'factor')
+        verbose_name = 'Unit'
+        verbose_name_plural = 'Units'
+
+    def __str__(self):
+        return self.name
+
+
 class Ingredient(models.Model):
     name = models.CharField(
         max_length=200,
@@ -39,16 +72,66 @@ class Ingredient(models.Model):
         verbose_name='measurement_unit',
         default='',
     )
+    canonical_unit = models.CharField(
+        max_length=100,
+        blank=True,
+        verbose_name='canonical unit',
+        help_text='Единица, в которой суммируется продукт; пусто - '
+                  'по таблице единиц.',
+    )
+    unit_factor = models.FloatField(
+        default=1,
+        verbose_name='unit factor',
+        help_text='Сколько канонических единиц в одной measurement_unit.',
+    )
 
     class Meta:
         verbose_name = 'Ingredient'
         verbose_name_plural = 'Ingredients'
         ordering = ('id',)
+        constraints = [
+            models.UniqueConstraint(
+                fields=['name', 'measurement_unit'],
+                name='unique_ingredient',
+            )
+        ]
+
 
+class RecipeQuerySet(models.QuerySet):
+    def with_related(self):
+        """Подгружает автора, теги и ингредиенты фиксированным
+        числом запросов, независимо от количества рецептов.
+        """
+        return self.select_related('author').prefetch_related(
+            'tags',
+            Prefetch(
+                'ingredients_list',
+                queryset=IngredientRecipe.objects.select_related(
+                    'ingredient'
+                ).order_by('ingredient_id')
+            ),
+        )
 
-class Recipe(models.Model):
+    def with_user_flags(self, user):
+        """Аннотирует рецепты флагами is_favorited, is_in_shopping_cart
+        и author_is_subscribed для текущего пользователя.
+        """
+        if user.is_anonymous:
+            return self
+        return self.annotate(
+            is_favorited=Exists(Favorite.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+            is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+            author_is_subscribed=Exists(Follow.objects.filter(
+                user=user, author=OuterRef('author'))),
+        )
+
+
+class Recipe(CounterFieldsMixin, models.Model):
     author = models.ForeignKey(
         User,
+        db_index=False,
         on_delete=models.CASCADE,
         related_name='recipe',
         verbose_name='author'
@@ -67,6 +150,11 @@ class Recipe(models.Model):
         verbose_name='image',
         upload_to='recipes/'
     )
+    image_thumbnails_ready = models.BooleanField(
+        default=False,
+        editable=False,
+        verbose_name='image thumbnails ready'
+    )
     text = models.TextField(
         verbose_name='description'
     )
@@ -79,8 +167,41 @@ class Recipe(models.Model):
         validators=[MinValueValidator(1)],
         verbose_name='cooking time'
     )
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='favorites count'
+    )
+    in_carts_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='in shopping carts count'
+    )
+    pub_date = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='publication date'
+    )
+
+    counter_fields = ('favorites_count', 'in_carts_count')
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
+        ordering = ('-pub_date', '-id')
+        indexes = [
+            models.Index(
+                fields=['-favorites_count', '-id'],
+                name='recipe_popularity_idx',
+            ),
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='recipe_pub_date_idx',
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='recipe_author_pub_date_idx',
+            ),
+        ]
         verbose_name = 'Recipe'
         verbose_name_plural = 'Recipes'
 
@@ -91,11 +212,13 @@ class Recipe(models.Model):
 class IngredientRecipe(models.Model):
     ingredient = models.ForeignKey(
         Ingredient,
+        db_index=False,
         on_delete=models.CASCADE,
         verbose_name='ingredient'
     )
     recipe = models.ForeignKey(
         Recipe,
+        db_index=False,
         on_delete=models.CASCADE,
         related_name='ingredients_list',
         verbose_name='recipe'
@@ -111,6 +234,12 @@ class IngredientRecipe(models.Model):
                 name='unique_ingredient_recipe',
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['recipe', 'ingredient'],
+                name='ingredient_recipe_rev_idx',
+            )
+        ]
         verbose_name = 'Ingredient'
         verbose_name_plural = 'Ingredients'
 
@@ -118,12 +247,14 @@ class IngredientRecipe(models.Model):
 class Favorite(models.Model):
     user = models.ForeignKey(
         User,
+        db_index=False,
         related_name='favourite_recipes',
         on_delete=models.CASCADE,
         verbose_name='user'
     )
     recipe = models.ForeignKey(
         Recipe,
+        db_index=False,
         related_name='in_favourites',
         on_delete=models.CASCADE,
         verbose_name='recipe'
@@ -136,6 +267,12 @@ class Favorite(models.Model):
                 name='unique_favorite_recipe',
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['recipe', 'user'],
+                name='favorite_recipe_user_idx',
+            )
+        ]
         verbose_name = 'Favorite'
         verbose_name_plural = 'Favorites'
 
@@ -146,12 +283,14 @@ class Favorite(models.Model):
 class ShoppingCart(models.Model):
     user = models.ForeignKey(
         User,
+        db_index=False,
         related_name='shopping_cart',
         on_delete=models.CASCADE,
         verbose_name='user'
     )
     recipe = models.ForeignKey(
         Recipe,
+        db_index=False,
         related_name='in_shoping_cart',
         on_delete=models.CASCADE,
         verbose_name='recipe'
@@ -171,3 +310,93 @@ class ShoppingCart(models.Model):
                 name='unique_shoping_cart',
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['recipe', 'user'],
+                name='shopping_cart_recipe_user_idx',
+            )
+        ]
+
+
+class ShoppingListItem(models.Model):
+    """Сводный список покупок пользователя: сумма ингредиента по всем
+    рецептам в ShoppingCart. Обновляется по изменениям (recipes.cart),
+    полностью пересчитывается командой rebuild_shopping_lists.
+    """
+    user = models.ForeignKey(
+        User,
+        db_index=False,
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+        verbose_name='user'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        db_index=False,
+        on_delete=models.CASCADE,
+        related_name='shopping_list_items',
+        verbose_name='ingredient'
+    )
+    amount = models.PositiveIntegerField(
+        verbose_name='amount'
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_shopping_list_item',
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['ingredient'],
+                name='shopping_list_ingredient_idx',
+            )
+        ]
+        verbose_name = 'Shopping list item'
+        verbose_name_plural = 'Shopping list items'
+
+
+class FeedItem(models.Model):
+    """Запись материализованной ленты подписок пользователя
+    (см. recipes.feed). Дата публикации копируется из рецепта, чтобы
+    страница ленты читалась по одному индексу.
+    """
+    user = models.ForeignKey(
+        User,
+        db_index=False,
+        on_delete=models.CASCADE,
+        related_name='feed_items',
+        verbose_name='user'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        db_index=False,
+        on_delete=models.CASCADE,
+        related_name='feed_items',
+        verbose_name='recipe'
+    )
+    pub_date = models.DateTimeField(
+        verbose_name='publication date'
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='unique_feed_item',
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-recipe'],
+                name='feed_item_user_pub_date_idx',
+            ),
+            models.Index(
+                fields=['recipe'],
+                name='feed_item_recipe_idx',
+            ),
+        ]
+        verbose_name = 'Feed item'
+        verbose_name_plural = 'Feed items'
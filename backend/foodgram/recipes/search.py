@@ -0,0 +1,134 @@
+import re
+
+from django.db import connection
+from django.db.models import BooleanField, FloatField
+from django.db.models.expressions import RawSQL
+
+TOKEN_RE = re.compile(r'\w+')
+BATCH_SIZE = 500
+
+# Вес полей: название важнее ингредиентов, ингредиенты - описания.
+POSTGRES_UPDATE = '''
+    UPDATE recipes_recipe AS recipe SET search_vector =
+        setweight(to_tsvector('russian', recipe.name), 'A')
+        || setweight(to_tsvector('russian', coalesce((
+            SELECT string_agg(ingredient.name, ' ')
+            FROM recipes_ingredientrecipe AS link
+            JOIN recipes_ingredient AS ingredient
+                ON ingredient.id = link.ingredient_id
+            WHERE link.recipe_id = recipe.id
+        ), '')), 'B')
+        || setweight(to_tsvector('russian', recipe.text), 'C')
+'''
+POSTGRES_QUERY = "to_tsquery('russian', %s)"
+POSTGRES_MATCH = 'recipes_recipe.search_vector @@ ' + POSTGRES_QUERY
+POSTGRES_RANK = (
+    'ts_rank(recipes_recipe.search_vector, ' + POSTGRES_QUERY + ')'
+)
+
+SQLITE_DELETE = 'DELETE FROM recipes_recipe_fts'
+SQLITE_INSERT = '''
+    INSERT INTO recipes_recipe_fts (rowid, name, ingredients, text)
+    SELECT recipe.id, recipe.name, coalesce((
+        SELECT group_concat(ingredient.name, ' ')
+        FROM recipes_ingredientrecipe AS link
+        JOIN recipes_ingredient AS ingredient
+            ON ingredient.id = link.ingredient_id
+        WHERE link.recipe_id = recipe.id
+    ), ''), recipe.text
+    FROM recipes_recipe AS recipe
+'''
+SQLITE_MATCH = (
+    'recipes_recipe.id IN (SELECT rowid FROM recipes_recipe_fts '
+    'WHERE recipes_recipe_fts MATCH %s)'
+)
+SQLITE_RANK = (
+    'SELECT -bm25(recipes_recipe_fts, 10.0, 5.0, 1.0) '
+    'FROM recipes_recipe_fts '
+    'WHERE recipes_recipe_fts MATCH %s AND rowid = recipes_recipe.id'
+)
+
+
+def is_supported(using=connection):
+    return using.vendor in ('postgresql', 'sqlite')
+
+
+def _where_in(column, ids):
+    if ids is None:
+        return ''
+    return ' WHERE {} IN ({})'.format(column, ', '.join(['%s'] * len(ids)))
+
+
+def _execute(cursor, vendor, ids=None):
+    params = list(ids or ())
+    if vendor == 'postgresql':
+        cursor.execute(POSTGRES_UPDATE + _where_in('recipe.id', ids), params)
+        return
+    cursor.execute(SQLITE_DELETE + _where_in('rowid', ids), params)
+    cursor.execute(SQLITE_INSERT + _where_in('recipe.id', ids), params)
+
+
+def update_search_index(recipe_ids, using=connection):
+    """Пересчитывает поисковый индекс рецептов: название, описание
+    и названия ингредиентов.
+    Args:
+        recipe_ids (Iterable[int]): Рецепты, которые изменились.
+    """
+    if not is_supported(using):
+        return
+    recipe_ids = list(recipe_ids)
+    with using.cursor() as cursor:
+        for start in range(0, len(recipe_ids), BATCH_SIZE):
+            _execute(
+                cursor, using.vendor, recipe_ids[start:start + BATCH_SIZE]
+            )
+
+
+def rebuild_search_index(using=connection):
+    """Пересчитывает поисковый индекс всех рецептов."""
+    if not is_supported(using):
+        return
+    with using.cursor() as cursor:
+        _execute(cursor, using.vendor)
+
+
+def build_query(value, vendor):
+    """Строка запроса для to_tsquery или FTS5 MATCH.
+    Слова объединяются по «И», последнее ищется по префиксу,
+    чтобы находить рецепты по недописанному слову.
+    Args:
+        value (str): Текст из параметра search.
+        vendor (str): connection.vendor.
+    Returns:
+        str: Запрос или пустая строка, если в тексте нет слов.
+    """
+    tokens = TOKEN_RE.findall(value.lower())
+    if not tokens:
+        return ''
+    if vendor == 'postgresql':
+        return ' & '.join(tokens) + ':*'
+    return ' '.join(f'"{token}"' for token in tokens) + '*'
+
+
+def search_recipes(queryset, value):
+    """Оставляет рецепты, найденные по тексту, и сортирует по
+    релевантности, при равной - от новых к старым.
+    """
+    if not is_supported():
+        return queryset.filter(name__icontains=value)
+    vendor = connection.vendor
+    query = build_query(value, vendor)
+    if not query:
+        return queryset.none()
+    if vendor == 'postgresql':
+        match_sql, rank_sql = POSTGRES_MATCH, POSTGRES_RANK
+    else:
+        match_sql, rank_sql = SQLITE_MATCH, SQLITE_RANK
+    # Релевантность только в ORDER BY: в COUNT(*) пагинации она не
+    # попадает и не считается для каждой найденной строки лишний раз.
+    rank = RawSQL(rank_sql, (query,), output_field=FloatField())
+    return queryset.annotate(
+        search_match=RawSQL(
+            match_sql, (query,), output_field=BooleanField()
+        )
+    ).filter(search_match=True).order_by(rank.desc(), '-pub_date', '-id')
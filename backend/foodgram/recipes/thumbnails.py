@@ -0,0 +1,124 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from PIL import Image
+
+from recipes.models import Recipe
+
+logger = logging.getLogger(__name__)
+
+EXTENSIONS = {'WEBP': 'webp', 'JPEG': 'jpg'}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_thumbnail_name(image_name, size_name):
+    """Путь уменьшенной копии изображения рецепта в хранилище.
+    Args:
+        image_name (str): Путь оригинала, например recipes/abc.png.
+        size_name (str): Ключ из RECIPE_THUMBNAIL_SIZES.
+    Returns:
+        str: Путь копии, например recipes/thumbnails/small/abc.webp.
+    """
+    stem = os.path.splitext(os.path.basename(image_name))[0]
+    extension = EXTENSIONS[settings.RECIPE_THUMBNAIL_FORMAT]
+    return f'recipes/thumbnails/{size_name}/{stem}.{extension}'
+
+
+def get_thumbnail_urls(recipe):
+    """Ссылки на уменьшенные копии, пока их нет - на оригинал."""
+    return get_thumbnail_urls_by_name(
+        recipe.image.name, recipe.image_thumbnails_ready, recipe.image.storage
+    )
+
+
+def get_thumbnail_urls_by_name(image_name, ready, storage):
+    """get_thumbnail_urls по значениям полей без объекта рецепта.
+    Args:
+        image_name (str): Путь оригинала в хранилище.
+        ready (bool): Значение image_thumbnails_ready.
+        storage (Storage): Хранилище поля image.
+    Returns:
+        dict: Ссылки по ключам RECIPE_THUMBNAIL_SIZES.
+    """
+    if not image_name:
+        return {}
+    if not ready:
+        url = storage.url(image_name)
+        return {
+            size_name: url
+            for size_name in settings.RECIPE_THUMBNAIL_SIZES
+        }
+    return {
+        size_name: storage.url(get_thumbnail_name(image_name, size_name))
+        for size_name in settings.RECIPE_THUMBNAIL_SIZES
+    }
+
+
+def generate_thumbnails(recipe):
+    """Создаёт уменьшенные копии изображения и отмечает их готовность."""
+    storage = recipe.image.storage
+    image_format = settings.RECIPE_THUMBNAIL_FORMAT
+    with recipe.image.open('rb') as image_file:
+        original = Image.open(image_file)
+        original.load()
+    if original.mode not in ('RGB', 'RGBA'):
+        original = original.convert('RGBA')
+    if image_format == 'JPEG' and original.mode == 'RGBA':
+        original = original.convert('RGB')
+    for size_name, size in settings.RECIPE_THUMBNAIL_SIZES.items():
+        thumbnail = original.copy()
+        thumbnail.thumbnail((size, size), Image.LANCZOS)
+        buffer = BytesIO()
+        thumbnail.save(buffer, format=image_format, quality=80)
+        name = get_thumbnail_name(recipe.image.name, size_name)
+        if storage.exists(name):
+            storage.delete(name)
+        storage.save(name, ContentFile(buffer.getvalue()))
+    recipe.image_thumbnails_ready = True
+    recipe.save(update_fields=('image_thumbnails_ready',))
+
+
+def _generate_thumbnails_task(recipe_id, image_name):
+    try:
+        recipe = Recipe.objects.get(pk=recipe_id)
+        # Изображение успели заменить: задача для нового уже поставлена.
+        if recipe.image.name != image_name:
+            return
+        generate_thumbnails(recipe)
+    except Exception:
+        logger.exception('Thumbnail generation failed for recipe %s',
+                         recipe_id)
+    finally:
+        connection.close()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.RECIPE_THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails',
+            )
+    return _executor
+
+
+def schedule_thumbnails(recipe):
+    """Ставит создание уменьшенных копий в фоновый пул после фиксации
+    транзакции, чтобы не задерживать ответ на запрос.
+    Незавершённые задачи доделывает команда generate_thumbnails.
+    """
+    recipe_id, image_name = recipe.pk, recipe.image.name
+    transaction.on_commit(
+        lambda: get_executor().submit(
+            _generate_thumbnails_task, recipe_id, image_name
+        )
+    )
@@ -0,0 +1,107 @@
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.db.models import F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from recipes.models import Unit
+
+# Знаков после запятой в количествах списка покупок.
+AMOUNT_DIGITS = 2
+
+
+def normalize_ingredients(apps, only_missing=True):
+    """Заполняет canonical_unit и unit_factor ингредиентов по таблице
+    единиц одним UPDATE. Единицы не из таблицы (шт., по вкусу)
+    остаются сами по себе с коэффициентом 1.
+    Args:
+        apps: Реестр приложений (django.apps.apps или из миграции).
+        only_missing (bool): Только ингредиенты без canonical_unit,
+            не трогая заданные вручную.
+    Returns:
+        int: Количество обновлённых ингредиентов.
+    """
+    units = apps.get_model('recipes', 'Unit').objects.filter(
+        name=OuterRef('measurement_unit')
+    )
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    queryset = Ingredient.objects.all()
+    if only_missing:
+        queryset = queryset.filter(canonical_unit='')
+    return queryset.update(
+        canonical_unit=Coalesce(
+            Subquery(units.values('base_unit')[:1]), F('measurement_unit')
+        ),
+        unit_factor=Coalesce(
+            Subquery(units.values('factor')[:1]), Value(1.0)
+        ),
+    )
+
+
+class DisplayUnits:
+    """Единицы для показа сумм по базовой единице, в памяти процесса.
+    Как IngredientIndex, сбрасывается сигналами и по истечении
+    UNITS_CACHE_TTL секунд.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = None
+
+    def invalidate(self):
+        self._data = None
+
+    def _load(self):
+        units = {}
+        for name, base_unit, factor in Unit.objects.filter(
+            display=True
+        ).order_by('factor').values_list('name', 'base_unit', 'factor'):
+            units.setdefault(base_unit, []).append((factor, name))
+        return time.monotonic(), units
+
+    def _get_data(self):
+        data = self._data
+        if (data is None
+                or time.monotonic() - data[0] > settings.UNITS_CACHE_TTL):
+            with self._lock:
+                data = self._data
+                if (data is None or time.monotonic() - data[0]
+                        > settings.UNITS_CACHE_TTL):
+                    data = self._data = self._load()
+        return data[1]
+
+    def convert(self, total, base_unit):
+        """Наибольшая единица показа, в которой total не меньше 1
+        и записывается без потери точности, с AMOUNT_DIGITS знаками
+        после запятой: 1500 г - 1.5 кг, но 1234 г остаются в граммах.
+        Args:
+            total (float): Количество в базовых единицах.
+            base_unit (str): Базовая единица (г, мл).
+        Returns:
+            tuple: Количество и единица.
+        """
+        unit, unit_factor = base_unit, 1
+        for factor, name in self._get_data().get(base_unit, ()):
+            if total >= factor and math.isclose(
+                round(total / factor, AMOUNT_DIGITS) * factor, total
+            ):
+                unit, unit_factor = name, factor
+        return total / unit_factor, unit
+
+    def is_display(self, unit):
+        return any(
+            name == unit
+            for units in self._get_data().values()
+            for _, name in units
+        )
+
+
+display_units = DisplayUnits()
+
+
+def format_amount(amount):
+    """Количество без лишних нулей: 2 вместо 2.0, 1.25 вместо 1.2500."""
+    amount = round(amount, AMOUNT_DIGITS)
+    return int(amount) if amount == int(amount) else amount
@@ -0,0 +1,110 @@
+import pytest
+from django.core.cache import cache
+from rest_framework.test import APIClient
+
+from api.authentication import token_cache
+from api.autocomplete import ingredient_index
+from api.coverage import recipe_coverage_index
+from recipes.models import Ingredient, IngredientRecipe, Recipe, Tag
+from recipes.units import display_units
+from users.models import User
+
+
+def reset_caches():
+    cache.clear()
+    token_cache.clear()
+    for index in (ingredient_index, recipe_coverage_index, display_units):
+        index.invalidate()
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    # Версии, страницы списка, токены и индексы живут в памяти
+    # процесса и пережили бы откат транзакции теста.
+    reset_caches()
+    yield
+    reset_caches()
+
+
+@pytest.fixture
+def run_on_commit(monkeypatch):
+    """Выполняет колбэки transaction.on_commit сразу: транзакция теста
+    откатывается и до фиксации не доходит.
+    """
+    monkeypatch.setattr(
+        'django.db.transaction.on_commit', lambda func, using=None: func()
+    )
+
+
+def create_user(username, **kwargs):
+    return User.objects.create_user(
+        username=username,
+        email=f'{username}@example.com',
+        first_name=username,
+        last_name=username,
+        password='Pa55word-long',
+        **kwargs
+    )
+
+
+@pytest.fixture
+def user(db):
+    return create_user('user')
+
+
+@pytest.fixture
+def author(db):
+    return create_user('author')
+
+
+@pytest.fixture
+def client():
+    return APIClient()
+
+
+@pytest.fixture
+def user_client(user):
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+@pytest.fixture
+def tags(db):
+    # Завтрак, обед и ужин создаёт миграция 0004_add_tag.
+    return list(Tag.objects.order_by('id'))
+
+
+def create_recipes(author, tags, count, ingredients_per_recipe=3):
+    """Рецепты автора с тегами и ингредиентами из загруженного
+    миграцией справочника.
+    """
+    ingredients = list(
+        Ingredient.objects.order_by('id')[:ingredients_per_recipe * 4]
+    )
+    recipes = []
+    for number in range(count):
+        recipe = Recipe(
+            author=author,
+            name=f'Рецепт {number}',
+            text=f'Описание рецепта {number}',
+            cooking_time=number % 60 + 1,
+        )
+        recipe.image.name = f'recipes/{number}.png'
+        recipe.save()
+        recipe.tags.set(tags[number % len(tags):][:2] or tags[:1])
+        IngredientRecipe.objects.bulk_create([
+            IngredientRecipe(
+                recipe=recipe,
+                ingredient=ingredients[(number + shift) % len(ingredients)],
+                amount=10 * (shift + 1),
+            )
+            for shift in range(ingredients_per_recipe)
+        ])
+        recipes.append(recipe)
+    return recipes
+
+
+@pytest.fixture
+def recipes(author, tags):
+    return create_recipes(author, tags, 10)
@@ -0,0 +1,96 @@
+import pytest
+from django.contrib.auth.hashers import make_password
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+
+from api.authentication import bump_auth_version
+from users.models import User
+
+ME_URL = '/api/users/me/'
+
+
+@pytest.fixture
+def token_client(user, client):
+    token = Token.objects.create(user=user)
+    client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return client
+
+
+def count_queries(request, status=200):
+    with CaptureQueriesContext(connection) as queries:
+        response = request()
+    assert response.status_code == status
+    return len(queries)
+
+
+def test_safe_requests_use_cached_user(token_client):
+    first = count_queries(lambda: token_client.get(ME_URL))
+    assert count_queries(lambda: token_client.get(ME_URL)) == first - 1
+
+
+def test_unsafe_requests_use_cached_user(recipes, token_client):
+    url = f'/api/recipes/{recipes[0].pk}/favorite/'
+
+    first = count_queries(lambda: token_client.post(url), 201)
+    assert token_client.delete(url).status_code == 204
+
+    assert count_queries(lambda: token_client.post(url), 201) == first - 1
+
+
+def test_set_password_does_not_save_stale_user(user, token_client):
+    token_client.get(ME_URL)
+    User.objects.filter(pk=user.pk).update(first_name='Другое')
+
+    response = token_client.post('/api/users/set_password/', {
+        'current_password': 'Pa55word-long',
+        'new_password': 'New-pa55word',
+    })
+
+    assert response.status_code == 204
+    user.refresh_from_db()
+    assert user.first_name == 'Другое'
+    assert user.check_password('New-pa55word')
+
+
+def test_unsafe_request_does_not_save_stale_user(user, token_client):
+    token_client.get(ME_URL)
+    # Пароль сменён в другом воркере: кэш этого процесса не сброшен.
+    User.objects.filter(pk=user.pk).update(
+        password=make_password('New-pa55word')
+    )
+
+    response = token_client.patch(ME_URL, {'first_name': 'Новое'})
+
+    assert response.status_code == 200
+    user.refresh_from_db()
+    assert user.first_name == 'Новое'
+    assert user.check_password('New-pa55word')
+
+
+def test_unsafe_request_checks_is_active(user, token_client):
+    token_client.get(ME_URL)
+    User.objects.filter(pk=user.pk).update(is_active=False)
+
+    response = token_client.patch(ME_URL, {'first_name': 'Новое'})
+
+    assert response.status_code == 401
+
+
+def test_token_deleted_in_other_worker(user, token_client):
+    token_client.get(ME_URL)
+    # Другой воркер удалил токен и сменил версию в общем кэше,
+    # записи token_cache этого процесса не тронуты.
+    Token.objects.filter(user=user)._raw_delete(connection.alias)
+    bump_auth_version(user.pk)
+
+    assert token_client.get(ME_URL).status_code == 401
+
+
+def test_logout_invalidates_cached_token(token_client, run_on_commit):
+    token_client.get(ME_URL)
+
+    response = token_client.post('/api/auth/token/logout/')
+
+    assert response.status_code == 204
+    assert token_client.get(ME_URL).status_code == 401
@@ -0,0 +1,42 @@
+import pytest
+
+from recipes.models import Ingredient
+
+INGREDIENTS_URL = '/api/ingredients/'
+NAMES = ('соус qwx', 'Qwxa', 'арбуз qwx', 'qwxb', 'qw x')
+
+
+@pytest.fixture
+def ingredients(db):
+    Ingredient.objects.bulk_create(
+        Ingredient(name=name, measurement_unit='г') for name in NAMES
+    )
+
+
+def autocomplete(client, name):
+    response = client.get(INGREDIENTS_URL, {'name': name})
+    assert response.status_code == 200
+    return [ingredient['name'] for ingredient in response.data]
+
+
+@pytest.mark.parametrize('index_enabled', (True, False))
+@pytest.mark.parametrize('limit, expected', (
+    (20, ['Qwxa', 'qwxb', 'арбуз qwx', 'соус qwx']),
+    (3, ['Qwxa', 'qwxb', 'арбуз qwx']),
+    (1, ['Qwxa']),
+))
+def test_prefix_matches_first(index_enabled, limit, expected, ingredients,
+                              client, settings):
+    # Индекс в памяти и поиск в БД отвечают одинаково.
+    settings.INGREDIENT_INDEX_ENABLED = index_enabled
+    settings.INGREDIENT_AUTOCOMPLETE_LIMIT = limit
+
+    assert autocomplete(client, 'QWX') == expected
+
+
+def test_index_answers_without_queries(ingredients, client,
+                                       django_assert_num_queries):
+    autocomplete(client, 'qwx')
+
+    with django_assert_num_queries(0):
+        assert autocomplete(client, 'соус q') == ['соус qwx']
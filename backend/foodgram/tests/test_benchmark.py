@@ -0,0 +1,34 @@
+import json
+
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from api.management.commands.benchmark import Command
+
+
+@pytest.fixture
+def benchmark_data(db):
+    call_command('generate_data', users=20, recipes=100, stdout=None)
+
+
+def test_endpoints_fit_stored_baseline(benchmark_data):
+    # Завершается CommandError, если эндпоинт делает больше SQL-запросов,
+    # чем в benchmarks/baseline.json.
+    call_command('benchmark', iterations=2)
+
+
+def test_more_queries_than_baseline_fail(benchmark_data, tmp_path):
+    baseline = tmp_path / 'baseline.json'
+    baseline.write_text(json.dumps(
+        {'recipes.retrieve': {'p50_ms': 1000, 'p95_ms': 1000, 'queries': 1}}
+    ))
+    with pytest.raises(CommandError, match='recipes.retrieve'):
+        call_command('benchmark', iterations=1, baseline=str(baseline))
+
+
+def test_slowdown_is_reported_only_when_limited():
+    results = {'recipes.list': {'p50_ms': 30, 'queries': 4}}
+    baseline = {'recipes.list': {'p50_ms': 10, 'queries': 4}}
+    assert Command.find_regressions(results, baseline) == []
+    assert Command.find_regressions(results, baseline, max_slowdown=50)
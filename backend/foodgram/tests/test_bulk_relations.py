@@ -0,0 +1,134 @@
+import pytest
+from django.conf import settings
+
+from recipes.models import Favorite, Recipe, ShoppingCart, ShoppingListItem
+from tests.conftest import create_user
+from users.models import Follow, User
+
+FAVORITE_URL = '/api/recipes/favorite/'
+CART_URL = '/api/recipes/shopping_cart/'
+SUBSCRIBE_URL = '/api/users/subscribe/'
+
+
+def statuses(response):
+    assert response.status_code == 200
+    return {
+        result['id']: result['status'] for result in response.data['results']
+    }
+
+
+def unknown_pk(model):
+    return model.objects.order_by('-id').first().pk + 1
+
+
+@pytest.mark.parametrize('url, model, counter_field', [
+    (FAVORITE_URL, Favorite, 'favorites_count'),
+    (CART_URL, ShoppingCart, 'in_carts_count'),
+])
+def test_bulk_recipe_relations(url, model, counter_field, user, recipes,
+                               user_client):
+    first, second, never = recipes[:3]
+    missing = unknown_pk(Recipe)
+
+    response = user_client.post(
+        url, {'ids': [first.pk, second.pk, missing, first.pk]}, format='json'
+    )
+    assert statuses(response) == {
+        first.pk: 'created', second.pk: 'created', missing: 'not_found',
+    }
+    assert list(response.data['results'][0]) == ['id', 'status']
+    response = user_client.post(url, {'ids': [first.pk]}, format='json')
+    assert statuses(response) == {first.pk: 'exists'}
+    assert set(model.objects.filter(user=user).values_list(
+        'recipe', flat=True
+    )) == {first.pk, second.pk}
+
+    response = user_client.delete(
+        url, {'ids': [first.pk, never.pk, missing]}, format='json'
+    )
+    assert statuses(response) == {
+        first.pk: 'deleted', never.pk: 'missing', missing: 'not_found',
+    }
+    assert list(model.objects.filter(user=user).values_list(
+        'recipe', flat=True
+    )) == [second.pk]
+    assert list(Recipe.objects.filter(
+        pk__in=[first.pk, second.pk]
+    ).order_by('id').values_list(counter_field, flat=True)) == [0, 1]
+
+
+def test_bulk_cart_updates_shopping_list(user, recipes, user_client):
+    user_client.post(
+        CART_URL, {'ids': [recipes[0].pk, recipes[1].pk]}, format='json'
+    )
+    totals = dict(ShoppingListItem.objects.filter(
+        user=user
+    ).values_list('ingredient', 'amount'))
+    expected = {}
+    for recipe in recipes[:2]:
+        for item in recipe.ingredients_list.all():
+            expected[item.ingredient_id] = (
+                expected.get(item.ingredient_id, 0) + item.amount
+            )
+    assert totals == expected
+
+    user_client.delete(
+        CART_URL, {'ids': [recipes[0].pk, recipes[1].pk]}, format='json'
+    )
+    assert not ShoppingListItem.objects.filter(
+        user=user, amount__gt=0
+    ).exists()
+
+
+def test_bulk_subscribe(user, author, user_client):
+    other = create_user('other')
+    missing = unknown_pk(User)
+
+    response = user_client.post(
+        SUBSCRIBE_URL,
+        {'ids': [author.pk, user.pk, other.pk, missing]},
+        format='json'
+    )
+    assert statuses(response) == {
+        author.pk: 'created', user.pk: 'rejected', other.pk: 'created',
+        missing: 'not_found',
+    }
+    assert set(Follow.objects.filter(user=user).values_list(
+        'author', flat=True
+    )) == {author.pk, other.pk}
+    user.refresh_from_db()
+    assert user.followers_count == 0
+
+    response = user_client.delete(
+        SUBSCRIBE_URL, {'ids': [author.pk, user.pk]}, format='json'
+    )
+    assert statuses(response) == {author.pk: 'deleted', user.pk: 'missing'}
+    author.refresh_from_db()
+    assert author.followers_count == 0
+
+
+def test_subscribe_to_self_is_rejected(user, user_client):
+    response = user_client.post(f'/api/users/{user.pk}/subscribe/')
+
+    assert response.status_code == 400
+    assert not Follow.objects.exists()
+
+
+@pytest.mark.parametrize('url', (FAVORITE_URL, CART_URL, SUBSCRIBE_URL))
+@pytest.mark.parametrize('data', [
+    {},
+    {'ids': []},
+    {'ids': ['abc']},
+    {'ids': [0]},
+    {'ids': list(range(1, settings.BULK_RELATIONS_MAX_IDS + 2))},
+])
+def test_bulk_ids_are_validated(url, data, user_client):
+    response = user_client.post(url, data, format='json')
+
+    assert response.status_code == 400
+    assert 'ids' in response.data
+
+
+@pytest.mark.parametrize('url', (FAVORITE_URL, CART_URL, SUBSCRIBE_URL))
+def test_bulk_requires_authentication(url, client):
+    assert client.post(url, {'ids': [1]}, format='json').status_code == 401
@@ -0,0 +1,74 @@
+import multiprocessing
+import os
+import runpy
+from types import SimpleNamespace
+
+import pytest
+from django.conf import settings
+
+from tests.conftest import create_recipes
+
+
+def get_detail(client, recipe, etag=None):
+    headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+    return client.get(f'/api/recipes/{recipe.pk}/', **headers)
+
+
+def test_login_keeps_recipe_etag(author, tags, client, run_on_commit):
+    recipe = create_recipes(author, tags, 1)[0]
+    etag = get_detail(client, recipe)['ETag']
+    response = client.post(
+        '/api/auth/token/login/',
+        {'email': author.email, 'password': 'Pa55word-long'}
+    )
+    assert response.status_code == 200
+    assert get_detail(client, recipe, etag).status_code == 304
+
+
+def test_profile_change_changes_recipe_etag(author, tags, client,
+                                            run_on_commit):
+    recipe = create_recipes(author, tags, 1)[0]
+    etag = get_detail(client, recipe)['ETag']
+    author.first_name = 'Новое имя'
+    author.save()
+    response = get_detail(client, recipe, etag)
+    assert response.status_code == 200
+    assert response.data['author']['first_name'] == 'Новое имя'
+
+
+def load_gunicorn_config():
+    return runpy.run_path(os.path.join(settings.BASE_DIR, 'gunicorn.conf.py'))
+
+
+@pytest.fixture
+def on_starting():
+    return load_gunicorn_config()['on_starting']
+
+
+def test_gunicorn_rejects_local_cache_for_several_workers(on_starting):
+    with pytest.raises(RuntimeError):
+        on_starting(SimpleNamespace(cfg=SimpleNamespace(workers=2)))
+
+
+def test_gunicorn_allows_local_cache_for_one_worker(on_starting):
+    on_starting(SimpleNamespace(cfg=SimpleNamespace(workers=1)))
+
+
+def test_gunicorn_starts_one_worker_with_local_cache(monkeypatch):
+    monkeypatch.delenv('GUNICORN_WORKERS', raising=False)
+    config = load_gunicorn_config()
+
+    assert config['workers'] == 1
+    config['on_starting'](SimpleNamespace(cfg=SimpleNamespace(workers=1)))
+
+
+def test_gunicorn_workers_default_to_cpu_count_with_shared_cache(
+    monkeypatch, settings, tmp_path
+):
+    monkeypatch.delenv('GUNICORN_WORKERS', raising=False)
+    settings.CACHES = {'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': str(tmp_path),
+    }}
+
+    assert load_gunicorn_config()['workers'] == multiprocessing.cpu_count()
@@ -0,0 +1,92 @@
+from io import StringIO
+
+import pytest
+from django.apps import apps
+from django.core.management import call_command
+from rest_framework.test import APIClient
+
+from recipes.counters import recount
+from recipes.models import Favorite, Recipe, ShoppingCart
+from tests.conftest import create_recipes, create_user
+from users.models import Follow, User
+
+
+def counters(recipe):
+    recipe.refresh_from_db()
+    return recipe.favorites_count, recipe.in_carts_count
+
+
+def test_recipes_count_follows_orm(author, tags):
+    recipes = create_recipes(author, tags, 4)
+    author.refresh_from_db()
+    assert author.recipes_count == 4
+
+    recipes[0].delete()
+    author.refresh_from_db()
+    assert author.recipes_count == 3
+
+    Recipe.objects.filter(author=author).delete()
+    author.refresh_from_db()
+    assert author.recipes_count == 0
+
+
+def test_recipe_deleted_through_api_is_counted_once(author, recipes):
+    client = APIClient()
+    client.force_authenticate(author)
+
+    assert client.delete(f'/api/recipes/{recipes[0].pk}/').status_code == 204
+    author.refresh_from_db()
+    assert author.recipes_count == len(recipes) - 1
+
+
+def test_deleting_user_uncounts_cascaded_relations(author, user, recipes):
+    other = create_user('other')
+    for follower in (user, other):
+        Follow.objects.create(user=follower, author=author)
+        Favorite.objects.create(user=follower, recipe=recipes[0])
+        ShoppingCart.objects.create(user=follower, recipe=recipes[0])
+    Favorite.objects.create(user=user, recipe=recipes[1])
+    recount(apps)
+
+    user.delete()
+
+    author.refresh_from_db()
+    assert author.followers_count == 1
+    assert counters(recipes[0]) == (1, 1)
+    assert counters(recipes[1]) == (0, 0)
+
+
+def test_recount_fixes_drift(author, user, recipes):
+    Follow.objects.create(user=user, author=author)
+    Favorite.objects.create(user=user, recipe=recipes[0])
+    ShoppingCart.objects.create(user=user, recipe=recipes[1])
+    Recipe.objects.update(favorites_count=5, in_carts_count=5)
+    User.objects.update(recipes_count=0, followers_count=7)
+
+    call_command('recount', stdout=StringIO())
+
+    author.refresh_from_db()
+    user.refresh_from_db()
+    assert (author.recipes_count, author.followers_count) == (
+        len(recipes), 1
+    )
+    assert (user.recipes_count, user.followers_count) == (0, 0)
+    assert counters(recipes[0]) == (1, 0)
+    assert counters(recipes[1]) == (0, 1)
+    assert counters(recipes[2]) == (0, 0)
+
+
+@pytest.mark.parametrize('delete', ('instance', 'queryset'))
+def test_deleted_recipe_keeps_other_counters(delete, author, user, recipes):
+    Favorite.objects.create(user=user, recipe=recipes[0])
+    Favorite.objects.create(user=user, recipe=recipes[1])
+    recount(apps)
+
+    if delete == 'instance':
+        recipes[0].delete()
+    else:
+        Recipe.objects.filter(pk=recipes[0].pk).delete()
+
+    assert counters(recipes[1]) == (1, 0)
+    author.refresh_from_db()
+    assert author.recipes_count == len(recipes) - 1
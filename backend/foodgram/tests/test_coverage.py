@@ -0,0 +1,118 @@
+import pytest
+from rest_framework.test import APIClient
+
+from api import coverage
+from api.coverage import recipe_coverage_index
+from recipes.models import Ingredient, IngredientRecipe
+from tests.conftest import create_recipes
+
+COVERAGE_URL = '/api/recipes/by_ingredients/'
+
+# Составы рецептов по номерам ингредиентов; у пользователя есть 0, 1 и 2.
+COMPOSITIONS = ((0, 1), (0, 1, 2, 3), (0, 3), (0, 1, 3, 4), (3, 4))
+PANTRY = (0, 1, 2)
+
+
+@pytest.fixture
+def ingredient_ids(db):
+    return list(
+        Ingredient.objects.order_by('id').values_list('id', flat=True)[:5]
+    )
+
+
+@pytest.fixture
+def recipes(author, tags, ingredient_ids):
+    recipes = create_recipes(author, tags, len(COMPOSITIONS), 0)
+    IngredientRecipe.objects.bulk_create([
+        IngredientRecipe(
+            recipe=recipe, ingredient_id=ingredient_ids[number], amount=10
+        )
+        for recipe, composition in zip(recipes, COMPOSITIONS)
+        for number in composition
+    ])
+    return recipes
+
+
+def search(client, ingredient_ids, **params):
+    response = client.get(COVERAGE_URL, {
+        'ingredients': [ingredient_ids[number] for number in PANTRY],
+        **params,
+    })
+    assert response.status_code == 200
+    return [
+        (recipe['id'], recipe['coverage'], recipe['missing_count'])
+        for recipe in response.data['results']
+    ]
+
+
+def test_ranked_by_coverage_then_missing_count(recipes, ingredient_ids,
+                                               client):
+    assert search(client, ingredient_ids) == [
+        (recipes[0].pk, 1, 0),
+        (recipes[1].pk, 0.75, 1),
+        (recipes[2].pk, 0.5, 1),
+        (recipes[3].pk, 0.5, 2),
+    ]
+    assert [
+        pk for pk, _, _ in search(client, ingredient_ids, min_coverage=0.75)
+    ] == [recipes[0].pk, recipes[1].pk]
+
+
+@pytest.mark.parametrize('params, field', (
+    ({}, 'ingredients'),
+    ({'ingredients': 'соль'}, 'ingredients'),
+    ({'ingredients': 1, 'min_coverage': 'много'}, 'min_coverage'),
+    ({'ingredients': 1, 'min_coverage': -0.1}, 'min_coverage'),
+    ({'ingredients': 1, 'min_coverage': 1.5}, 'min_coverage'),
+))
+def test_invalid_params(params, field, client, db):
+    response = client.get(COVERAGE_URL, params)
+
+    assert response.status_code == 400
+    assert field in response.data
+
+
+def test_recipe_edit_updates_index(recipes, ingredient_ids, author, client,
+                                   run_on_commit):
+    search(client, ingredient_ids)
+    author_client = APIClient()
+    author_client.force_authenticate(author)
+
+    response = author_client.patch(f'/api/recipes/{recipes[4].pk}/', {
+        'ingredients': [
+            {'id': ingredient_ids[number], 'amount': 10} for number in PANTRY
+        ]
+    }, format='json')
+
+    assert response.status_code == 200
+    assert search(client, ingredient_ids)[:2] == [
+        (recipes[4].pk, 1, 0),
+        (recipes[0].pk, 1, 0),
+    ]
+
+
+def test_expired_index_is_refreshed_in_background(recipes, ingredient_ids,
+                                                  client, settings,
+                                                  monkeypatch,
+                                                  django_assert_num_queries):
+    started = []
+
+    class Thread:
+        def __init__(self, target, args, **kwargs):
+            self.target, self.args = target, args
+
+        def start(self):
+            started.append(self.args)
+
+    monkeypatch.setattr(coverage.threading, 'Thread', Thread)
+    expected = search(client, ingredient_ids)
+    settings.RECIPE_COVERAGE_INDEX_TTL = -1
+
+    # Запрос не ждёт загрузки: ответ по прежнему индексу.
+    with django_assert_num_queries(0):
+        assert recipe_coverage_index.search(
+            [ingredient_ids[number] for number in PANTRY], 0.5
+        ) == expected
+    recipe_coverage_index.search([ingredient_ids[0]], 0.5)
+
+    assert len(started) == 1
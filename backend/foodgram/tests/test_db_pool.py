@@ -0,0 +1,62 @@
+import threading
+
+import pytest
+from psycopg2 import extensions
+from psycopg2.pool import PoolError
+
+from foodgram.db.backends.postgresql.base import BlockingConnectionPool
+
+
+class FakeConnection:
+    """Соединение без сервера: пул проверяет только closed
+    и состояние транзакции.
+    """
+
+    class info:
+        transaction_status = extensions.TRANSACTION_STATUS_IDLE
+
+    closed = False
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture(autouse=True)
+def fake_connect(monkeypatch):
+    monkeypatch.setattr(
+        'psycopg2.connect', lambda *args, **kwargs: FakeConnection()
+    )
+
+
+def test_returned_connection_is_reused():
+    pool = BlockingConnectionPool(2, timeout=0.1)
+    connection = pool.getconn()
+    pool.putconn(connection)
+
+    assert pool.getconn() is connection
+    assert not connection.closed
+
+
+def test_exhausted_pool_times_out():
+    pool = BlockingConnectionPool(1, timeout=0.1)
+    pool.getconn()
+
+    with pytest.raises(PoolError):
+        pool.getconn()
+
+
+def test_exhausted_pool_waits_for_connection():
+    pool = BlockingConnectionPool(1, timeout=5)
+    connection = pool.getconn()
+    threading.Timer(0.1, pool.putconn, (connection,)).start()
+
+    assert pool.getconn() is connection
+
+
+def test_closed_connection_frees_slot():
+    pool = BlockingConnectionPool(1, timeout=0.1)
+    connection = pool.getconn()
+    pool.putconn(connection, close=True)
+
+    assert connection.closed
+    assert pool.getconn() is not connection
@@ -0,0 +1,154 @@
+from base64 import b64encode
+
+import pytest
+from django.utils import timezone
+
+from recipes.feed import rebuild_feeds
+from recipes.models import FeedItem, Recipe
+from tests.conftest import create_recipes, create_user
+from users.models import Follow
+
+FEED_URL = '/api/recipes/feed/'
+
+
+def feed_ids(client, params=None):
+    response = client.get(FEED_URL, params)
+    assert response.status_code == 200
+    return [recipe['id'] for recipe in response.data['results']]
+
+
+def walk_feed(client, url, params=None):
+    """id рецептов со страницы url и всех следующих по ссылкам next."""
+    ids = []
+    while url:
+        response = client.get(url, params)
+        assert response.status_code == 200
+        ids.extend(recipe['id'] for recipe in response.data['results'])
+        url, params = response.data['next'], None
+    return ids
+
+
+@pytest.fixture
+def followed(user, tags):
+    """Два автора в подписках пользователя и один посторонний.
+    У части рецептов одна дата публикации: порядок внутри неё
+    задаёт id.
+    """
+    authors = [create_user(f'author{number}') for number in range(3)]
+    for author in authors:
+        create_recipes(author, tags, 4, 1)
+    Recipe.objects.filter(
+        author=authors[0]
+    ).update(pub_date=timezone.now())
+    Follow.objects.bulk_create([
+        Follow(user=user, author=author) for author in authors[:2]
+    ])
+    return authors
+
+
+@pytest.fixture(params=('live', 'materialized'))
+def mode(request, user, followed):
+    if request.param == 'materialized':
+        rebuild_feeds(min_follows=1)
+        user.refresh_from_db()
+        assert user.feed_materialized
+    return request.param
+
+
+def expected_feed(authors):
+    return list(Recipe.objects.filter(
+        author__in=authors
+    ).order_by('-pub_date', '-id').values_list('id', flat=True))
+
+
+def test_feed_follows_subscriptions(mode, followed, user_client):
+    ids = walk_feed(user_client, FEED_URL, {'limit': 3})
+
+    assert ids == expected_feed(followed[:2])
+
+
+def test_feed_pages_are_stable_when_recipes_are_added(
+    mode, followed, tags, user_client, run_on_commit
+):
+    before = expected_feed(followed[:2])
+    first = user_client.get(FEED_URL, {'limit': 3})
+
+    new = create_recipes(followed[1], tags, 2, 1)
+    rest = walk_feed(user_client, first.data['next'])
+
+    assert [recipe['id'] for recipe in first.data['results']] + rest == before
+    assert feed_ids(user_client, {'limit': 2}) == [
+        recipe.pk for recipe in reversed(new)
+    ]
+
+
+def test_rebuild_feeds_materializes_followed_recipes(user, followed,
+                                                     user_client):
+    live = feed_ids(user_client, {'limit': 100})
+
+    assert rebuild_feeds(min_follows=1) == {'users': 1, 'items': 8}
+    user.refresh_from_db()
+
+    assert user.feed_materialized
+    assert set(FeedItem.objects.values_list('user', 'recipe')) == {
+        (user.pk, pk) for pk in live
+    }
+    assert feed_ids(user_client, {'limit': 100}) == live
+    # Материализованная лента читается из FeedItem.
+    FeedItem.objects.filter(recipe_id=live[0]).delete()
+    assert feed_ids(user_client, {'limit': 100}) == live[1:]
+
+
+def test_rebuild_feeds_below_threshold_stays_live(user, followed,
+                                                  user_client):
+    assert rebuild_feeds(min_follows=3) == {'users': 0, 'items': 0}
+    user.refresh_from_db()
+
+    assert not user.feed_materialized
+    assert feed_ids(user_client, {'limit': 100}) == expected_feed(
+        followed[:2]
+    )
+
+
+@pytest.mark.parametrize('bulk', (False, True))
+def test_subscription_changes_update_feed_items(bulk, user, followed,
+                                                user_client):
+    rebuild_feeds(min_follows=1)
+    user.refresh_from_db()
+    stranger = followed[2]
+
+    def subscribe(method):
+        if bulk:
+            return getattr(user_client, method)(
+                '/api/users/subscribe/', {'ids': [stranger.pk]},
+                format='json'
+            )
+        return getattr(user_client, method)(
+            f'/api/users/{stranger.pk}/subscribe/'
+        )
+
+    assert subscribe('post').status_code in (200, 201)
+    assert FeedItem.objects.filter(
+        user=user, recipe__author=stranger
+    ).count() == 4
+    assert feed_ids(user_client, {'limit': 100}) == expected_feed(followed)
+
+    assert subscribe('delete').status_code in (200, 204)
+    assert not FeedItem.objects.filter(
+        user=user, recipe__author=stranger
+    ).exists()
+    assert feed_ids(user_client, {'limit': 100}) == expected_feed(
+        followed[:2]
+    )
+
+
+@pytest.mark.parametrize('cursor', (
+    'not-base64!',
+    b64encode(b'yesterday|1', altchars=b'-_').decode(),
+    b64encode(b'2026-01-01T00:00:00|abc', altchars=b'-_').decode(),
+    b64encode(b'2026-01-01T00:00:00', altchars=b'-_').decode(),
+))
+def test_invalid_cursor_returns_404(cursor, followed, user_client):
+    response = user_client.get(FEED_URL, {'cursor': cursor})
+
+    assert response.status_code == 404
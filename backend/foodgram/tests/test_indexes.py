@@ -0,0 +1,98 @@
+import re
+
+import pytest
+from django.db import connection
+
+from recipes.feed import feed_queryset
+from recipes.models import (Favorite, FeedItem, Ingredient, IngredientRecipe,
+                            Recipe, ShoppingCart, ShoppingListItem)
+from users.models import Follow
+
+pytestmark = pytest.mark.django_db
+
+postgres_only = pytest.mark.skipif(
+    connection.vendor != 'postgresql',
+    reason='индекс создаётся только в PostgreSQL',
+)
+
+
+@pytest.fixture(autouse=True)
+def prefer_indexes():
+    # На тестовых таблицах в десяток строк PostgreSQL выбирает
+    # последовательное чтение, поэтому проверяется, что индекс
+    # применим, а не что он дешевле.
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+
+
+def index_querysets(user, recipe):
+    user.feed_materialized = True
+    return {
+        'recipe_pub_date_idx': Recipe.objects.all()[:6],
+        'recipe_popularity_idx': Recipe.objects.order_by(
+            '-favorites_count', '-id'
+        )[:6],
+        'recipe_author_pub_date_idx': Recipe.objects.filter(
+            author=recipe.author_id
+        )[:6],
+        'ingredient_recipe_rev_idx': IngredientRecipe.objects.filter(
+            recipe=recipe
+        ),
+        'favorite_recipe_user_idx': Favorite.objects.filter(recipe=recipe),
+        'shopping_cart_recipe_user_idx': ShoppingCart.objects.filter(
+            recipe=recipe
+        ),
+        'follow_author_user_idx': Follow.objects.filter(author=user),
+        'feed_item_user_pub_date_idx': feed_queryset(user).order_by(
+            '-feed_date', '-id'
+        )[:6],
+        'feed_item_recipe_idx': FeedItem.objects.filter(recipe=recipe),
+        'shopping_list_ingredient_idx': ShoppingListItem.objects.filter(
+            ingredient=recipe.ingredients.first()
+        ),
+    }
+
+
+@pytest.mark.parametrize('index', [
+    'recipe_pub_date_idx',
+    'recipe_popularity_idx',
+    'recipe_author_pub_date_idx',
+    'ingredient_recipe_rev_idx',
+    'favorite_recipe_user_idx',
+    'shopping_cart_recipe_user_idx',
+    'follow_author_user_idx',
+    'feed_item_user_pub_date_idx',
+    'feed_item_recipe_idx',
+    'shopping_list_ingredient_idx',
+])
+def test_query_uses_index(index, user, recipes):
+    plan = index_querysets(user, recipes[0])[index].explain()
+
+    assert index in plan
+
+
+@pytest.mark.parametrize('index', [
+    'recipe_pub_date_idx',
+    'recipe_popularity_idx',
+    'recipe_author_pub_date_idx',
+    'feed_item_user_pub_date_idx',
+])
+def test_ordered_page_is_not_sorted(index, user, recipes):
+    plan = index_querysets(user, recipes[0])[index].explain()
+
+    # Досортировка равных дат ленты по id рецепта (RIGHT PART OF
+    # ORDER BY в SQLite, Incremental Sort в PostgreSQL) допустима.
+    assert 'TEMP B-TREE FOR ORDER BY' not in plan
+    assert not re.search(r'(?<!Incremental )Sort  \(', plan)
+
+
+@postgres_only
+@pytest.mark.parametrize('lookup, index', [
+    ('name__istartswith', 'recipes_ingredient_name_upper_like'),
+    ('name__icontains', 'recipes_ingredient_name_upper_trgm'),
+])
+def test_ingredient_search_uses_index(lookup, index):
+    plan = Ingredient.objects.filter(**{lookup: 'мук'}).explain()
+
+    assert index in plan
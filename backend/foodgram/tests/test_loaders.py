@@ -0,0 +1,12 @@
+import os
+
+from django.conf import settings
+
+from recipes.loaders import load_ingredients, read_ingredients
+from recipes.models import Ingredient
+
+CSV_PATH = os.path.join(settings.BASE_DIR, 'ingredients.csv')
+
+
+def test_reload_adds_nothing(db):
+    assert load_ingredients(Ingredient, read_ingredients(CSV_PATH))[0] == 0
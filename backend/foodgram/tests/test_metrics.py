@@ -0,0 +1,144 @@
+import logging
+import re
+
+import pytest
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.metrics import QueryBudgetExceeded, check_query_budget, registry
+from api.views import RecipeViewSet
+from users.models import User
+from tests.conftest import create_user
+
+METRICS_URL = '/api/metrics/'
+RECIPES_URL = '/api/recipes/'
+SERVER_TIMING = re.compile(
+    r'db;dur=[\d.]+;desc="(\d+) queries", serialize;dur=[\d.]+, '
+    r'render;dur=[\d.]+, total;dur=[\d.]+'
+)
+
+
+@pytest.fixture(autouse=True)
+def reset_registry():
+    registry.reset()
+    yield
+    registry.reset()
+
+
+@pytest.fixture
+def admin_client(db):
+    client = APIClient()
+    client.force_authenticate(create_user('admin', role=User.ADMIN))
+    return client
+
+
+def test_server_timing_header(recipes, client, django_assert_num_queries):
+    with django_assert_num_queries(4):
+        response = client.get(RECIPES_URL)
+
+    match = SERVER_TIMING.fullmatch(response['Server-Timing'])
+    assert match
+    assert match[1] == '4'
+
+
+def test_metrics_disabled(recipes, client, settings):
+    settings.METRICS_ENABLED = False
+
+    response = client.get(RECIPES_URL)
+
+    assert response.status_code == 200
+    assert not response.has_header('Server-Timing')
+    assert registry.report() == {}
+
+
+def test_registry_records_endpoint(recipes, client):
+    client.get(RECIPES_URL)
+    client.get(f'{RECIPES_URL}{recipes[0].pk}/')
+    client.get(RECIPES_URL)
+
+    report = registry.report()
+
+    assert set(report) == {'RecipeViewSet.list', 'RecipeViewSet.retrieve'}
+    recipes_list = report['RecipeViewSet.list']
+    assert recipes_list['count'] == 2
+    # Повторная страница отдаётся из кэша без запросов к БД.
+    assert recipes_list['queries'] == {'p50': 0, 'p95': 4, 'max': 4}
+    assert recipes_list['size']['max'] > 0
+    for metric in ('db_ms', 'serialize_ms', 'render_ms', 'total_ms'):
+        assert set(recipes_list[metric]) == {'p50', 'p95', 'max'}
+
+
+def test_query_budget_exceeded(recipes, client, monkeypatch):
+    monkeypatch.setattr(RecipeViewSet, 'query_budget', {'list': 1})
+
+    with pytest.raises(QueryBudgetExceeded, match='RecipeViewSet.list'):
+        client.get(RECIPES_URL)
+
+
+@pytest.mark.parametrize('method, url, ids', (
+    ('get', RECIPES_URL, None),
+    ('get', f'{RECIPES_URL}shopping_list/', None),
+    ('post', f'{RECIPES_URL}favorite/', 'recipes'),
+    ('post', f'{RECIPES_URL}shopping_cart/', 'recipes'),
+    ('post', '/api/users/subscribe/', 'authors'),
+))
+def test_query_budget_includes_token_lookup(method, url, ids, user, author,
+                                            recipes, client):
+    # Первый запрос токена идёт в БД: бюджет учитывает и его.
+    token = Token.objects.create(user=user)
+    client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    data = None
+    if ids == 'recipes':
+        data = {'ids': [recipe.pk for recipe in recipes[:3]]}
+    elif ids == 'authors':
+        data = {'ids': [author.pk]}
+
+    response = getattr(client, method)(url, data, format='json')
+
+    assert response.status_code == 200
+
+
+def test_query_budget_logs(settings, caplog):
+    settings.QUERY_BUDGET_ACTION = 'log'
+
+    with caplog.at_level(logging.WARNING, logger='api.metrics'):
+        check_query_budget('RecipeViewSet.list', 3, 3)
+        check_query_budget('RecipeViewSet.list', 4, None)
+        check_query_budget('RecipeViewSet.list', 4, 3)
+
+    assert caplog.messages == [
+        'RecipeViewSet.list: 4 SQL queries, budget is 3'
+    ]
+
+
+def test_metrics_report(recipes, client, admin_client):
+    client.get(RECIPES_URL)
+
+    response = admin_client.get(METRICS_URL)
+
+    assert response.status_code == 200
+    assert response.data['endpoints']['RecipeViewSet.list']['count'] == 1
+    assert 'token_cache' in response.data
+
+
+@pytest.mark.parametrize('reader, status', (
+    ('anonymous', 401),
+    ('user', 403),
+))
+def test_metrics_report_admin_only(reader, status, client, user_client):
+    reader_client = client if reader == 'anonymous' else user_client
+
+    assert reader_client.get(METRICS_URL).status_code == status
+
+
+def test_metrics_report_superuser(db):
+    client = APIClient()
+    client.force_authenticate(User.objects.create_superuser(
+        username='root',
+        email='root@example.com',
+        password='Pa55word-long',
+        first_name='root',
+        last_name='root',
+    ))
+
+    assert client.get(METRICS_URL).status_code == 200
@@ -0,0 +1,94 @@
+import os
+from datetime import timedelta
+from importlib import import_module
+
+from django.apps import apps
+from django.conf import settings
+from django.utils import timezone
+
+from recipes.loaders import load_ingredients, read_ingredients
+from recipes.models import (Ingredient,
+                            IngredientRecipe,
+                            Recipe,
+                            ShoppingListItem)
+from tests.conftest import create_recipes
+
+CSV_PATH = os.path.join(settings.BASE_DIR, 'ingredients.csv')
+
+
+def migration(name):
+    return import_module(f'recipes.migrations.{name}')
+
+
+unquote_legacy_ingredients = migration(
+    '0015_unquote_ingredient_names'
+).unquote_legacy_ingredients
+
+
+def test_ingredients_migration_is_reversible(db):
+    add_ingredients = migration('0003_add_ingredient')
+    loaded = set(Ingredient.objects.values_list('name', 'measurement_unit'))
+
+    add_ingredients.remove_ingredients(apps, None)
+    assert not Ingredient.objects.exists()
+
+    add_ingredients.add_ingredients(apps, None)
+    assert set(
+        Ingredient.objects.values_list('name', 'measurement_unit')
+    ) == loaded == set(read_ingredients(CSV_PATH))
+
+
+def test_backfill_pub_date_follows_id_order(author, tags):
+    recipes = create_recipes(author, tags, 4)
+    recipes[1].delete()
+    moment = timezone.now().replace(microsecond=0)
+    Recipe.objects.update(pub_date=moment)
+
+    migration('0010_recipe_pub_date_and_indexes').backfill_pub_date(
+        apps, None
+    )
+
+    dates = dict(Recipe.objects.values_list('id', 'pub_date'))
+    last = recipes[-1].pk
+    assert dates == {
+        recipe.pk: moment - timedelta(seconds=last - recipe.pk)
+        for recipe in (recipes[0], *recipes[2:])
+    }
+    assert list(Recipe.objects.values_list('id', flat=True)) == sorted(
+        dates, reverse=True
+    )
+
+
+def test_legacy_name_is_merged_into_reloaded_one(author, tags, user):
+    current = Ingredient.objects.get(name='молоко 3,2%', measurement_unit='г')
+    legacy = Ingredient.objects.create(
+        name='"молоко 3,2%"', measurement_unit='г'
+    )
+    both, only_legacy = create_recipes(author, tags, 2, 0)
+    IngredientRecipe.objects.bulk_create([
+        IngredientRecipe(recipe=both, ingredient=current, amount=100),
+        IngredientRecipe(recipe=both, ingredient=legacy, amount=50),
+        IngredientRecipe(recipe=only_legacy, ingredient=legacy, amount=30),
+    ])
+    ShoppingListItem.objects.create(
+        user=user, ingredient=legacy, amount=80
+    )
+
+    assert unquote_legacy_ingredients(apps) == {both.pk, only_legacy.pk}
+
+    assert not Ingredient.objects.filter(pk=legacy.pk).exists()
+    amounts = dict(IngredientRecipe.objects.filter(
+        ingredient=current
+    ).values_list('recipe_id', 'amount'))
+    assert amounts == {both.pk: 150, only_legacy.pk: 30}
+    assert ShoppingListItem.objects.get(user=user).ingredient == current
+    assert load_ingredients(Ingredient, read_ingredients(CSV_PATH))[0] == 0
+
+
+def test_legacy_name_without_twin_is_renamed(db):
+    legacy = Ingredient.objects.create(
+        name='"соус ""тест"", острый"', measurement_unit='г'
+    )
+    unquote_legacy_ingredients(apps)
+    legacy.refresh_from_db()
+    assert legacy.name == 'соус "тест", острый'
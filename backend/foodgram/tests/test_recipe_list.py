@@ -0,0 +1,142 @@
+from datetime import timedelta
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from recipes.models import Favorite, Recipe, ShoppingCart
+from recipes.search import update_search_index
+from tests.conftest import create_recipes
+
+LIST_URL = '/api/recipes/'
+
+
+@pytest.mark.parametrize('limit', (6, 50, 200))
+def test_list_queries_do_not_depend_on_page_size(
+    limit, author, tags, user_client, django_assert_num_queries
+):
+    # COUNT, страница, теги и ингредиенты всей страницы.
+    create_recipes(author, tags, limit)
+    with django_assert_num_queries(4):
+        response = user_client.get(LIST_URL, {'limit': limit})
+    assert response.status_code == 200
+    assert len(response.data['results']) == limit
+
+
+@pytest.mark.parametrize('limit', (6, 50, 200))
+def test_anonymous_list_queries_do_not_depend_on_page_size(
+    limit, author, tags, client, django_assert_num_queries
+):
+    create_recipes(author, tags, limit)
+    with django_assert_num_queries(4):
+        response = client.get(LIST_URL, {'limit': limit})
+    assert response.status_code == 200
+    assert len(response.data['results']) == limit
+
+
+@pytest.mark.parametrize('flags, expected', (
+    ({}, (0, 1, 3, 4, 6, 7, 9)),
+    ({'is_favorited': 1}, (0, 1, 3, 4)),
+    ({'is_favorited': 1, 'is_in_shopping_cart': 1}, (3, 4)),
+    ({'is_favorited': 0, 'is_in_shopping_cart': 1}, (6, 7)),
+))
+def test_filters_use_exists_without_duplicates(flags, expected, recipes,
+                                               tags, user, user_client):
+    Favorite.objects.bulk_create(
+        Favorite(user=user, recipe=recipe) for recipe in recipes[:6]
+    )
+    ShoppingCart.objects.bulk_create(
+        ShoppingCart(user=user, recipe=recipe) for recipe in recipes[3:9]
+    )
+    # Теги фильтра есть у рецептов 0, 1, 3, 4, 6, 7, 9,
+    # у 0, 3, 6, 9 - оба.
+    slugs = [tag.slug for tag in tags[:2]]
+
+    with CaptureQueriesContext(connection) as context:
+        response = user_client.get(
+            LIST_URL, {'tags': slugs, 'limit': 100, **flags}
+        )
+
+    ids = [recipe['id'] for recipe in response.data['results']]
+    assert len(ids) == len(set(ids)) == response.data['count']
+    assert set(ids) == {recipes[number].pk for number in expected}
+    count_sql, page_sql = (
+        query['sql'] for query in context.captured_queries
+        if query['sql'].startswith('SELECT')
+        and 'FROM "recipes_recipe"' in query['sql']
+    )
+    for sql in (count_sql, page_sql):
+        assert 'DISTINCT' not in sql
+        assert 'EXISTS' in sql
+        assert 'JOIN "recipes_recipe_tags"' not in sql
+
+
+def walk_cursor_pages(client, params):
+    ids = []
+    response = client.get(LIST_URL, {**params, 'pagination': 'cursor'})
+    while True:
+        assert response.status_code == 200
+        ids.extend(recipe['id'] for recipe in response.data['results'])
+        if response.data['next'] is None:
+            return ids
+        response = client.get(response.data['next'])
+
+
+def list_ids(client, params):
+    response = client.get(LIST_URL, {**params, 'limit': 100})
+    return [recipe['id'] for recipe in response.data['results']]
+
+
+def test_cursor_pages_follow_default_ordering(recipes, client):
+    # Самый старый по id рецепт опубликован последним.
+    Recipe.objects.filter(pk=recipes[0].pk).update(
+        pub_date=timezone.now() + timedelta(days=1)
+    )
+    expected = list_ids(client, {})
+    assert expected[0] == recipes[0].pk
+    assert walk_cursor_pages(client, {'limit': 3}) == expected
+
+
+def test_cursor_pages_follow_popular_ordering(recipes, user_client):
+    for count, recipe in enumerate(recipes[:4]):
+        recipe.favorites_count = count + 1
+        recipe.save(update_fields=['favorites_count'])
+    params = {'sort': 'popular', 'limit': 3}
+    expected = list_ids(user_client, {'sort': 'popular'})
+    assert expected[:4] == [recipe.pk for recipe in reversed(recipes[:4])]
+    assert walk_cursor_pages(user_client, params) == expected
+
+
+@pytest.fixture
+def borscht_recipes(recipes):
+    """Два найденных по «борщ» рецепта: более старый - по названию,
+    более новый - только по описанию.
+    """
+    Recipe.objects.filter(pk=recipes[0].pk).update(name='Борщ')
+    Recipe.objects.filter(pk=recipes[5].pk).update(text='Почти борщ')
+    update_search_index([recipe.pk for recipe in recipes])
+    return recipes[0], recipes[5]
+
+
+def test_search_pages_keep_rank_ordering(borscht_recipes, client):
+    by_name, by_text = borscht_recipes
+    assert list_ids(client, {'search': 'борщ'}) == [by_name.pk, by_text.pk]
+
+
+def test_search_rejects_cursor_pagination(borscht_recipes, client):
+    # Позицию курсора по релевантности не сохранить.
+    response = client.get(
+        LIST_URL, {'search': 'борщ', 'pagination': 'cursor'}
+    )
+    assert response.status_code == 400
+    assert 'pagination' in response.data
+
+
+def test_search_with_sort_pages_by_cursor(borscht_recipes, client):
+    by_name, by_text = borscht_recipes
+    Recipe.objects.filter(pk=by_text.pk).update(favorites_count=1)
+    params = {'search': 'борщ', 'sort': 'popular'}
+    expected = list_ids(client, params)
+    assert expected == [by_text.pk, by_name.pk]
+    assert walk_cursor_pages(client, {**params, 'limit': 1}) == expected
@@ -0,0 +1,58 @@
+import pytest
+
+LIST_URL = '/api/recipes/'
+
+
+def test_cached_page_links_follow_request_params(recipes, client):
+    first = client.get(LIST_URL, {'is_favorited': 1, 'limit': 2})
+    second = client.get(LIST_URL, {'is_in_shopping_cart': 0, 'limit': 2})
+    assert 'is_favorited=1' in first.data['next']
+    assert 'is_favorited' not in second.data['next']
+    assert 'is_in_shopping_cart=0' in second.data['next']
+
+
+def test_cached_page_links_follow_scheme(recipes, client):
+    plain = client.get(LIST_URL, {'limit': 2})
+    secure = client.get(LIST_URL, {'limit': 2}, secure=True)
+    assert plain.data['next'].startswith('http://')
+    assert secure.data['next'].startswith('https://')
+
+
+def test_same_params_in_any_order_share_page(
+    recipes, client, django_assert_num_queries
+):
+    client.get(f'{LIST_URL}?limit=2&page=2')
+    with django_assert_num_queries(0):
+        response = client.get(f'{LIST_URL}?page=2&limit=2')
+    assert response.status_code == 200
+
+
+def popular_ids(client):
+    response = client.get(LIST_URL, {'sort': 'popular'})
+    return [recipe['id'] for recipe in response.data['results']]
+
+
+def change_favorite(client, method, pk, bulk):
+    if bulk:
+        return getattr(client, method)(
+            f'{LIST_URL}favorite/', {'ids': [pk]}, format='json'
+        )
+    return getattr(client, method)(f'{LIST_URL}{pk}/favorite/')
+
+
+@pytest.mark.parametrize('bulk', (False, True))
+def test_popular_page_follows_favorites(bulk, recipes, client, user_client,
+                                        run_on_commit):
+    before = popular_ids(client)
+    pk = before[-1]
+
+    assert change_favorite(user_client, 'post', pk, bulk).status_code in (
+        200, 201
+    )
+    assert popular_ids(client) == [pk, *before[:-1]]
+
+    assert change_favorite(user_client, 'delete', pk, bulk).status_code in (
+        200, 204
+    )
+    assert popular_ids(client) == before
+
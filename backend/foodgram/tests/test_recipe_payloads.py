@@ -0,0 +1,91 @@
+import json
+
+import pytest
+from django.contrib.auth.models import AnonymousUser
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.serializers import RecipeListSerializer
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import Follow
+
+LIST_URL = '/api/recipes/'
+
+
+@pytest.fixture
+def user_relations(user, author, recipes):
+    """Избранное, покупки и подписка, чтобы флаги различались
+    между рецептами.
+    """
+    Favorite.objects.create(user=user, recipe=recipes[0])
+    ShoppingCart.objects.create(user=user, recipe=recipes[1])
+    Follow.objects.create(user=user, author=author)
+    Recipe.objects.filter(pk=recipes[2].pk).update(
+        image_thumbnails_ready=True
+    )
+    return recipes
+
+
+def serializer_data(user, recipes, many=True):
+    """Ответ в формате прежней сериализации объектов модели."""
+    request = Request(APIRequestFactory().get(LIST_URL))
+    request.user = user
+    queryset = Recipe.objects.with_related().with_user_flags(user)
+    if many:
+        instance = list(queryset.filter(
+            pk__in=[recipe.pk for recipe in recipes]
+        ))
+    else:
+        instance = queryset.get(pk=recipes.pk)
+    data = RecipeListSerializer(
+        instance, many=many, context={'request': request}
+    ).data
+    return json.loads(json.dumps(data))
+
+
+@pytest.fixture(params=('anonymous', 'user'))
+def reader(request, user, client, user_client):
+    if request.param == 'anonymous':
+        return AnonymousUser(), client
+    return user, user_client
+
+
+def test_list_matches_serializer(reader, user_relations):
+    user, client = reader
+
+    response = client.get(LIST_URL, {'limit': 100})
+
+    assert response.status_code == 200
+    assert response.json()['results'] == serializer_data(
+        user, user_relations
+    )
+
+
+def test_list_flags(user, user_client, user_relations):
+    results = {
+        recipe['id']: recipe
+        for recipe in user_client.get(
+            LIST_URL, {'limit': 100}
+        ).json()['results']
+    }
+    favorite, in_cart = user_relations[:2]
+    assert [pk for pk in results if results[pk]['is_favorited']] == [
+        favorite.pk
+    ]
+    assert [pk for pk in results if results[pk]['is_in_shopping_cart']] == [
+        in_cart.pk
+    ]
+    assert all(
+        recipe['author']['is_subscribed'] for recipe in results.values()
+    )
+
+
+@pytest.mark.parametrize('index', (0, 1, 2))
+def test_detail_matches_serializer(reader, user_relations, index):
+    user, client = reader
+    recipe = user_relations[index]
+
+    response = client.get(f'{LIST_URL}{recipe.pk}/')
+
+    assert response.status_code == 200
+    assert response.json() == serializer_data(user, recipe, many=False)
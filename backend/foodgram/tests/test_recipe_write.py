@@ -0,0 +1,190 @@
+import pytest
+from django.db import connection
+from django.db.models import Sum
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient, IngredientRecipe, ShoppingListItem
+from tests.conftest import create_user
+
+
+def recipe_url(recipe):
+    return f'/api/recipes/{recipe.pk}/'
+
+
+@pytest.fixture
+def author_client(author):
+    client = APIClient()
+    client.force_authenticate(author)
+    return client
+
+
+@pytest.fixture
+def ingredient_ids(db):
+    return list(
+        Ingredient.objects.order_by('id').values_list('id', flat=True)[:60]
+    )
+
+
+def ingredients_payload(amounts):
+    return {
+        'ingredients': [
+            {'id': pk, 'amount': amount} for pk, amount in amounts.items()
+        ]
+    }
+
+
+def statements(queries, table):
+    """Виды SQL-запросов к таблице: DELETE, UPDATE, INSERT."""
+    return sorted(
+        query['sql'].split()[0] for query in queries
+        if f'"{table}"' in query['sql'].split('WHERE')[0]
+        and not query['sql'].startswith('SELECT')
+    )
+
+
+def shopping_list(user):
+    return dict(ShoppingListItem.objects.filter(
+        user=user
+    ).values_list('ingredient', 'amount'))
+
+
+def expected_shopping_list(user):
+    return dict(IngredientRecipe.objects.filter(
+        recipe__in_shoping_cart__user=user
+    ).values('ingredient').annotate(
+        total=Sum('amount')
+    ).order_by().values_list('ingredient', 'total'))
+
+
+@pytest.fixture
+def buyer(recipes):
+    """Покупатель с первыми двумя рецептами в корзине: у них есть
+    общие ингредиенты.
+    """
+    buyer = create_user('buyer')
+    client = APIClient()
+    client.force_authenticate(buyer)
+    for recipe in recipes[:2]:
+        response = client.post(f'{recipe_url(recipe)}shopping_cart/')
+        assert response.status_code == 201
+    return buyer
+
+
+def test_update_moves_changes_to_shopping_lists(buyer, recipes,
+                                                ingredient_ids,
+                                                author_client):
+    recipe = recipes[0]
+    current = dict(recipe.ingredients_list.values_list(
+        'ingredient', 'amount'
+    ))
+    kept, changed, removed = list(current)
+    amounts = {
+        kept: current[kept],
+        changed: current[changed] + 5,
+        ingredient_ids[-1]: 7,
+    }
+    assert removed not in amounts
+
+    response = author_client.patch(
+        recipe_url(recipe), ingredients_payload(amounts), format='json'
+    )
+
+    assert response.status_code == 200
+    assert shopping_list(buyer) == expected_shopping_list(buyer)
+
+    amounts[changed] = 1
+    author_client.patch(
+        recipe_url(recipe), ingredients_payload(amounts), format='json'
+    )
+    assert shopping_list(buyer) == expected_shopping_list(buyer)
+
+
+@pytest.mark.parametrize('in_cart, queries', [(False, 13), (True, 15)])
+@pytest.mark.parametrize('count', (2, 40))
+def test_update_queries_do_not_depend_on_changes(
+    in_cart, queries, count, recipes, ingredient_ids, author_client,
+    django_assert_num_queries
+):
+    recipe = recipes[0]
+    if in_cart:
+        buyer = create_user('buyer')
+        client = APIClient()
+        client.force_authenticate(buyer)
+        client.post(f'{recipe_url(recipe)}shopping_cart/')
+    ids = ingredient_ids[20:20 + count]
+    author_client.patch(
+        recipe_url(recipe),
+        ingredients_payload({pk: 5 for pk in ids}),
+        format='json'
+    )
+
+    # Чтение рецепта и ингредиентов, проверка ингредиентов, UPDATE
+    # количеств, изменение списков покупок (INSERT и DELETE, если
+    # рецепт в корзине), UPDATE рецепта, индекс поиска, ответ.
+    with django_assert_num_queries(queries):
+        response = author_client.patch(
+            recipe_url(recipe),
+            ingredients_payload({pk: 2 for pk in ids}),
+            format='json'
+        )
+    assert response.status_code == 200
+
+
+def test_update_writes_only_changes(recipes, tags, ingredient_ids,
+                                    author_client):
+    recipe = recipes[0]
+    current = dict(recipe.ingredients_list.values_list(
+        'ingredient', 'amount'
+    ))
+    kept, changed, removed = list(current)
+    amounts = {
+        kept: current[kept],
+        changed: current[changed] + 5,
+        ingredient_ids[-1]: 7,
+    }
+    kept_tag, removed_tag = recipe.tags.all()
+    added_tag = next(tag for tag in tags if tag not in (kept_tag, removed_tag))
+
+    with CaptureQueriesContext(connection) as context:
+        response = author_client.patch(recipe_url(recipe), {
+            **ingredients_payload(amounts),
+            'tags': [kept_tag.pk, added_tag.pk],
+        }, format='json')
+
+    assert response.status_code == 200
+    assert dict(recipe.ingredients_list.values_list(
+        'ingredient', 'amount'
+    )) == amounts
+    assert set(recipe.tags.all()) == {kept_tag, added_tag}
+    # Неизменённые строки не переписываются.
+    assert statements(
+        context.captured_queries, 'recipes_ingredientrecipe'
+    ) == ['DELETE', 'INSERT', 'UPDATE']
+    assert statements(
+        context.captured_queries, 'recipes_recipe_tags'
+    ) == ['DELETE', 'INSERT']
+
+
+def test_unknown_ingredients_in_one_error(recipes, ingredient_ids,
+                                          author_client):
+    recipe = recipes[0]
+    before = list(recipe.ingredients_list.values_list('ingredient', 'amount'))
+    last = Ingredient.objects.order_by('-id').values_list('id', flat=True)[0]
+    unknown = [last + 1, last + 2]
+
+    response = author_client.patch(
+        recipe_url(recipe),
+        ingredients_payload({ingredient_ids[0]: 5, **{
+            pk: 5 for pk in unknown
+        }}),
+        format='json'
+    )
+
+    assert response.status_code == 400
+    assert response.data == {'ingredients': [
+        f'Ингредиенты не найдены: {unknown[0]}, {unknown[1]}'
+    ]}
+    assert list(
+        recipe.ingredients_list.values_list('ingredient', 'amount')
+    ) == before
@@ -0,0 +1,82 @@
+import pytest
+
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import Follow, User
+
+
+def recipe_url(recipe_id, action):
+    return f'/api/recipes/{recipe_id}/{action}/'
+
+
+def subscribe_url(author_id):
+    return f'/api/users/{author_id}/subscribe/'
+
+
+@pytest.mark.parametrize('action, model, counter_field', [
+    ('favorite', Favorite, 'favorites_count'),
+    ('shopping_cart', ShoppingCart, 'in_carts_count'),
+])
+def test_recipe_toggle(action, model, counter_field, user, recipes,
+                       user_client):
+    recipe = recipes[0]
+    url = recipe_url(recipe.pk, action)
+
+    response = user_client.post(url)
+    assert response.status_code == 201
+    assert response.data['id'] == recipe.pk
+    assert user_client.post(url).status_code == 400
+    assert model.objects.filter(user=user, recipe=recipe).count() == 1
+    recipe.refresh_from_db()
+    assert getattr(recipe, counter_field) == 1
+
+    assert user_client.delete(url).status_code == 204
+    assert user_client.delete(url).status_code == 400
+    assert not model.objects.filter(user=user, recipe=recipe).exists()
+    recipe.refresh_from_db()
+    assert getattr(recipe, counter_field) == 0
+
+
+@pytest.mark.parametrize('action', ('favorite', 'shopping_cart'))
+@pytest.mark.parametrize('method', ('post', 'delete'))
+@pytest.mark.parametrize('recipe_id', ('0', 'abc'))
+def test_recipe_toggle_unknown_recipe(action, method, recipe_id, recipes,
+                                      user_client):
+    if recipe_id == '0':
+        recipe_id = Recipe.objects.order_by('-id').first().pk + 1
+    response = getattr(user_client, method)(recipe_url(recipe_id, action))
+
+    assert response.status_code == 404
+
+
+@pytest.mark.parametrize('action', ('favorite', 'shopping_cart'))
+def test_recipe_toggle_requires_authentication(action, recipes, client):
+    assert client.post(recipe_url(recipes[0].pk, action)).status_code == 401
+
+
+def test_subscribe_toggle(user, author, user_client):
+    url = subscribe_url(author.pk)
+
+    response = user_client.post(url)
+    assert response.status_code == 201
+    assert response.data['id'] == author.pk
+    assert response.data['is_subscribed'] is True
+    assert user_client.post(url).status_code == 400
+    assert Follow.objects.filter(user=user, author=author).count() == 1
+    author.refresh_from_db()
+    assert author.followers_count == 1
+
+    assert user_client.delete(url).status_code == 204
+    assert user_client.delete(url).status_code == 400
+    assert not Follow.objects.filter(user=user, author=author).exists()
+    author.refresh_from_db()
+    assert author.followers_count == 0
+
+
+@pytest.mark.parametrize('method', ('post', 'delete'))
+@pytest.mark.parametrize('author_id', ('0', 'abc'))
+def test_subscribe_unknown_author(method, author_id, author, user_client):
+    if author_id == '0':
+        author_id = User.objects.order_by('-id').first().pk + 1
+    response = getattr(user_client, method)(subscribe_url(author_id))
+
+    assert response.status_code == 404
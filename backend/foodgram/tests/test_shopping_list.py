@@ -0,0 +1,147 @@
+import csv
+import io
+import os
+
+import pytest
+from django.conf import settings
+
+from recipes.models import Ingredient, IngredientRecipe, Recipe
+from recipes.units import display_units, format_amount
+
+CART_URL = '/api/recipes/{}/shopping_cart/'
+PREVIEW_URL = '/api/recipes/shopping_list/'
+DOWNLOAD_URL = '/api/recipes/download_shopping_cart/'
+
+
+def make_recipe(author, tags, name, ingredients):
+    recipe = Recipe(author=author, name=name, text=name, cooking_time=5)
+    recipe.image.name = 'recipes/shopping.png'
+    recipe.save()
+    recipe.tags.set(tags[:1])
+    IngredientRecipe.objects.bulk_create([
+        IngredientRecipe(recipe=recipe, ingredient=ingredient, amount=amount)
+        for ingredient, amount in ingredients
+    ])
+    return recipe
+
+
+@pytest.fixture
+def products(db):
+    return {
+        (name, unit): Ingredient.objects.create(
+            name=name, measurement_unit=unit
+        )
+        for name, unit in (
+            ('Мука тестовая', 'г'),
+            ('Мука тестовая', 'кг'),
+            ('Соль тестовая', 'ч. л.'),
+            ('Сахар тестовый', 'г'),
+        )
+    }
+
+
+@pytest.fixture
+def cart(author, tags, products, user_client):
+    recipes = [
+        make_recipe(author, tags, 'Хлеб', [
+            (products['Мука тестовая', 'г'], 500),
+            (products['Соль тестовая', 'ч. л.'], 2),
+            (products['Сахар тестовый', 'г'], 1000),
+        ]),
+        make_recipe(author, tags, 'Пирог', [
+            (products['Мука тестовая', 'кг'], 2),
+            (products['Соль тестовая', 'ч. л.'], 1),
+            (products['Сахар тестовый', 'г'], 234),
+        ]),
+    ]
+    for recipe in recipes:
+        assert user_client.post(CART_URL.format(recipe.pk)).status_code == 201
+    return recipes
+
+
+@pytest.mark.parametrize('total, base_unit, expected', [
+    (1500, 'г', (1.5, 'кг')),
+    (1250, 'г', (1.25, 'кг')),
+    (1234, 'г', (1234, 'г')),
+    (999, 'г', (999, 'г')),
+    (2000, 'мл', (2, 'л')),
+    (1005, 'мл', (1005, 'мл')),
+])
+def test_convert_keeps_precision(db, total, base_unit, expected):
+    assert display_units.convert(total, base_unit) == expected
+
+
+@pytest.mark.parametrize('amount, expected', [
+    (2.0, 2),
+    (1.25, 1.25),
+    (1234.0, 1234),
+    (1 / 3, 0.33),
+])
+def test_format_amount(amount, expected):
+    assert format_amount(amount) == expected
+
+
+def test_preview_merges_units(cart, user_client):
+    response = user_client.get(PREVIEW_URL)
+
+    assert response.status_code == 200
+    assert response.data == [
+        {'name': 'Мука тестовая', 'measurement_unit': 'кг', 'amount': 2.5},
+        {'name': 'Сахар тестовый', 'measurement_unit': 'г', 'amount': 1234},
+        {'name': 'Соль тестовая', 'measurement_unit': 'ч. л.', 'amount': 3},
+    ]
+
+
+def test_removing_recipe_subtracts_ingredients(cart, user_client):
+    assert user_client.delete(CART_URL.format(cart[1].pk)).status_code == 204
+
+    assert user_client.get(PREVIEW_URL).data == [
+        {'name': 'Мука тестовая', 'measurement_unit': 'г', 'amount': 500},
+        {'name': 'Сахар тестовый', 'measurement_unit': 'кг', 'amount': 1},
+        {'name': 'Соль тестовая', 'measurement_unit': 'ч. л.', 'amount': 2},
+    ]
+
+
+def download(client, **params):
+    response = client.get(DOWNLOAD_URL, params)
+    assert response.status_code == 200
+    return b''.join(response.streaming_content)
+
+
+def test_download_txt(cart, user_client):
+    lines = download(user_client).decode().splitlines()
+
+    assert lines[3:] == [
+        '1. Мука тестовая - 2.5 кг',
+        '2. Сахар тестовый - 1234 г',
+        '3. Соль тестовая - 3 ч. л.',
+    ]
+
+
+def test_download_csv(cart, user_client):
+    content = download(user_client, file_format='csv').decode()
+
+    assert list(csv.reader(io.StringIO(content))) == [
+        ['name', 'amount', 'measurement_unit'],
+        ['Мука тестовая', '2.5', 'кг'],
+        ['Сахар тестовый', '1234', 'г'],
+        ['Соль тестовая', '3', 'ч. л.'],
+    ]
+
+
+@pytest.mark.skipif(
+    not os.path.exists(settings.SHOPPING_LIST_PDF_FONT),
+    reason='нет шрифта для PDF',
+)
+def test_download_pdf(cart, user_client):
+    assert download(user_client, file_format='pdf').startswith(b'%PDF')
+
+
+def test_download_unknown_format(cart, user_client):
+    response = user_client.get(DOWNLOAD_URL, {'file_format': 'xls'})
+
+    assert response.status_code == 400
+
+
+def test_download_empty_cart(user_client):
+    assert user_client.get(DOWNLOAD_URL).status_code == 400
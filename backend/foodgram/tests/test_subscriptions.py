@@ -0,0 +1,78 @@
+import pytest
+
+from tests.conftest import create_recipes, create_user
+from users.models import Follow, User
+
+SUBSCRIPTIONS_URL = '/api/users/subscriptions/'
+
+
+@pytest.fixture
+def followed(user, tags):
+    """Авторы с разным числом рецептов, на которых подписан user."""
+    authors = []
+    for number in range(1, 5):
+        author = create_user(f'author{number}')
+        create_recipes(author, tags, number)
+        Follow.objects.create(user=user, author=author)
+        authors.append(author)
+    return authors
+
+
+def results_by_author(response):
+    assert response.status_code == 200
+    return {author['id']: author for author in response.data['results']}
+
+
+@pytest.mark.parametrize('count', (2, 8))
+def test_subscriptions_queries_do_not_depend_on_page(
+    count, user, tags, user_client, django_assert_num_queries
+):
+    for number in range(count):
+        author = create_user(f'author{number}')
+        create_recipes(author, tags, 3)
+        Follow.objects.create(user=user, author=author)
+
+    # COUNT, подписки с авторами и числом рецептов, рецепты авторов.
+    with django_assert_num_queries(3):
+        response = user_client.get(SUBSCRIPTIONS_URL, {'recipes_limit': 2})
+    assert len(response.data['results']) == count
+    assert all(
+        len(author['recipes']) == 2 for author in response.data['results']
+    )
+
+
+def test_recipes_preview_is_limited(followed, user_client):
+    results = results_by_author(
+        user_client.get(SUBSCRIPTIONS_URL, {'recipes_limit': 2})
+    )
+
+    for author in followed:
+        recipes = author.recipe.order_by('-pub_date', '-id')
+        expected = list(recipes.values_list('id', flat=True)[:2])
+        assert [
+            recipe['id'] for recipe in results[author.pk]['recipes']
+        ] == expected
+        assert results[author.pk]['recipes_count'] == recipes.count()
+        assert results[author.pk]['is_subscribed'] is True
+
+
+@pytest.mark.parametrize('recipes_limit', ('', 'abc', '-1'))
+def test_invalid_recipes_limit_shows_all_recipes(recipes_limit, followed,
+                                                 user_client):
+    results = results_by_author(
+        user_client.get(SUBSCRIPTIONS_URL, {'recipes_limit': recipes_limit})
+    )
+
+    for author in followed:
+        assert len(results[author.pk]['recipes']) == author.recipe.count()
+
+
+def test_recipes_count_is_counted_from_recipes(followed, user_client):
+    # Денормализованный счётчик разошёлся с таблицей рецептов.
+    User.objects.update(recipes_count=0)
+
+    results = results_by_author(user_client.get(SUBSCRIPTIONS_URL))
+
+    assert [
+        results[author.pk]['recipes_count'] for author in followed
+    ] == [1, 2, 3, 4]
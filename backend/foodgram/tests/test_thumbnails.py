@@ -0,0 +1,118 @@
+from base64 import b64encode
+from io import BytesIO
+
+import pytest
+from PIL import Image
+from rest_framework.test import APIClient
+
+from recipes import thumbnails
+from recipes.thumbnails import _generate_thumbnails_task, generate_thumbnails
+
+
+def image_payload(size=(800, 600)):
+    buffer = BytesIO()
+    Image.new('RGB', size, 'orange').save(buffer, format='PNG')
+    return f'data:image/png;base64,{b64encode(buffer.getvalue()).decode()}'
+
+
+@pytest.fixture(autouse=True)
+def media_root(settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def author_client(author):
+    client = APIClient()
+    client.force_authenticate(author)
+    return client
+
+
+@pytest.fixture
+def on_commit(monkeypatch):
+    """Колбэки transaction.on_commit, отложенные до вызова теста."""
+    callbacks = []
+    monkeypatch.setattr(
+        'django.db.transaction.on_commit',
+        lambda func, using=None: callbacks.append(func)
+    )
+    return callbacks
+
+
+@pytest.fixture
+def submitted(monkeypatch):
+    submitted = []
+
+    class Executor:
+        def submit(self, func, *args):
+            submitted.append((func, *args))
+
+    monkeypatch.setattr(thumbnails, 'get_executor', Executor)
+    return submitted
+
+
+def test_new_image_scheduled_on_commit(recipes, author_client, on_commit,
+                                       submitted):
+    recipe = recipes[0]
+    recipe.image_thumbnails_ready = True
+    recipe.save()
+
+    response = author_client.patch(
+        f'/api/recipes/{recipe.pk}/', {'image': image_payload()},
+        format='json'
+    )
+
+    assert response.status_code == 200
+    recipe.refresh_from_db()
+    assert not recipe.image_thumbnails_ready
+    # Пока копий нет, ссылки ведут на оригинал.
+    assert set(response.data['image_thumbnails'].values()) == {
+        response.data['image']
+    }
+    assert not submitted
+    for callback in on_commit:
+        callback()
+    assert submitted == [
+        (_generate_thumbnails_task, recipe.pk, recipe.image.name)
+    ]
+
+
+def test_update_without_image_keeps_thumbnails(recipes, author_client,
+                                               on_commit, submitted):
+    recipe = recipes[0]
+    recipe.image_thumbnails_ready = True
+    recipe.save()
+
+    response = author_client.patch(
+        f'/api/recipes/{recipe.pk}/', {'name': 'Новое название'},
+        format='json'
+    )
+
+    assert response.status_code == 200
+    recipe.refresh_from_db()
+    assert recipe.image_thumbnails_ready
+    for callback in on_commit:
+        callback()
+    assert not submitted
+
+
+def test_generate_thumbnails(recipes, author_client, on_commit, settings,
+                             media_root, client):
+    recipe = recipes[0]
+    author_client.patch(
+        f'/api/recipes/{recipe.pk}/', {'image': image_payload()},
+        format='json'
+    )
+    recipe.refresh_from_db()
+
+    generate_thumbnails(recipe)
+
+    recipe.refresh_from_db()
+    assert recipe.image_thumbnails_ready
+    urls = client.get(f'/api/recipes/{recipe.pk}/').data['image_thumbnails']
+    for size_name, size in settings.RECIPE_THUMBNAIL_SIZES.items():
+        name = thumbnails.get_thumbnail_name(recipe.image.name, size_name)
+        assert urls[size_name].endswith(name)
+        with Image.open(media_root / name) as thumbnail:
+            assert thumbnail.format == settings.RECIPE_THUMBNAIL_FORMAT
+            assert max(thumbnail.size) == size
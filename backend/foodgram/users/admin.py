@@ -6,7 +6,8 @@ from .models import User
 
 @admin.register(User)
 class UsersAdmin(UserAdmin):
-    list_display = ('username', 'email', 'first_name', 'last_name', 'role')
+    list_display = ('username', 'email', 'first_name', 'last_name', 'role',
+                    'recipes_count', 'followers_count')
     search_fields = ('first_name', 'email')
     fieldsets = (
         ('User', dict(fields=('username', 'password', 'email', 'first_name',
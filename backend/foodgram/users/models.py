@@ -2,7 +2,25 @@ from django.contrib.auth.models import AbstractUser
 from django.db import models
 
 
-class User(AbstractUser):
+class CounterFieldsMixin:
+    """Счётчики меняются только через F()-обновления. Полное сохранение
+    объекта не перезаписывает их устаревшими значениями из памяти.
+    """
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        if (not self._state.adding
+                and kwargs.get('update_fields') is None
+                and not kwargs.get('force_insert')):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.counter_fields
+            ]
+        super().save(*args, **kwargs)
+
+
+class User(CounterFieldsMixin, AbstractUser):
     """Кастомная модель для пользователей"""
 
     USER = 'user'
@@ -35,6 +53,24 @@ class User(AbstractUser):
         default=USER,
         max_length=20
     )
+    recipes_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='recipes count'
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='followers count'
+    )
+
+    feed_materialized = models.BooleanField(
+        default=False,
+        editable=False,
+        verbose_name='feed materialized'
+    )
+
+    counter_fields = ('recipes_count', 'followers_count')
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ('username', 'first_name', 'last_name')
@@ -55,12 +91,14 @@ class User(AbstractUser):
 class Follow(models.Model):
     user = models.ForeignKey(
         User,
+        db_index=False,
         on_delete=models.CASCADE,
         related_name='follower',
         verbose_name='user'
     )
     author = models.ForeignKey(
         User,
+        db_index=False,
         on_delete=models.CASCADE,
         related_name='following',
         verbose_name='author'
@@ -74,6 +112,12 @@ class Follow(models.Model):
             models.UniqueConstraint(
                 fields=['user', 'author'], name='unique_recording')
         ]
+        indexes = [
+            models.Index(
+                fields=['author', 'user'],
+                name='follow_author_user_idx',
+            )
+        ]
 
     def __str__(self):
         return f'{self.user} follow to {self.author}'